@@ -2,7 +2,7 @@ import time
 import os
 import requests
 from dotenv import load_dotenv
-from extracao_url import extrair_url_video, limpar_driver_persistente
+from extracao_url import iterar_extracoes, limpar_todos_drivers
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -274,36 +274,41 @@ def processar_urls():
     # ID do driver para modo persistente
     driver_id = "Main-Persistent"
     
+    # Monta as entradas de extração (episódios da mesma temporada ficam juntos
+    # e são extraídos na mesma página da série)
+    entradas = []
+    for item in itens_selecionados:
+        url_base = item.get('url', 'URL não encontrada')
+        if tipo_conteudo == 'series':
+            temporada = item.get('temporada_numero', '')
+            episodio = item.get('episodio_numero', '')
+            entradas.append({
+                'url': construir_url_serie(url_base, temporada, episodio),
+                'url_base': url_base,
+                'tipo': 'serie',
+                'temporada': temporada,
+                'episodio': episodio
+            })
+        else:
+            entradas.append({'url': url_base, 'url_base': url_base, 'tipo': 'filme'})
+    
     try:
-        # Processa cada item no intervalo
-        for idx, item in enumerate(itens_selecionados, start=inicio):
-            url_base = item.get('url', 'URL não encontrada')
+        # Processa cada item no intervalo (resultados chegam na ordem das entradas)
+        extracoes = iterar_extracoes(entradas, driver_id, usar_driver_persistente)
+        for idx, (entrada, resultado) in enumerate(extracoes, start=inicio):
+            url_base = entrada['url_base']
+            url_extracao = entrada['url']
+            temporada = entrada.get('temporada')
+            episodio = entrada.get('episodio')
             
-            # Para séries, constrói a URL completa com temporada e episódio
             if tipo_conteudo == 'series':
-                temporada = item.get('temporada_numero', '')
-                episodio = item.get('episodio_numero', '')
-                url_extracao = construir_url_serie(url_base, temporada, episodio)
                 print(f"\n[{idx}/{fim}] Série T{temporada}E{episodio}")
                 print(f"  URL Base: {url_base[:60]}...")
                 print(f"  URL Extração: {url_extracao[:80]}...")
             else:
-                url_extracao = url_base
-                temporada = None
-                episodio = None
                 print(f"\n[{idx}/{fim}] Processando filme: {url_extracao[:80]}...")
             
             try:
-                # Chama extrair_url_video com o parâmetro de driver persistente
-                resultado = extrair_url_video(
-                    url_extracao, 
-                    driver_id,
-                    tipo='serie' if tipo_conteudo == 'series' else 'filme',
-                    temporada=temporada,
-                    episodio=episodio,
-                    usar_driver_persistente=usar_driver_persistente
-                )
-                
                 # Verifica se foi pulado (dublado=False)
                 if resultado.get('skipped'):
                     reason = resultado.get('reason', 'Motivo não especificado')
@@ -377,7 +382,7 @@ def processar_urls():
         # IMPORTANTE: Limpar driver persistente ao final
         if usar_driver_persistente:
             print(f"\n🧹 Fechando navegador persistente...")
-            limpar_driver_persistente(driver_id)
+            limpar_todos_drivers()
     
     # Exibe estatísticas finais
     print(f"\n{'='*60}")
@@ -418,7 +423,6 @@ if __name__ == "__main__":
             print("\n\n❌ Processamento interrompido pelo usuário!")
             # Tentar limpar drivers ao interromper
             try:
-                from extracao_url import limpar_todos_drivers
                 print("🧹 Limpando drivers persistentes...")
                 limpar_todos_drivers()
             except:
@@ -429,7 +433,6 @@ if __name__ == "__main__":
             traceback.print_exc()
             # Tentar limpar drivers em caso de erro
             try:
-                from extracao_url import limpar_todos_drivers
                 print("🧹 Limpando drivers persistentes...")
                 limpar_todos_drivers()
             except:
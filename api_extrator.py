@@ -7,7 +7,7 @@ import uuid
 import os
 
 # Importar a função de extração do módulo separado
-from extracao_url import extrair_url_video, download_ublock_origin, UBLOCK_XPI
+from extracao_url import extrair_url_video, extrair_variantes_idioma, download_ublock_origin, obter_pool, estatisticas_cache_local, UBLOCK_XPI
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -31,6 +31,9 @@ def is_valid_wizercdn_url(url):
 # Baixar uBlock Origin na inicialização
 download_ublock_origin()
 
+# Aquecer o pool de navegadores (evita o cold start na primeira requisição)
+obter_pool()
+
 @app.route('/extrair', methods=['GET'])
 def extrair_video():
     """Endpoint principal de extração"""
@@ -56,16 +59,49 @@ def extrair_video():
         
         logger.info(f"[{request_id}] Nova requisição: {target_url}")
         
+        # renovar=1 ignora a URL direta do cache e resolve de novo pelo embed
+        renovar = request.args.get('renovar', '0').lower() in ('1', 'true', 'sim')
+        
+        # corrida=1 faz HTTP e navegador correrem juntos (vale a primeira URL válida)
+        corrida = request.args.get('corrida', '').lower()
+        corrida = corrida in ('1', 'true', 'sim') if corrida else None
+        
+        # prazo=N limita a extração a N segundos (0 = sem prazo; padrão PRAZO_EXTRACAO)
+        prazo = request.args.get('prazo')
+        try:
+            prazo = float(prazo) if prazo else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Parâmetro "prazo" deve ser um número de segundos',
+                'request_id': request_id
+            }), 400
+        
+        # variantes=1 colhe todos os idiomas (dublado, legendado) na mesma visita
+        variantes = request.args.get('variantes', '0').lower() in ('1', 'true', 'sim')
+        
         # Usar a função do módulo extracao_url
-        resultado = extrair_url_video(target_url, request_id)
+        if variantes:
+            resultado = extrair_variantes_idioma(target_url, request_id, usar_driver_persistente=True,
+                                                 renovar=renovar, prazo=prazo)
+        else:
+            resultado = extrair_url_video(target_url, request_id, usar_driver_persistente=True, renovar=renovar,
+                                          corrida=corrida, prazo=prazo)
         elapsed_time = time.time() - start_time
         
         if resultado['success']:
             logger.info(f"[{request_id}] Sucesso em {elapsed_time:.2f}s")
+            # Com variantes=1 o dublado pode faltar (video_repro_url nulo); 'faltando' diz quais idiomas
             return jsonify({
                 'success': True,
-                'video_repro_url': resultado['video_repro_url'],
+                'video_repro_url': resultado['video_url'],
+                'embed_url': resultado.get('embed_url'),
+                'servidor': resultado.get('servidor'),
+                'variantes': resultado.get('variantes'),
+                'faltando': resultado.get('faltando'),
+                'status': 'parcial' if resultado.get('faltando') else 'completo',
                 'from_cache': resultado.get('from_cache', False),
+                'stale': resultado.get('stale', False),
                 'processamento_tempo': f"{elapsed_time:.2f}s",
                 'extraction_time': resultado.get('extraction_time', f"{elapsed_time:.2f}s"),
                 'request_id': request_id
@@ -75,9 +111,10 @@ def extrair_video():
             return jsonify({
                 'success': False,
                 'error': resultado.get('error', 'Não foi possível extrair a URL do vídeo'),
+                'timeout': resultado.get('timeout', False),
                 'processamento_tempo': f"{elapsed_time:.2f}s",
                 'request_id': request_id
-            }), 404
+            }), 504 if resultado.get('timeout') else 404
     
     except Exception as e:
         elapsed_time = time.time() - start_time
@@ -99,6 +136,7 @@ def health():
         'status': 'OK',
         'service': 'Wizercdn + Mixdrop Extractor',
         'ublock_origin': ublock_status,
+        'cache_local': estatisticas_cache_local(),
         'features': [
             'uBlock Origin integrado',
             'Cliques com emulação de mouse',
@@ -122,6 +160,8 @@ def index():
         'ublock_origin': ublock_status,
         'endpoints': {
             '/extrair?url=<URL>': 'Extrair URL de vídeo',
+            '/extrair?url=<URL>&renovar=1': 'Renovar a URL direta a partir do embed em cache',
+            '/extrair?url=<URL>&variantes=1': 'Colher todas as variantes de idioma de uma vez',
             '/health': 'Status da API',
             '/': 'Esta página'
         },
@@ -0,0 +1,383 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: sem trava entre processos (as vagas só são exclusivas dentro do processo)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Sentinela de miss (None é um valor válido: "não encontrado")
+FALTA = object()
+
+def canonizar_url(url):
+    """Forma canônica da URL da página (esquema/host minúsculos, sem fragmento nem barra final)"""
+    try:
+        partes = urlsplit(url.strip())
+    except Exception:
+        return url
+    caminho = partes.path.rstrip('/') or '/'
+    return urlunsplit((partes.scheme.lower(), partes.netloc.lower(), caminho, partes.query, ''))
+
+def ttl_por_resultado(valor, ttl_positivo, ttl_skip, ttl_ausente):
+    """TTL conforme o tipo de resultado (registro com URL, skip ou ausente)"""
+    if valor is None:
+        return ttl_ausente
+    if isinstance(valor, dict) and valor.get('skip'):
+        return ttl_skip
+    return ttl_positivo
+
+class CacheLRU:
+    """
+    Cache em memória, thread-safe, com limite de entradas (LRU) e TTL por tipo de resultado
+
+    - positivo: registro com URL (embed e/ou direta)
+    - skip: {'skip': True, ...} (dublado=False)
+    - ausente: None (registro inexistente ou sem URL)
+    - erro: falha de consulta, guardada por pouco tempo para não martelar o Supabase
+    """
+
+    def __init__(self, max_entradas=5000, ttl_positivo=3600, ttl_skip=86400, ttl_ausente=300, ttl_erro=15):
+        self.max_entradas = max_entradas
+        self.ttl_positivo = ttl_positivo
+        self.ttl_skip = ttl_skip
+        self.ttl_ausente = ttl_ausente
+        self.ttl_erro = ttl_erro
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+        self.expirados = 0
+
+    def _ttl(self, valor):
+        return ttl_por_resultado(valor, self.ttl_positivo, self.ttl_skip, self.ttl_ausente)
+
+    def obter(self, chave):
+        """Retorna o valor guardado ou FALTA"""
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self.falhas += 1
+                return FALTA
+
+            valor, expira_em = entrada
+            if expira_em <= agora:
+                del self._entradas[chave]
+                self.expirados += 1
+                self.falhas += 1
+                return FALTA
+
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def guardar(self, chave, valor, ttl=None):
+        """Guarda o valor; sem ttl explícito usa o TTL do tipo de resultado"""
+        if ttl is None:
+            ttl = self._ttl(valor)
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entradas[chave] = (valor, time.monotonic() + ttl)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.despejos += 1
+
+    def guardar_erro(self, chave):
+        """Cache negativo curto para falhas de consulta"""
+        self.guardar(chave, None, ttl=self.ttl_erro)
+
+    def invalidar(self, chave):
+        with self._lock:
+            self._entradas.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entradas)
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'despejos': self.despejos,
+                'expirados': self.expirados,
+                'taxa_acerto': round(self.acertos / consultas, 3) if consultas else 0.0
+            }
+
+class CacheSQLite:
+    """
+    Cache em disco (SQLite em modo WAL), compartilhado entre processos do mesmo host
+
+    Indexado por (url canônica, temporada, episódio); guarda o valor em JSON, a validade
+    da entrada e a expiração da URL direta. Entradas vencidas continuam no arquivo até
+    remover_expirados() e podem ser lidas com aceitar_vencido=True (ex: Supabase fora do ar);
+    entradas cuja URL direta já expirou nunca são retornadas.
+    """
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS registros (
+            url TEXT NOT NULL,
+            temporada INTEGER NOT NULL,
+            episodio INTEGER NOT NULL,
+            valor TEXT NOT NULL,
+            expira_em REAL NOT NULL,
+            expira_url REAL,
+            gravado_em REAL NOT NULL,
+            PRIMARY KEY (url, temporada, episodio)
+        ) WITHOUT ROWID
+    """
+
+    def __init__(self, caminho, ttl_positivo=7 * 86400, ttl_skip=30 * 86400, ttl_ausente=300, timeout=5):
+        self.caminho = caminho
+        self.ttl_positivo = ttl_positivo
+        self.ttl_skip = ttl_skip
+        self.ttl_ausente = ttl_ausente
+        self.timeout = timeout
+        self._local = threading.local()
+
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conexao() as conexao:
+            conexao.execute(self.ESQUEMA)
+
+    def _conexao(self):
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)"""
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=self.timeout)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conexao = conexao
+        return conexao
+
+    @staticmethod
+    def _colunas(chave):
+        """(url,) ou (url, temporada, episodio) -> colunas; filmes usam -1"""
+        url = chave[0]
+        temporada = chave[1] if len(chave) > 1 and chave[1] is not None else -1
+        episodio = chave[2] if len(chave) > 2 and chave[2] is not None else -1
+        return canonizar_url(url), int(temporada), int(episodio)
+
+    def obter(self, chave, aceitar_vencido=False):
+        """Retorna o valor guardado ou FALTA"""
+        try:
+            linha = self._conexao().execute(
+                "SELECT valor, expira_em, expira_url FROM registros WHERE url=? AND temporada=? AND episodio=?",
+                self._colunas(chave)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.debug(f"Erro ao ler cache em disco: {e}")
+            return FALTA
+
+        if linha is None:
+            return FALTA
+
+        valor, expira_em, expira_url = linha
+        agora = time.time()
+        if expira_url is not None and expira_url <= agora:
+            return FALTA
+        if expira_em <= agora and not aceitar_vencido:
+            return FALTA
+        return json.loads(valor)
+
+    def guardar(self, chave, valor, ttl=None, expira_url=None):
+        """Grava (ou substitui) a entrada; sem ttl explícito usa o TTL do tipo de resultado"""
+        if ttl is None:
+            ttl = ttl_por_resultado(valor, self.ttl_positivo, self.ttl_skip, self.ttl_ausente)
+        if ttl <= 0:
+            return
+
+        agora = time.time()
+        try:
+            with self._conexao() as conexao:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO registros VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (*self._colunas(chave), json.dumps(valor), agora + ttl, expira_url, agora)
+                )
+        except sqlite3.Error as e:
+            logger.debug(f"Erro ao gravar cache em disco: {e}")
+
+    def invalidar(self, chave):
+        try:
+            with self._conexao() as conexao:
+                conexao.execute(
+                    "DELETE FROM registros WHERE url=? AND temporada=? AND episodio=?",
+                    self._colunas(chave)
+                )
+        except sqlite3.Error as e:
+            logger.debug(f"Erro ao invalidar cache em disco: {e}")
+
+    def remover_expirados(self, retencao=0):
+        """Apaga entradas vencidas há mais de `retencao` segundos ou com a URL direta expirada; retorna quantas"""
+        agora = time.time()
+        try:
+            with self._conexao() as conexao:
+                cursor = conexao.execute(
+                    "DELETE FROM registros WHERE expira_em < ? OR expira_url < ?", (agora - retencao, agora)
+                )
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.debug(f"Erro ao limpar cache em disco: {e}")
+            return 0
+
+    def limpar(self):
+        try:
+            with self._conexao() as conexao:
+                conexao.execute("DELETE FROM registros")
+        except sqlite3.Error as e:
+            logger.debug(f"Erro ao limpar cache em disco: {e}")
+
+    def __len__(self):
+        try:
+            return self._conexao().execute("SELECT COUNT(*) FROM registros").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+class _Execucao:
+    def __init__(self):
+        self.concluida = threading.Event()
+        self.resultado = None
+        self.excecao = None
+        self.aguardando = 0
+
+class ExecucaoUnica:
+    """
+    Coalescência de chamadas concorrentes (single-flight)
+
+    Só uma execução por chave fica em andamento; quem chega durante ela espera
+    e recebe o mesmo resultado (ou a mesma exceção).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+        self.coalescidas = 0
+
+    def executar(self, chave, funcao, *args, **kwargs):
+        """
+        Executa funcao(*args, **kwargs) ou espera a execução em andamento da mesma chave
+
+        Returns:
+            Tupla (resultado, compartilhado) - compartilhado=True para quem só esperou
+        """
+        with self._lock:
+            execucao = self._em_andamento.get(chave)
+            lider = execucao is None
+            if lider:
+                execucao = _Execucao()
+                self._em_andamento[chave] = execucao
+            else:
+                execucao.aguardando += 1
+                self.coalescidas += 1
+
+        if not lider:
+            execucao.concluida.wait()
+            if execucao.excecao is not None:
+                raise execucao.excecao
+            return execucao.resultado, True
+
+        try:
+            execucao.resultado = funcao(*args, **kwargs)
+            return execucao.resultado, False
+        except BaseException as e:
+            execucao.excecao = e
+            raise
+        finally:
+            with self._lock:
+                self._em_andamento.pop(chave, None)
+            execucao.concluida.set()
+
+    def em_andamento(self):
+        with self._lock:
+            return len(self._em_andamento)
+
+class VagasCacheHttp:
+    """
+    Diretórios de cache HTTP do Firefox reaproveitados por todos os navegadores
+
+    O cache2 do Firefox não admite dois processos no mesmo diretório: a raiz é
+    dividida em `vagas` subdiretórios e cada navegador vivo aluga um (trava de
+    arquivo, vale entre processos), devolvendo-o ao fechar com o conteúdo intacto
+    para o próximo. Cada vaga tem max_mb / vagas de capacidade, limite que o
+    próprio Firefox respeita ao despejar entradas.
+    """
+
+    def __init__(self, raiz, vagas, max_mb):
+        self.raiz = raiz
+        self.vagas = max(1, vagas)
+        self.capacidade_kb = max(1024, int(max_mb * 1024 / self.vagas))
+        self._lock = threading.Lock()
+        self._alugadas = {}
+        self.esgotadas = 0
+        os.makedirs(raiz, exist_ok=True)
+
+    def _travar(self, caminho):
+        """Arquivo de trava aberto (e travado) da vaga ou None se outro processo a usa"""
+        try:
+            os.makedirs(caminho, exist_ok=True)
+            trava = open(os.path.join(caminho, '.trava'), 'a')
+        except OSError as e:
+            logger.debug(f"Erro ao abrir vaga de cache HTTP {caminho}: {e}")
+            return None
+
+        if fcntl is None:
+            return trava
+        try:
+            fcntl.flock(trava.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return trava
+        except OSError:
+            trava.close()
+            return None
+
+    def alugar(self):
+        """Diretório de uma vaga livre ou None se todas estão em uso"""
+        with self._lock:
+            for numero in range(self.vagas):
+                caminho = os.path.join(self.raiz, f"vaga-{numero}")
+                if caminho in self._alugadas:
+                    continue
+                trava = self._travar(caminho)
+                if trava is not None:
+                    self._alugadas[caminho] = trava
+                    return caminho
+            self.esgotadas += 1
+            return None
+
+    def devolver(self, caminho):
+        """Libera a vaga (chamar só depois que o navegador que a usava saiu)"""
+        with self._lock:
+            trava = self._alugadas.pop(caminho, None)
+        if trava is not None:
+            # Fechar o arquivo solta o flock
+            trava.close()
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'vagas': self.vagas,
+                'alugadas': len(self._alugadas),
+                'capacidade_mb_por_vaga': round(self.capacidade_kb / 1024),
+                'esgotadas': self.esgotadas
+            }
@@ -0,0 +1,244 @@
+import re
+import json
+import logging
+import threading
+from fnmatch import translate
+
+logger = logging.getLogger(__name__)
+
+# Requisições consideradas como a mídia do player
+REGEX_URL_MIDIA = re.compile(r'\.(?:mp4|m3u8)(?:[?#]|$)', re.IGNORECASE)
+
+# Só aceita mídia vinda do frame do player (URL do contexto ou Referer)
+FILTRO_ORIGEM_MIDIA = re.compile(r'mixdrop', re.IGNORECASE)
+
+# Tipo de recurso -> valores de request.destination no BiDi
+DESTINOS_POR_TIPO = {
+    'image': {'image'},
+    'stylesheet': {'style'},
+    'font': {'font'},
+    'media': {'video', 'audio', 'track'},
+}
+
+def compilar_padroes_bloqueio(padroes):
+    """Converte padrões glob de URL (ex: *doubleclick.net/*) em uma única regex"""
+    padroes = [p.strip() for p in padroes if p and p.strip()]
+    if not padroes:
+        return None
+    return re.compile('|'.join(f'(?:{translate(p)})' for p in padroes), re.IGNORECASE)
+
+class CapturaRede:
+    """
+    Escuta as requisições de saída do navegador via WebDriver BiDi
+    e resolve assim que a primeira requisição de mídia (mp4/m3u8) é enviada
+
+    Com interceptação ativa também bloqueia as requisições da lista de bloqueio
+    e, depois da captura, todo o resto do tráfego (inclusive a própria mídia).
+    """
+
+    def __init__(self, ws_url, filtro_origem=FILTRO_ORIGEM_MIDIA, contexto_raiz=None,
+                 padroes_bloqueio=None, tipos_bloqueados=None, bloquear_apos_captura=True):
+        self.ws_url = ws_url
+        self.filtro_origem = filtro_origem
+        # Aba (contexto de nível superior) cujas requisições interessam; None = todas
+        self.contexto_raiz = contexto_raiz
+        self.regex_bloqueio = compilar_padroes_bloqueio(padroes_bloqueio or [])
+        self.destinos_bloqueados = set()
+        for tipo in tipos_bloqueados or []:
+            self.destinos_bloqueados |= DESTINOS_POR_TIPO.get(tipo, set())
+        self.bloquear_apos_captura = bloquear_apos_captura
+        self.interceptar = bool(self.regex_bloqueio or self.destinos_bloqueados or bloquear_apos_captura)
+        self.ativa = False
+        self.bloqueadas = 0
+        self._url = None
+        self._evento_url = threading.Event()
+        self._pronto = threading.Event()
+        self._contextos = {}
+        self._pais = {}
+        self._thread = None
+        self._token_trio = None
+        self._escopo = None
+        self._ws = None
+        self._proximo_id = 0
+        self._pendentes = {}
+        self._intercept_id = None
+        self._remocao = None
+
+    @classmethod
+    def do_driver(cls, driver, **kwargs):
+        """Cria a captura para o driver, se a sessão foi aberta com webSocketUrl"""
+        ws_url = (driver.capabilities or {}).get('webSocketUrl')
+        if not isinstance(ws_url, str):
+            return None
+        return cls(ws_url, **kwargs)
+
+    def iniciar(self, timeout=5):
+        """Conecta ao BiDi e assina os eventos de rede; retorna True se ativa"""
+        self._thread = threading.Thread(target=self._executar_loop, daemon=True)
+        self._thread.start()
+        self._pronto.wait(timeout)
+        return self.ativa
+
+    def _executar_loop(self):
+        try:
+            import trio
+            trio.run(self._executar)
+        except Exception as e:
+            logger.debug(f"Captura de rede encerrada: {e}")
+        finally:
+            self.ativa = False
+            self._pronto.set()
+
+    async def _enviar(self, metodo, params, tipo=None):
+        self._proximo_id += 1
+        if tipo:
+            self._pendentes[self._proximo_id] = tipo
+        await self._ws.send_message(json.dumps({'id': self._proximo_id, 'method': metodo, 'params': params}))
+
+    async def _executar(self):
+        import trio
+        from trio_websocket import open_websocket_url
+
+        self._token_trio = trio.lowlevel.current_trio_token()
+        self._remocao = trio.Event()
+
+        with trio.CancelScope() as escopo:
+            self._escopo = escopo
+            async with open_websocket_url(self.ws_url) as ws:
+                self._ws = ws
+
+                if self.interceptar:
+                    intercept = {'phases': ['beforeRequestSent']}
+                    if self.contexto_raiz:
+                        intercept['contexts'] = [self.contexto_raiz]
+                    await self._enviar('network.addIntercept', intercept, 'intercept')
+
+                await self._enviar('session.subscribe', {'events': [
+                    'network.beforeRequestSent',
+                    'browsingContext.navigationStarted',
+                    'browsingContext.contextCreated'
+                ]}, 'subscribe')
+
+                while True:
+                    mensagem = json.loads(await ws.get_message())
+                    resposta = self._processar(mensagem)
+                    if resposta:
+                        await self._enviar(*resposta)
+
+    def _processar(self, mensagem):
+        """Trata uma mensagem do BiDi; retorna (método, params) a enviar, se houver"""
+        tipo = self._pendentes.pop(mensagem.get('id'), None)
+
+        if tipo == 'subscribe':
+            self.ativa = 'error' not in mensagem
+            if not self.ativa:
+                logger.debug(f"BiDi recusou a assinatura: {mensagem.get('message')}")
+            self._pronto.set()
+            return None
+
+        if tipo == 'intercept':
+            if 'error' in mensagem:
+                logger.debug(f"BiDi recusou a interceptação: {mensagem.get('message')}")
+            else:
+                self._intercept_id = (mensagem.get('result') or {}).get('intercept')
+            return None
+
+        if tipo == 'remocao':
+            self._remocao.set()
+            return None
+
+        metodo = mensagem.get('method')
+        params = mensagem.get('params') or {}
+
+        if metodo == 'browsingContext.contextCreated':
+            self._pais[params.get('context')] = params.get('parent')
+
+        elif metodo == 'browsingContext.navigationStarted':
+            self._contextos[params.get('context')] = params.get('url') or ''
+
+        elif metodo == 'network.beforeRequestSent':
+            requisicao = params.get('request') or {}
+            url = requisicao.get('url') or ''
+            midia = bool(REGEX_URL_MIDIA.search(url))
+
+            if (midia and not self._evento_url.is_set()
+                    and self._pertence_a_aba(params.get('context'))
+                    and self._origem_valida(params, requisicao)):
+                self._url = url
+                self._evento_url.set()
+
+            if params.get('isBlocked') and self._intercept_id in (params.get('intercepts') or []):
+                if self._deve_bloquear(url, requisicao, midia):
+                    self.bloqueadas += 1
+                    return 'network.failRequest', {'request': requisicao.get('request')}
+                return 'network.continueRequest', {'request': requisicao.get('request')}
+
+        return None
+
+    def _deve_bloquear(self, url, requisicao, midia):
+        # URL já capturada: não baixar a mídia nem mais nada da página
+        if self.bloquear_apos_captura and (self._evento_url.is_set() or midia):
+            return True
+        if requisicao.get('destination') in self.destinos_bloqueados:
+            return True
+        return bool(self.regex_bloqueio and self.regex_bloqueio.search(url))
+
+    def _pertence_a_aba(self, contexto):
+        """Sobe a árvore de frames até o contexto de nível superior"""
+        if not self.contexto_raiz:
+            return True
+
+        visitados = set()
+        while contexto and contexto not in visitados:
+            if contexto == self.contexto_raiz:
+                return True
+            visitados.add(contexto)
+            contexto = self._pais.get(contexto)
+        return False
+
+    def _origem_valida(self, params, requisicao):
+        """Confere se a requisição partiu do frame do player"""
+        if not self.filtro_origem:
+            return True
+
+        if self.filtro_origem.search(self._contextos.get(params.get('context'), '')):
+            return True
+
+        for header in requisicao.get('headers') or []:
+            if (header.get('name') or '').lower() == 'referer':
+                valor = (header.get('value') or {}).get('value') or ''
+                return bool(self.filtro_origem.search(valor))
+
+        return False
+
+    @property
+    def url(self):
+        return self._url
+
+    def aguardar(self, timeout):
+        """Bloqueia até a primeira URL de mídia ou o timeout"""
+        if self._evento_url.wait(timeout):
+            return self._url
+        return None
+
+    async def _encerrar(self):
+        import trio
+
+        # A interceptação sobrevive à conexão: precisa ser removida antes de sair
+        if self._ws and self._intercept_id:
+            with trio.move_on_after(2):
+                await self._enviar('network.removeIntercept', {'intercept': self._intercept_id}, 'remocao')
+                await self._remocao.wait()
+        self._escopo.cancel()
+
+    def parar(self):
+        """Remove a interceptação e encerra a conexão BiDi"""
+        if self._token_trio and self._escopo:
+            try:
+                import trio
+                trio.from_thread.run(self._encerrar, trio_token=self._token_trio)
+            except Exception:
+                pass
+        if self._thread:
+            self._thread.join(timeout=3)
+        self.ativa = False
@@ -0,0 +1,433 @@
+import math
+import time
+import heapq
+import random
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Granularidade das esperas que respeitam cancelamento
+FATIA_CANCELAMENTO = 0.5
+
+# Contexto da tentativa em execução na thread (prazo visto pelas etapas sem recebê-lo)
+_local = threading.local()
+
+class ExtracaoCancelada(Exception):
+    """A tentativa perdeu a corrida (ou a extração foi abandonada)"""
+
+class PrazoExcedido(ExtracaoCancelada):
+    """O prazo total da extração venceu"""
+
+class ContextoExtracao:
+    """
+    Estado de uma tentativa de extração: cancelamento cooperativo e prazo
+
+    A tentativa checa o contexto entre etapas (verificar) e nas esperas longas
+    (esperar); cancelar o pai cancela também os contextos filhos, que herdam
+    o prazo dele. Prazo vencido conta como cancelamento.
+    """
+
+    def __init__(self, pai=None, prazo=None):
+        self.pai = pai
+        # Instante limite em time.monotonic() (None = sem prazo próprio)
+        self.prazo = prazo
+        self._cancelado = threading.Event()
+
+    @classmethod
+    def com_prazo(cls, segundos, pai=None):
+        """Contexto que vence daqui a `segundos` (None ou 0 = sem prazo)"""
+        return cls(pai=pai, prazo=time.monotonic() + segundos if segundos else None)
+
+    @property
+    def limite(self):
+        """Prazo efetivo: o menor entre o próprio e os dos pais"""
+        limites = [c.prazo for c in self._cadeia() if c.prazo is not None]
+        return min(limites) if limites else None
+
+    def _cadeia(self):
+        contexto = self
+        while contexto is not None:
+            yield contexto
+            contexto = contexto.pai
+
+    def restante(self):
+        """Segundos até o prazo (None sem prazo)"""
+        limite = self.limite
+        return None if limite is None else max(0.0, limite - time.monotonic())
+
+    @property
+    def expirado(self):
+        limite = self.limite
+        return limite is not None and time.monotonic() >= limite
+
+    @property
+    def cancelado(self):
+        return any(c._cancelado.is_set() for c in self._cadeia()) or self.expirado
+
+    def cancelar(self):
+        self._cancelado.set()
+
+    def verificar(self):
+        """Levanta PrazoExcedido ou ExtracaoCancelada se a tentativa não deve continuar"""
+        if self.expirado:
+            raise PrazoExcedido()
+        if self.cancelado:
+            raise ExtracaoCancelada()
+
+    def esperar(self, segundos):
+        """Dorme até `segundos` ou até o cancelamento; retorna True se cancelado"""
+        limite = time.monotonic() + segundos
+        while not self.cancelado:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return False
+            self._cancelado.wait(min(restante, FATIA_CANCELAMENTO))
+        return True
+
+def verificar_cancelamento(contexto):
+    """contexto.verificar() aceitando contexto None (execução sem corrida)"""
+    if contexto is not None:
+        contexto.verificar()
+
+def contexto_atual():
+    """Contexto da tentativa rodando nesta thread (None fora de correr)"""
+    return getattr(_local, 'contexto', None)
+
+@contextmanager
+def em_contexto(contexto):
+    """Torna o contexto o atual da thread durante o bloco (prazo visível às etapas)"""
+    anterior = contexto_atual()
+    _local.contexto = contexto
+    try:
+        yield contexto
+    finally:
+        _local.contexto = anterior
+
+def limitar_ao_prazo(segundos, contexto=None):
+    """Corta uma espera no que resta do prazo (do contexto dado ou o da thread)"""
+    contexto = contexto if contexto is not None else contexto_atual()
+    restante = contexto.restante() if contexto is not None else None
+    return segundos if restante is None else min(segundos, restante)
+
+class Vigia:
+    """
+    Thread única que executa ações quando prazos vencem (ex: matar uma sessão
+    do navegador travada em um comando que não respeita cancelamento)
+    """
+
+    def __init__(self):
+        self._condicao = threading.Condition()
+        self._agenda = []
+        self._cancelados = set()
+        self._proximo = 0
+        self._thread = None
+        self.disparos = 0
+
+    def agendar(self, limite, acao):
+        """Executa acao() em time.monotonic() >= limite, se não cancelada antes; retorna o token"""
+        with self._condicao:
+            self._proximo += 1
+            token = self._proximo
+            heapq.heappush(self._agenda, (limite, token, acao))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, daemon=True, name="vigia")
+                self._thread.start()
+            self._condicao.notify_all()
+        return token
+
+    def cancelar(self, token):
+        with self._condicao:
+            if any(item[1] == token for item in self._agenda):
+                self._cancelados.add(token)
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                while True:
+                    # Descarta as canceladas do topo sem esperar o prazo delas
+                    while self._agenda and self._agenda[0][1] in self._cancelados:
+                        self._cancelados.discard(heapq.heappop(self._agenda)[1])
+                    if not self._agenda:
+                        self._condicao.wait()
+                        continue
+                    espera = self._agenda[0][0] - time.monotonic()
+                    if espera <= 0:
+                        _, _, acao = heapq.heappop(self._agenda)
+                        break
+                    self._condicao.wait(espera)
+                self.disparos += 1
+
+            try:
+                acao()
+            except Exception as e:
+                logger.error(f"Erro na ação do vigia: {e}")
+
+    def pendentes(self):
+        with self._condicao:
+            return len(self._agenda) - len(self._cancelados)
+
+class HistoricoLatencias:
+    """Janela das últimas durações observadas, para percentis (ex: p90 do hedge)"""
+
+    def __init__(self, max_amostras=200, min_amostras=20):
+        self.min_amostras = min_amostras
+        self._amostras = deque(maxlen=max_amostras)
+        self._lock = threading.Lock()
+
+    def registrar(self, segundos):
+        with self._lock:
+            self._amostras.append(segundos)
+
+    def percentil(self, p):
+        """Percentil p (0-1) pelo método do posto mais próximo; None com poucas amostras"""
+        with self._lock:
+            if len(self._amostras) < max(self.min_amostras, 1):
+                return None
+            ordenadas = sorted(self._amostras)
+        return ordenadas[max(0, math.ceil(p * len(ordenadas)) - 1)]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._amostras)
+
+class HistoricoEstrategias:
+    """
+    Desempenho de cada estratégia por (servidor, tipo de conteúdo)
+
+    Conta tentativas e sucessos e guarda as durações dos sucessos. Com amostras
+    suficientes de todas as estratégias, ordena pelo custo esperado (mediana do
+    sucesso / taxa de sucesso) e sugere a espera de cada uma pelo percentil dos
+    sucessos. Uma fração das extrações (exploracao) usa a ordem e as esperas
+    padrão, para o histórico não ficar preso ao que já foi aprendido.
+    """
+
+    def __init__(self, max_amostras=200, min_amostras=10, exploracao=0.05):
+        self.max_amostras = max_amostras
+        self.min_amostras = min_amostras
+        self.exploracao = exploracao
+        self._historicos = {}
+        self._lock = threading.Lock()
+
+    def _historico(self, servidor, tipo, estrategia):
+        chave = (servidor or '*', tipo or '*', estrategia)
+        with self._lock:
+            historico = self._historicos.get(chave)
+            if historico is None:
+                historico = {'tentativas': 0, 'sucessos': 0,
+                             'duracoes': HistoricoLatencias(self.max_amostras, self.min_amostras)}
+                self._historicos[chave] = historico
+            return historico
+
+    def registrar(self, servidor, tipo, estrategia, sucesso, segundos):
+        historico = self._historico(servidor, tipo, estrategia)
+        with self._lock:
+            historico['tentativas'] += 1
+            if sucesso:
+                historico['sucessos'] += 1
+        if sucesso:
+            historico['duracoes'].registrar(segundos)
+
+    def explorar(self):
+        """Sorteia se esta extração ignora o aprendido (ordem e esperas padrão)"""
+        return random.random() < self.exploracao
+
+    def custo_esperado(self, servidor, tipo, estrategia):
+        """Segundos esperados até um sucesso; None sem amostras suficientes"""
+        historico = self._historico(servidor, tipo, estrategia)
+        with self._lock:
+            tentativas, sucessos = historico['tentativas'], historico['sucessos']
+        if tentativas < self.min_amostras:
+            return None
+        if not sucessos:
+            return math.inf
+        mediana = historico['duracoes'].percentil(0.5)
+        if mediana is None:
+            # Poucos sucessos entre muitas tentativas: pior que qualquer estratégia medida
+            return math.inf
+        return mediana / (sucessos / tentativas)
+
+    def ordenar(self, servidor, tipo, estrategias):
+        """Estratégias da mais barata para a mais cara; ordem original se faltar histórico"""
+        custos = [self.custo_esperado(servidor, tipo, e) for e in estrategias]
+        if any(c is None for c in custos):
+            return list(estrategias)
+        return [e for _, _, e in sorted(zip(custos, range(len(estrategias)), estrategias))]
+
+    def orcamento(self, servidor, tipo, estrategia, padrao, percentil=0.95, folga=1.0, minimo=1.0):
+        """
+        Espera da estratégia: percentil dos sucessos (com folga), entre minimo e padrao
+
+        Só registre durações de esperas não cortadas (padrao inteiro): sucessos que
+        passariam do orçamento vigente não aparecem nas cortadas e ele só encolheria.
+        """
+        aprendido = self._historico(servidor, tipo, estrategia)['duracoes'].percentil(percentil)
+        if aprendido is None:
+            return padrao
+        return min(padrao, max(minimo, aprendido * folga))
+
+    def estatisticas(self):
+        with self._lock:
+            itens = list(self._historicos.items())
+        return {
+            '/'.join(chave): {
+                'tentativas': historico['tentativas'],
+                'sucessos': historico['sucessos'],
+                'p50': historico['duracoes'].percentil(0.5),
+                'p95': historico['duracoes'].percentil(0.95)
+            }
+            for chave, historico in itens
+        }
+
+class TemposEtapas:
+    """
+    Latências recentes de cada etapa da extração (carregar a página, achar o iframe...)
+
+    O timeout da etapa passa a ser multiplicador x percentil (p99) das durações de
+    sucesso, entre o piso (minimo) e o teto (o timeout padrão, ajustado para o pior caso).
+    Etapas que estouram o timeout adaptativo entram como o teto (a duração real é
+    desconhecida), senão uma etapa que ficou mais lenta nunca mais teria sucesso
+    para o timeout voltar a subir.
+    """
+
+    def __init__(self, percentil=0.99, multiplicador=2.0, minimo=1.0, max_amostras=200, min_amostras=20):
+        self.percentil = percentil
+        self.multiplicador = multiplicador
+        self.minimo = minimo
+        self.max_amostras = max_amostras
+        self.min_amostras = min_amostras
+        self._etapas = {}
+        self._lock = threading.Lock()
+
+    def _historico(self, etapa):
+        with self._lock:
+            historico = self._etapas.get(etapa)
+            if historico is None:
+                historico = HistoricoLatencias(self.max_amostras, self.min_amostras)
+                self._etapas[etapa] = historico
+            return historico
+
+    def registrar(self, etapa, segundos):
+        """Duração de uma etapa concluída com sucesso"""
+        self._historico(etapa).registrar(segundos)
+
+    def registrar_estouro(self, etapa, teto):
+        """Etapa cortada pelo timeout adaptativo: conta como o teto"""
+        self._historico(etapa).registrar(teto)
+
+    def timeout(self, etapa, padrao):
+        """Timeout da etapa; o padrão enquanto não houver amostras suficientes"""
+        observado = self._historico(etapa).percentil(self.percentil)
+        if observado is None:
+            return padrao
+        return min(padrao, max(self.minimo, observado * self.multiplicador))
+
+    def estatisticas(self):
+        with self._lock:
+            itens = list(self._etapas.items())
+        return {
+            etapa: {'amostras': len(historico), 'p50': historico.percentil(0.5),
+                    'p99': historico.percentil(self.percentil)}
+            for etapa, historico in itens
+        }
+
+def correr(tentativas, valido, contexto=None, aguardar_perdedores=False):
+    """
+    Executa tentativas concorrentes e fica com o primeiro resultado válido
+
+    Cada tentativa é (nome, funcao, atraso); funcao recebe um ContextoExtracao
+    próprio e deve checá-lo entre etapas. O atraso define quando ela começa:
+    - número: após esse tempo (0 = já), se ainda não houver vencedor e outra
+      tentativa continuar rodando (hedge); se todas já falharam, não começa
+    - None: só quando as tentativas em andamento tiverem falhado (sequencial)
+    Com um vencedor as demais são canceladas; sem aguardar_perdedores elas
+    terminam sozinhas em segundo plano (liberando os próprios recursos).
+
+    Args:
+        tentativas: Lista de (nome, funcao, atraso)
+        valido: Função que diz se o resultado encerra a corrida
+        contexto: Contexto pai (cancelá-lo, ou vencer o prazo dele, encerra a corrida inteira)
+        aguardar_perdedores: Se True, só retorna depois que as canceladas terminarem
+
+    Returns:
+        Tupla (nome, resultado) do vencedor ou (None, resultado da última que falhou)
+    """
+    condicao = threading.Condition()
+    pendentes = list(tentativas)
+    estado = {'rodando': 0, 'iniciadas': 0, 'vencedor': None, 'ultimo': None}
+    contextos = []
+    threads = []
+    inicio = time.monotonic()
+
+    def executar(nome, funcao, ctx):
+        try:
+            with em_contexto(ctx):
+                resultado = funcao(ctx)
+        except ExtracaoCancelada:
+            resultado = None
+        except Exception as e:
+            logger.debug(f"Tentativa {nome} falhou: {e}")
+            resultado = {'success': False, 'error': str(e)}
+
+        with condicao:
+            estado['rodando'] -= 1
+            if resultado is not None and estado['vencedor'] is None:
+                if valido(resultado):
+                    estado['vencedor'] = (nome, resultado)
+                else:
+                    estado['ultimo'] = resultado
+            condicao.notify_all()
+
+    def iniciar(nome, funcao):
+        ctx = ContextoExtracao(pai=contexto)
+        thread = threading.Thread(target=executar, args=(nome, funcao, ctx), daemon=True,
+                                  name=f"corrida-{nome}")
+        contextos.append(ctx)
+        threads.append(thread)
+        estado['rodando'] += 1
+        estado['iniciadas'] += 1
+        thread.start()
+
+    with condicao:
+        while estado['vencedor'] is None and not (contexto is not None and contexto.cancelado):
+            decorrido = time.monotonic() - inicio
+            proxima_em = None
+
+            for tentativa in list(pendentes):
+                nome, funcao, atraso = tentativa
+                if atraso is None:
+                    continue
+                if decorrido < atraso:
+                    proxima_em = atraso - decorrido if proxima_em is None else min(proxima_em, atraso - decorrido)
+                    continue
+                pendentes.remove(tentativa)
+                if estado['rodando'] or not estado['iniciadas']:
+                    iniciar(nome, funcao)
+
+            if not estado['rodando']:
+                sequencial = next((t for t in pendentes if t[2] is None), None)
+                if sequencial is None:
+                    break
+                pendentes.remove(sequencial)
+                iniciar(sequencial[0], sequencial[1])
+                continue
+
+            condicao.wait(min(proxima_em if proxima_em is not None else FATIA_CANCELAMENTO,
+                              FATIA_CANCELAMENTO))
+
+        vencedor = estado['vencedor']
+        ultimo = estado['ultimo']
+
+    for ctx in contextos:
+        ctx.cancelar()
+
+    # Com o prazo vencido não se espera ninguém: o vigia cuida das tentativas travadas
+    if aguardar_perdedores and not (contexto is not None and contexto.expirado):
+        for thread in threads:
+            thread.join(contexto.restante() if contexto is not None else None)
+
+    if vencedor is None and contexto is not None and contexto.cancelado:
+        contexto.verificar()
+    return vencedor if vencedor is not None else (None, ultimo)
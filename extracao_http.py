@@ -0,0 +1,436 @@
+import re
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse, urlencode, parse_qs
+import requests
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0"
+
+# Servidor e idioma preferidos (data-lang="2" = dublado)
+SERVIDOR_PREFERIDO = "mixdrop"
+IDIOMA_DUBLADO = "2"
+IDIOMA_LEGENDADO = "1"
+
+# Caminho do getEmbed relativo ao domínio do embed
+CAMINHO_GET_EMBED = "/getEmbed.php"
+
+# Número máximo de saltos (iframe / redirecionamento JS) até o player
+MAX_SALTOS = 4
+
+# Servidores resolvidos em paralelo quando se colhe alternativas
+MAX_SERVIDORES_PARALELOS = 4
+
+# Padrões de extração
+REGEX_ATRIBUTOS = re.compile(r'([\w-]+)\s*=\s*["\']([^"\']*)["\']')
+REGEX_GET_EMBED = re.compile(r'["\']([^"\'\s<>]*getEmbed[^"\'\s<>]*)["\']')
+REGEX_IFRAME_SRC = re.compile(r'<iframe[^>]+src\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+REGEX_REDIRECIONAMENTO_JS = re.compile(
+    r'location(?:\.href)?\s*(?:=|\.replace\(|\.assign\()\s*["\']([^"\']+)["\']'
+)
+REGEX_META_REFRESH = re.compile(
+    r'<meta[^>]+http-equiv\s*=\s*["\']refresh["\'][^>]+url=([^"\'>\s]+)', re.IGNORECASE
+)
+REGEX_PACKED = re.compile(
+    r"}\s*\(\s*'(.*?)'\s*,\s*(\d+|\[\])\s*,\s*(\d+)\s*,\s*'(.*?)'\.split\('\|'\)",
+    re.DOTALL
+)
+REGEX_MDCORE = re.compile(r'MDCore\.(?:wurl|vsrc|furl)\s*=\s*["\']([^"\']+)["\']')
+REGEX_URL_MIDIA = re.compile(r'((?:https?:)?//[^"\'\s<>]+\.(?:mp4|m3u8)(?:\?[^"\'\s<>]*)?)')
+REGEX_TAG = re.compile(r'<(/?)([a-zA-Z][\w-]*)\b([^>]*)>')
+
+# Tags sem fechamento (não entram na pilha de ancestrais) e tags cujo conteúdo não é HTML
+TAGS_VAZIAS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+TAGS_TEXTO = {'script', 'style'}
+
+ALFABETO_BASE62 = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Uma sessão HTTP por thread (reaproveita conexões keep-alive)
+_sessoes = threading.local()
+
+def obter_sessao():
+    """Retorna a sessão HTTP da thread atual"""
+    sessao = getattr(_sessoes, 'sessao', None)
+    if sessao is None:
+        sessao = requests.Session()
+        sessao.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "pt-BR,pt;q=0.9,en;q=0.8"
+        })
+        _sessoes.sessao = sessao
+    return sessao
+
+def _converter_base(palavra, base):
+    """Converte uma palavra do P.A.C.K.E.R. para inteiro na base informada"""
+    if base <= 36:
+        return int(palavra, base)
+
+    valor = 0
+    for caractere in palavra:
+        valor = valor * base + ALFABETO_BASE62.index(caractere)
+    return valor
+
+def desempacotar_js(codigo):
+    """Decodifica scripts no formato eval(function(p,a,c,k,e,d)...)"""
+    match = REGEX_PACKED.search(codigo)
+    if not match:
+        return None
+
+    payload, base, contagem, simbolos = match.groups()
+    base = 62 if base == '[]' else int(base)
+    contagem = int(contagem)
+    simbolos = simbolos.split('|')
+
+    if len(simbolos) != contagem:
+        logger.debug(f"Tabela de símbolos inconsistente ({len(simbolos)} != {contagem})")
+        return None
+
+    payload = payload.replace("\\\\", "\\").replace("\\'", "'")
+
+    def substituir(m):
+        palavra = m.group(0)
+        try:
+            indice = _converter_base(palavra, base)
+        except ValueError:
+            return palavra
+        if indice < len(simbolos) and simbolos[indice]:
+            return simbolos[indice]
+        return palavra
+
+    return re.sub(r'\b\w+\b', substituir, payload)
+
+def extrair_servidores(html):
+    """
+    Retorna os atributos de cada server-selector do HTML
+
+    Como no fluxo com navegador, os que estão dentro de um elemento com a classe
+    hidden (ou a têm) recebem 'oculto' e os sem data-id herdam o do ancestral
+    mais próximo que tiver (closest('.hidden') e closest('[data-id]')).
+    """
+    resultado = []
+    pilha = []  # (tag, oculto, data-id herdado) dos elementos abertos
+    posicao = 0
+
+    while True:
+        match = REGEX_TAG.search(html, posicao)
+        if not match:
+            return resultado
+        posicao = match.end()
+        fechamento, tag, bruto = match.groups()
+        tag = tag.lower()
+
+        if fechamento:
+            # Fecha até o elemento correspondente (tolera tags sem fechamento no meio)
+            for indice in range(len(pilha) - 1, -1, -1):
+                if pilha[indice][0] == tag:
+                    del pilha[indice:]
+                    break
+            continue
+
+        atributos = dict(REGEX_ATRIBUTOS.findall(bruto))
+        oculto = bool(pilha and pilha[-1][1]) or 'hidden' in atributos.get('class', '').split()
+        data_id = atributos.get('data-id') or (pilha[-1][2] if pilha else None)
+
+        if tag == 'server-selector':
+            if oculto:
+                atributos['oculto'] = '1'
+            if data_id and not atributos.get('data-id'):
+                atributos['data-id'] = data_id
+            resultado.append(atributos)
+
+        if tag in TAGS_TEXTO:
+            fim = html.lower().find(f'</{tag}', posicao)
+            posicao = len(html) if fim < 0 else fim
+        elif tag not in TAGS_VAZIAS and not bruto.rstrip().endswith('/'):
+            pilha.append((tag, oculto, data_id))
+
+def audios_ocultos(html):
+    """playeroptions-audios com a classe hidden (página só legendada); None se não houver o elemento"""
+    match = re.search(r'<playeroptions-audios\b([^>]*)>', html, re.IGNORECASE)
+    if not match:
+        return None
+    return 'hidden' in dict(REGEX_ATRIBUTOS.findall(match.group(1))).get('class', '')
+
+def construir_url_get_embed(url_pagina, atributos, lang=IDIOMA_DUBLADO):
+    """Monta a URL do getEmbed a partir dos atributos do server-selector"""
+    servidor = atributos.get('data-server')
+    conteudo_id = atributos.get('data-id') or atributos.get('data-content-id')
+
+    if not servidor or not conteudo_id:
+        return None
+
+    parsed = urlparse(url_pagina)
+    params = urlencode({
+        'id': conteudo_id,
+        'sv': servidor,
+        'lang': atributos.get('data-lang') or lang
+    })
+    return f"{parsed.scheme}://{parsed.netloc}{CAMINHO_GET_EMBED}?{params}"
+
+def escolher_servidor(servidores, servidor_preferido=SERVIDOR_PREFERIDO, lang=IDIOMA_DUBLADO):
+    """Escolhe o server-selector preferido para o idioma (mesma ordem do fluxo com navegador)"""
+    do_idioma = [s for s in servidores if s.get('data-lang') == lang and not s.get('oculto')]
+
+    for atributos in do_idioma:
+        if atributos.get('data-server') == servidor_preferido:
+            return atributos
+
+    return do_idioma[0] if do_idioma else None
+
+def ranquear_servidores(servidores, lang=IDIOMA_DUBLADO, ordem=(SERVIDOR_PREFERIDO,)):
+    """Um server-selector por servidor do idioma, na ordem de preferência (configurada, depois a da página)"""
+    unicos = {}
+    for atributos in servidores:
+        nome = atributos.get('data-server')
+        if atributos.get('data-lang') == lang and not atributos.get('oculto') and nome and nome not in unicos:
+            unicos[nome] = atributos
+
+    ordem = list(ordem)
+    return sorted(unicos.values(), key=lambda a: ordem.index(a['data-server']) if a['data-server'] in ordem else len(ordem))
+
+def servidor_da_url_get_embed(url_get_embed):
+    """Nome do servidor (parâmetro sv) de uma URL do getEmbed"""
+    try:
+        return (parse_qs(urlparse(url_get_embed).query).get('sv') or [None])[0]
+    except Exception:
+        return None
+
+def encontrar_url_get_embed(html, url_pagina, servidor_preferido=SERVIDOR_PREFERIDO, lang=IDIOMA_DUBLADO):
+    """Encontra (ou monta) a URL do getEmbed na página do warezcdn"""
+    servidores = extrair_servidores(html)
+    atributos = escolher_servidor(servidores, servidor_preferido, lang)
+
+    if atributos:
+        url_embed = construir_url_get_embed(url_pagina, atributos, lang)
+        if url_embed:
+            return url_embed
+
+    # Fallback: URL do getEmbed já presente no HTML
+    for candidata in REGEX_GET_EMBED.findall(html):
+        if f"sv={servidor_preferido}" in candidata or not atributos:
+            return urljoin(url_pagina, candidata.replace('&amp;', '&'))
+
+    return None
+
+def _proximo_salto(html, url_atual):
+    """Encontra o próximo documento da cadeia (iframe, location.href ou meta refresh)"""
+    for regex in (REGEX_IFRAME_SRC, REGEX_REDIRECIONAMENTO_JS, REGEX_META_REFRESH):
+        for candidata in regex.findall(html):
+            if candidata and not candidata.startswith(('about:', 'javascript:', '#')):
+                return urljoin(url_atual, candidata.replace('&amp;', '&'))
+    return None
+
+def normalizar_url_midia(url_midia):
+    """Completa URLs relativas ao protocolo (//host/...)"""
+    if url_midia.startswith('//'):
+        return f"https:{url_midia}"
+    return url_midia
+
+def extrair_url_midia(html):
+    """Extrai a URL direta da mídia, decodificando scripts empacotados"""
+    trechos = [html]
+
+    for match in re.finditer(r'eval\(function\(p,a,c,k,e,d\).*?\.split\(\'\|\'\)[^)]*\)\)', html, re.DOTALL):
+        desempacotado = desempacotar_js(match.group(0))
+        if desempacotado:
+            trechos.insert(0, desempacotado)
+
+    for trecho in trechos:
+        match = REGEX_MDCORE.search(trecho)
+        if match:
+            return normalizar_url_midia(match.group(1))
+
+        match = REGEX_URL_MIDIA.search(trecho)
+        if match:
+            return normalizar_url_midia(match.group(1))
+
+    return None
+
+def resolver_player_http(url_player, referer=None, timeout=10, sessao=None):
+    """
+    Segue a cadeia de iframes/redirecionamentos a partir de um embed até a URL da mídia
+
+    Returns:
+        Tupla (url_midia, url_embed_final) ou (None, ultima_url_visitada)
+    """
+    sessao = sessao or obter_sessao()
+    url_atual = url_player
+
+    for _ in range(MAX_SALTOS):
+        headers = {"Referer": referer} if referer else {}
+        response = sessao.get(url_atual, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        html = response.text
+        url_atual = response.url
+
+        url_midia = extrair_url_midia(html)
+        if url_midia:
+            return url_midia, url_atual
+
+        proximo = _proximo_salto(html, url_atual)
+        if not proximo or proximo == url_atual:
+            break
+
+        referer = url_atual
+        url_atual = proximo
+
+    return None, url_atual
+
+def resolver_servidores_http(url_pagina, servidores, lang=IDIOMA_DUBLADO, ordem=(SERVIDOR_PREFERIDO,), ignorar=(),
+                             max_servidores=MAX_SERVIDORES_PARALELOS, timeout=10):
+    """
+    Resolve vários servidores do idioma em paralelo
+
+    Returns:
+        Lista dos que funcionaram, na ordem de preferência:
+        [{'servidor', 'embed_url', 'video_url'}, ...]
+    """
+    candidatos = [a for a in ranquear_servidores(servidores, lang, ordem)
+                  if a['data-server'] not in ignorar][:max_servidores]
+    if not candidatos:
+        return []
+
+    def resolver(atributos):
+        url_get_embed = construir_url_get_embed(url_pagina, atributos, lang)
+        if not url_get_embed:
+            return None
+        try:
+            # Sessão da thread do executor (requests.Session não é thread-safe)
+            url_midia, url_embed = resolver_player_http(url_get_embed, referer=url_pagina, timeout=timeout)
+        except Exception as e:
+            logger.debug(f"Servidor {atributos['data-server']} falhou: {e}")
+            return None
+        if url_midia and len(url_midia) > 20:
+            return {'servidor': atributos['data-server'], 'embed_url': url_embed, 'video_url': url_midia}
+        return None
+
+    with ThreadPoolExecutor(max_workers=len(candidatos)) as executor:
+        resultados = list(executor.map(resolver, candidatos))
+    return [r for r in resultados if r]
+
+def extrair_url_video_http(url, timeout=10, servidor_preferido=SERVIDOR_PREFERIDO, sessao=None,
+                           ordem_servidores=None):
+    """
+    Extrai a URL do vídeo usando apenas requisições HTTP (sem navegador)
+
+    Args:
+        url: URL da página do warezcdn
+        timeout: Timeout de cada requisição
+        servidor_preferido: Servidor a ser seguido (ex: 'mixdrop')
+        sessao: Sessão requests opcional
+        ordem_servidores: Preferência dos demais servidores, tentados em paralelo se o
+                          preferido falhar (None = só o preferido)
+
+    Returns:
+        Dicionário com 'success', 'video_url', 'embed_url', 'servidor', 'dublado' e 'error';
+        também 'url_pagina' e 'servidores' (atributos) para colher alternativas depois,
+        e 'alternativas' quando o preferido falhou e outros servidores responderam;
+        página só legendada dá {'success': False, 'dublado': False, 'motivo', 'erro'}
+    """
+    sessao = sessao or obter_sessao()
+
+    try:
+        response = sessao.get(url, timeout=timeout)
+        response.raise_for_status()
+        html = response.text
+
+        # Mesma checagem de dublagem do fluxo com navegador
+        if audios_ocultos(html):
+            logger.info("Conteúdo legendado (playeroptions-audios oculto)")
+            return {'success': False, 'error': 'Conteúdo legendado', 'dublado': False,
+                    'motivo': 'Conteúdo legendado', 'erro': False}
+
+        # Sem opção dublada no HTML estático não dá para decidir: deixa para o navegador
+        servidores_dublados = [
+            s for s in extrair_servidores(html)
+            if s.get('data-lang') == IDIOMA_DUBLADO and not s.get('oculto')
+        ]
+        if not servidores_dublados and not REGEX_GET_EMBED.search(html):
+            return {'success': False, 'error': 'Servidor dublado não encontrado no HTML', 'dublado': None}
+
+        servidores = extrair_servidores(html)
+        pagina = {'url_pagina': response.url, 'servidores': servidores}
+
+        url_get_embed = encontrar_url_get_embed(html, response.url, servidor_preferido)
+        servidor = servidor_da_url_get_embed(url_get_embed) if url_get_embed else None
+
+        if url_get_embed:
+            logger.info(f"getEmbed: {url_get_embed}")
+            try:
+                url_midia, url_embed = resolver_player_http(url_get_embed, referer=response.url, timeout=timeout, sessao=sessao)
+            except Exception as e:
+                logger.debug(f"Servidor preferido falhou: {e}")
+                url_midia, url_embed = None, None
+
+            if url_midia and len(url_midia) > 20:
+                return dict(pagina, success=True, video_url=url_midia, embed_url=url_embed,
+                            servidor=servidor, dublado=True)
+
+        # Preferido falhou: os demais servidores em paralelo, o melhor colocado vira o principal
+        if ordem_servidores is not None:
+            funcionando = resolver_servidores_http(response.url, servidores, IDIOMA_DUBLADO, ordem_servidores,
+                                                   ignorar={servidor}, timeout=timeout)
+            if funcionando:
+                principal = funcionando[0]
+                logger.info(f"Servidor preferido falhou, usando {principal['servidor']}")
+                return dict(pagina, success=True, video_url=principal['video_url'], embed_url=principal['embed_url'],
+                            servidor=principal['servidor'], alternativas=funcionando[1:], dublado=True)
+
+        erro = 'URL da mídia não encontrada no player' if url_get_embed else 'URL do getEmbed não encontrada'
+        return dict(pagina, success=False, error=erro, dublado=None)
+
+    except Exception as e:
+        logger.debug(f"Erro na extração HTTP: {e}")
+        return {'success': False, 'error': str(e), 'dublado': None}
+
+def idiomas_disponiveis(servidores):
+    """Idiomas (data-lang) com algum server-selector visível na página"""
+    return sorted({s.get('data-lang') for s in servidores if s.get('data-lang') and not s.get('oculto')})
+
+def extrair_variantes_http(url, idiomas=(IDIOMA_DUBLADO, IDIOMA_LEGENDADO), timeout=10,
+                           servidor_preferido=SERVIDOR_PREFERIDO, sessao=None):
+    """
+    Extrai a URL de cada variante de idioma com uma única leitura da página
+
+    Returns:
+        Dicionário com 'variantes' (idioma -> {'video_url', 'embed_url'}), 'disponiveis'
+        (idiomas pedidos que existem na página), 'existentes' (todos os idiomas da página),
+        'url_pagina' e 'error'
+    """
+    sessao = sessao or obter_sessao()
+    resultado = {'variantes': {}, 'disponiveis': [], 'existentes': [], 'url_pagina': url, 'error': None}
+
+    try:
+        response = sessao.get(url, timeout=timeout)
+        response.raise_for_status()
+        servidores = extrair_servidores(response.text)
+        resultado['url_pagina'] = response.url
+    except Exception as e:
+        logger.debug(f"Erro ao ler página para variantes: {e}")
+        resultado['error'] = str(e)
+        return resultado
+
+    resultado['existentes'] = idiomas_disponiveis(servidores)
+    if audios_ocultos(response.text):
+        resultado['existentes'] = [i for i in resultado['existentes'] if i != IDIOMA_DUBLADO]
+    resultado['disponiveis'] = [i for i in idiomas if i in resultado['existentes']]
+
+    for idioma in resultado['disponiveis']:
+        atributos = escolher_servidor(servidores, servidor_preferido, idioma)
+        url_get_embed = construir_url_get_embed(response.url, atributos, idioma) if atributos else None
+        if not url_get_embed:
+            continue
+
+        try:
+            url_midia, url_embed = resolver_player_http(url_get_embed, referer=response.url, timeout=timeout, sessao=sessao)
+        except Exception as e:
+            logger.debug(f"Erro ao resolver variante {idioma}: {e}")
+            continue
+
+        if url_midia and len(url_midia) > 20:
+            resultado['variantes'][idioma] = {'video_url': url_midia, 'embed_url': url_embed}
+
+    return resultado
@@ -3,18 +3,39 @@ import logging
 import os
 from dotenv import load_dotenv
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.remote.webelement import WebElement
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import requests
 import platform
 import zipfile
 import tarfile
+import threading
+import json
+import shutil
+import hashlib
+import tempfile
+import signal
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from queue import Queue, Empty
+from urllib.parse import urlparse, parse_qs
+from extracao_http import (extrair_url_video_http, escolher_servidor, construir_url_get_embed,
+                            resolver_player_http, extrair_variantes_http, idiomas_disponiveis,
+                            resolver_servidores_http, servidor_da_url_get_embed,
+                            SERVIDOR_PREFERIDO, IDIOMA_DUBLADO, IDIOMA_LEGENDADO)
+from captura_rede import CapturaRede, REGEX_URL_MIDIA
+from cache_extracao import CacheLRU, CacheSQLite, ExecucaoUnica, VagasCacheHttp, FALTA, canonizar_url
+from supervisor_processos import CgroupNavegadores, ColetorOrfaos, memoria_arvore
+from corrida_extracao import (ExtracaoCancelada, PrazoExcedido, ContextoExtracao, HistoricoLatencias,
+                              HistoricoEstrategias, TemposEtapas, Vigia, correr, verificar_cancelamento,
+                              contexto_atual, em_contexto, limitar_ao_prazo, FATIA_CANCELAMENTO)
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,6 +45,7 @@ logging.getLogger('urllib3').setLevel(logging.ERROR)
 # Diretórios
 EXTENSIONS_DIR = os.path.join(os.getcwd(), 'extensions')
 UBLOCK_XPI = os.path.join(EXTENSIONS_DIR, 'ublock_origin.xpi')
+UBLOCK_ID = 'uBlock0@raymondhill.net'
 DRIVERS_DIR = os.path.join(os.getcwd(), 'drivers')
 GECKODRIVER_PATH = os.path.join(DRIVERS_DIR, 'geckodriver.exe' if platform.system() == 'Windows' else 'geckodriver')
 
@@ -35,22 +57,382 @@ SUPABASE_APIKEY = os.getenv("SUPABASE_APIKEY")
 SUPABASE_TABLE_FILMES = "filmes_url_warezcdn"
 SUPABASE_TABLE_SERIES = "series_url_warezcdn"
 
-# Cache local para evitar chamadas repetidas ao Supabase
-_cache_local = {}
+# Cache local (LRU + TTL) para evitar chamadas repetidas ao Supabase
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "5000"))
+CACHE_TTL_POSITIVO = int(os.getenv("CACHE_TTL_POSITIVO", "3600"))
+CACHE_TTL_SKIP = int(os.getenv("CACHE_TTL_SKIP", "86400"))
+CACHE_TTL_AUSENTE = int(os.getenv("CACHE_TTL_AUSENTE", "300"))
+CACHE_TTL_ERRO = int(os.getenv("CACHE_TTL_ERRO", "15"))
+_cache_local = CacheLRU(
+    max_entradas=CACHE_MAX_ENTRADAS,
+    ttl_positivo=CACHE_TTL_POSITIVO,
+    ttl_skip=CACHE_TTL_SKIP,
+    ttl_ausente=CACHE_TTL_AUSENTE,
+    ttl_erro=CACHE_TTL_ERRO
+)
 
-# Gerenciador de drivers persistentes
-_drivers_pool = {}
+# Cache em disco (SQLite) atrás do cache em memória: sobrevive a reinícios, é
+# compartilhado entre os processos do host e responde com o Supabase fora do ar
+CACHE_DISCO_HABILITADO = os.getenv("CACHE_DISCO_HABILITADO", "1") == "1"
+CACHE_DISCO_ARQUIVO = os.getenv("CACHE_DISCO_ARQUIVO", os.path.join(os.getcwd(), 'cache', 'extracao.sqlite3'))
+CACHE_DISCO_TTL_POSITIVO = int(os.getenv("CACHE_DISCO_TTL_POSITIVO", str(7 * 86400)))
+CACHE_DISCO_TTL_SKIP = int(os.getenv("CACHE_DISCO_TTL_SKIP", str(30 * 86400)))
+_cache_disco = None
+if CACHE_DISCO_HABILITADO:
+    try:
+        _cache_disco = CacheSQLite(
+            CACHE_DISCO_ARQUIVO,
+            ttl_positivo=CACHE_DISCO_TTL_POSITIVO,
+            ttl_skip=CACHE_DISCO_TTL_SKIP,
+            ttl_ausente=CACHE_TTL_AUSENTE
+        )
+        # Vencidas ficam um tempo como reserva para quedas do Supabase
+        _cache_disco.remover_expirados(retencao=CACHE_DISCO_TTL_POSITIVO)
+    except Exception as e:
+        logger.warning(f"Cache em disco indisponível ({e}), usando só memória")
+
+# Validade das URLs diretas (o mixdrop assina as URLs com um parâmetro de expiração)
+# Fresca até MARGEM_EXPIRACAO_URL segundos antes de expirar; nessa janela é servida
+# obsoleta enquanto uma extração em segundo plano renova; depois de expirar é miss
+MARGEM_EXPIRACAO_URL = int(os.getenv("MARGEM_EXPIRACAO_URL", "600"))
+PARAMETROS_EXPIRACAO_URL = ('e', 'expires', 'expire', 'expiry', 'exp', 'validto')
+REVALIDACAO_MAX_THREADS = int(os.getenv("REVALIDACAO_MAX_THREADS", "2"))
+_revalidacoes_em_andamento = set()
+_revalidacoes_lock = threading.Lock()
+_executor_revalidacao = None
+
+# Uma extração por filme/episódio em andamento; chamadas concorrentes esperam o resultado
+COALESCER_EXTRACOES = os.getenv("COALESCER_EXTRACOES", "1") == "1"
+_extracoes_em_andamento = ExecucaoUnica()
+
+# Pool de navegadores persistentes (ver PoolNavegadores)
+POOL_MIN_OCIOSOS = int(os.getenv("POOL_MIN_OCIOSOS", "1"))
+POOL_MAX_NAVEGADORES = int(os.getenv("POOL_MAX_NAVEGADORES", "4"))
+# Reciclagem após POOL_MAX_USOS extrações ou POOL_MAX_IDADE segundos (0 = sem limite)
+POOL_MAX_USOS = int(os.getenv("POOL_MAX_USOS", "50"))
+POOL_MAX_IDADE = int(os.getenv("POOL_MAX_IDADE", "1800"))
+POOL_TIMEOUT_CHECKOUT = int(os.getenv("POOL_TIMEOUT_CHECKOUT", "60"))
+POOL_INTERVALO_MANUTENCAO = 10
+
+# Navegador cuja árvore de processos (geckodriver + Firefox + abas) passar deste limite
+# é reciclado no próximo checkout; amostrado de /proc a cada manutenção do pool (0 = desligado)
+NAVEGADOR_MEMORIA_MAX_MB = int(os.getenv("NAVEGADOR_MEMORIA_MAX_MB", "1536"))
+
+# Cgroup v2 por navegador (opcional): pasta delegada ao usuário do processo (vazio = desligado),
+# limite de memória em MB, cota de CPU (em CPUs, ex: 1.5) e CPUs para pinagem (ex: "0-7")
+NAVEGADOR_CGROUP_RAIZ = os.getenv("NAVEGADOR_CGROUP_RAIZ", "")
+NAVEGADOR_CGROUP_MEMORIA_MB = int(os.getenv("NAVEGADOR_CGROUP_MEMORIA_MB", "2048"))
+NAVEGADOR_CGROUP_CPU = float(os.getenv("NAVEGADOR_CGROUP_CPU", "0"))
+NAVEGADOR_CGROUP_CPUS = os.getenv("NAVEGADOR_CGROUP_CPUS", "")
+NAVEGADOR_CGROUP_CPUS_POR_NAVEGADOR = int(os.getenv("NAVEGADOR_CGROUP_CPUS_POR_NAVEGADOR", "1"))
+_cgroups = None
+_cgroups_lock = threading.Lock()
+
+# Extrações simultâneas por navegador no modo multi-abas
+ABAS_POR_NAVEGADOR = int(os.getenv("ABAS_POR_NAVEGADOR", "4"))
+_pool_navegadores = None
+_pool_lock = threading.Lock()
+
+# Estratégia de carregamento de página ('normal', 'eager' ou 'none')
+# 'eager' faz o driver.get retornar no DOMContentLoaded, sem esperar sub-recursos
+PAGE_LOAD_STRATEGY = os.getenv("FIREFOX_PAGE_LOAD_STRATEGY", "normal")
+
+# Perfil modelo do Firefox (uBlock + preferências) clonado em tmpfs a cada sessão
+USAR_PERFIL_MODELO = os.getenv("USAR_PERFIL_MODELO", "1") == "1"
+PERFIL_BASE_DIR = os.getenv("PERFIL_BASE_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+PERFIL_MODELO_DIR = os.path.join(PERFIL_BASE_DIR, "wcdn_perfil_modelo")
+_perfil_modelo = None
+_perfil_modelo_lock = threading.Lock()
+
+# Coletor de navegadores órfãos: cada processo anota em COLETOR_ESTADO_DIR os pids e perfis
+# dos navegadores que criou; na partida e a cada COLETOR_INTERVALO segundos, os de processos
+# mortos são mortos e seus perfis apagados (clones soltos, depois de COLETOR_IDADE_PERFIS)
+COLETOR_ORFAOS_HABILITADO = os.getenv("COLETOR_ORFAOS_HABILITADO", "1") == "1"
+COLETOR_ESTADO_DIR = os.getenv("COLETOR_ESTADO_DIR", os.path.join(tempfile.gettempdir(), "wcdn_navegadores"))
+COLETOR_INTERVALO = int(os.getenv("COLETOR_INTERVALO", "300"))
+COLETOR_IDADE_PERFIS = int(os.getenv("COLETOR_IDADE_PERFIS", "3600"))
+_coletor_orfaos = None
+_coletor_lock = threading.Lock()
+
+# Cache HTTP em disco compartilhado pelos navegadores (scripts do warezcdn, do mixdrop e do
+# video.js baixados uma vez); cookies e storage continuam zerados a cada extração.
+# CACHE_HTTP_MAX_MB é o total, dividido entre CACHE_HTTP_VAGAS diretórios (ver VagasCacheHttp)
+CACHE_HTTP_NAVEGADOR = os.getenv("CACHE_HTTP_NAVEGADOR", "0") == "1"
+CACHE_HTTP_DIR = os.getenv("CACHE_HTTP_DIR", os.path.join(tempfile.gettempdir(), "wcdn_cache_http"))
+CACHE_HTTP_MAX_MB = int(os.getenv("CACHE_HTTP_MAX_MB", "256"))
+CACHE_HTTP_VAGAS = int(os.getenv("CACHE_HTTP_VAGAS", str(POOL_MAX_NAVEGADORES)))
+_caches_http = None
+_caches_http_lock = threading.Lock()
+
+# Abre o src dos iframes (getEmbed e player) como documento principal em vez de trocar de frame
+NAVEGACAO_DIRETA_IFRAMES = os.getenv("NAVEGACAO_DIRETA_IFRAMES", "1") == "1"
+
+# Seletores dos episódios na página da série (percorridos sem recarregar a página)
+SELETORES_EPISODIO = os.getenv(
+    "SELETORES_EPISODIO",
+    "[data-episode],[data-episodio],[data-ep],episode-selector,[data-load-episode-content]"
+)
+
+# Variantes de idioma colhidas por extrair_variantes_idioma (data-lang) e as colunas
+# (embed, URL direta) de cada uma; o dublado usa as colunas principais
+IDIOMAS_VARIANTES = [i.strip() for i in os.getenv("IDIOMAS_VARIANTES", f"{IDIOMA_DUBLADO},{IDIOMA_LEGENDADO}").split(",") if i.strip()]
+COLUNAS_POR_IDIOMA = {
+    IDIOMA_LEGENDADO: tuple(os.getenv("COLUNAS_LEGENDADO", "video_url_legendado,video_repro_url_legendado").split(",")),
+}
+
+# Servidores em ordem de preferência (os demais da página vêm depois, na ordem dela);
+# os que funcionarem além do principal ficam guardados, ranqueados, para servir
+# quando o link principal morrer (coluna JSON em COLUNA_ALTERNATIVAS)
+ORDEM_SERVIDORES = [s.strip() for s in os.getenv("ORDEM_SERVIDORES", SERVIDOR_PREFERIDO).split(",") if s.strip()]
+COLHER_ALTERNATIVAS = os.getenv("COLHER_ALTERNATIVAS", "1") == "1"
+COLUNA_ALTERNATIVAS = os.getenv("COLUNA_ALTERNATIVAS", "servidores_alternativos")
+_coluna_alternativas_ativa = bool(COLUNA_ALTERNATIVAS)
+_executor_alternativas = None
+_alternativas_lock = threading.Lock()
+
+# Corrida de estratégias: HTTP e navegador ao mesmo tempo, fica a primeira URL válida
+# (as perdedoras são canceladas); no player o play é clicado após CORRIDA_ESPERA_PASSIVA
+# segundos em vez de esperar a extração passiva inteira
+CORRIDA_HABILITADA = os.getenv("CORRIDA_HABILITADA", "0") == "1"
+CORRIDA_ESPERA_PASSIVA = float(os.getenv("CORRIDA_ESPERA_PASSIVA", "2"))
+
+# Hedge: extração no navegador passando do percentil observado (p90) ganha uma
+# duplicata em outro navegador do pool; vale a que terminar primeiro
+HEDGE_HABILITADO = os.getenv("HEDGE_HABILITADO", "1") == "1"
+HEDGE_PERCENTIL = float(os.getenv("HEDGE_PERCENTIL", "0.9"))
+HEDGE_MIN_AMOSTRAS = int(os.getenv("HEDGE_MIN_AMOSTRAS", "20"))
+HEDGE_ATRASO_MINIMO = float(os.getenv("HEDGE_ATRASO_MINIMO", "3"))
+_latencias_navegador = HistoricoLatencias(min_amostras=HEDGE_MIN_AMOSTRAS)
+_vitorias_estrategias = {}
+_vitorias_lock = threading.Lock()
+
+# Ordem e esperas das estratégias aprendidas do histórico, por servidor e tipo de conteúdo:
+# a de menor custo esperado primeiro, com a espera cortada no percentil (p95) dos sucessos
+ESTRATEGIAS_ADAPTATIVAS = os.getenv("ESTRATEGIAS_ADAPTATIVAS", "1") == "1"
+ORCAMENTO_PERCENTIL = float(os.getenv("ORCAMENTO_PERCENTIL", "0.95"))
+ORCAMENTO_FOLGA = float(os.getenv("ORCAMENTO_FOLGA", "1.0"))
+ORCAMENTO_MINIMO = float(os.getenv("ORCAMENTO_MINIMO", "1"))
+_historico_estrategias = HistoricoEstrategias(
+    min_amostras=int(os.getenv("HISTORICO_MIN_AMOSTRAS", "10")),
+    exploracao=float(os.getenv("EXPLORACAO_ESTRATEGIAS", "0.05"))
+)
+
+# Timeout de cada etapa (carregar a página, achar iframes, player...) = multiplicador x p99
+# recente da etapa, entre TIMEOUT_ETAPA_MINIMO e o timeout fixo de antes (teto)
+TIMEOUTS_ADAPTATIVOS = os.getenv("TIMEOUTS_ADAPTATIVOS", "1") == "1"
+TIMEOUT_CARREGAMENTO_PAGINA = int(os.getenv("TIMEOUT_CARREGAMENTO_PAGINA", "20"))
+_tempos_etapas = TemposEtapas(
+    percentil=float(os.getenv("TIMEOUT_ETAPA_PERCENTIL", "0.99")),
+    multiplicador=float(os.getenv("TIMEOUT_ETAPA_MULTIPLICADOR", "2")),
+    minimo=float(os.getenv("TIMEOUT_ETAPA_MINIMO", "1")),
+    min_amostras=int(os.getenv("TIMEOUT_ETAPA_MIN_AMOSTRAS", "20"))
+)
+
+# Prazo total de uma extração em segundos (0 = sem prazo), limitando também cada etapa;
+# vencido, a extração retorna timeout e o vigia mata a sessão do navegador que
+# continuar presa em um comando (PRAZO_TOLERANCIA segundos depois)
+PRAZO_EXTRACAO = float(os.getenv("PRAZO_EXTRACAO", "120"))
+PRAZO_TOLERANCIA = float(os.getenv("PRAZO_TOLERANCIA", "3"))
+_vigia = Vigia()
+
+# Monta a URL do getEmbed pelos atributos dos seletores em vez de clicar
+CONSTRUIR_URL_EMBED = os.getenv("CONSTRUIR_URL_EMBED", "1") == "1"
+
+# Tenta a extração só com HTTP antes de abrir o Firefox
+EXTRACAO_HTTP_HABILITADA = os.getenv("EXTRACAO_HTTP_HABILITADA", "1") == "1"
+
+# Captura a URL da mídia pelas requisições de rede (WebDriver BiDi)
+CAPTURA_REDE_HABILITADA = os.getenv("CAPTURA_REDE_HABILITADA", "1") == "1"
+
+# Lista de bloqueio de rede (padrões glob de URL, separados por vírgula)
+PADROES_BLOQUEIO_PADRAO = [
+    "*google-analytics.com/*",
+    "*googletagmanager.com/*",
+    "*doubleclick.net/*",
+    "*googlesyndication.com/*",
+    "*adservice.google.*",
+    "*facebook.net/*",
+    "*hotjar.com/*",
+    "*fonts.googleapis.com/*",
+    "*fonts.gstatic.com/*",
+    "*.woff*",
+    "*.ttf*",
+]
+PADROES_BLOQUEIO = [p for p in os.getenv("PADROES_BLOQUEIO", ",".join(PADROES_BLOQUEIO_PADRAO)).split(",") if p.strip()]
+
+# Tipos de recurso bloqueados (image, stylesheet, font, tracker, media)
+TIPOS_RECURSO_BLOQUEADOS = [t.strip() for t in os.getenv("TIPOS_RECURSO_BLOQUEADOS", "image,stylesheet,font,tracker").split(",") if t.strip()]
+
+# Interromper todo o tráfego da página assim que a URL do vídeo for capturada
+INTERROMPER_APOS_CAPTURA = os.getenv("INTERROMPER_APOS_CAPTURA", "1") == "1"
 
 if not SUPABASE_APIKEY:
     logger.error("SUPABASE_APIKEY não encontrada!")
 
+def eh_url_midia(url):
+    """Diferencia a URL direta da mídia (mp4/m3u8) da URL do embed"""
+    return bool(url and REGEX_URL_MIDIA.search(url))
+
+def separar_camadas_registro(registro):
+    """
+    Separa as duas camadas do cache de um registro do Supabase
+    
+    - video_url: embed do player (estável, mantido indefinidamente)
+    - video_repro_url: URL direta da mídia (expira, é resolvida de novo a partir do embed)
+    
+    Registros antigos guardam a URL direta em video_url e não têm embed.
+    Servidores alternativos (ranqueados) vêm da coluna COLUNA_ALTERNATIVAS.
+    
+    Returns:
+        Dicionário com 'embed_url', 'video_url' (URL direta) e 'alternativas' ou None se vazio
+    """
+    embed_url = registro.get('video_url')
+    video_url = registro.get('video_repro_url')
+    alternativas = registro.get(COLUNA_ALTERNATIVAS) if COLUNA_ALTERNATIVAS else None
+    
+    if isinstance(alternativas, str):
+        try:
+            alternativas = json.loads(alternativas)
+        except ValueError:
+            alternativas = None
+    
+    if eh_url_midia(embed_url):
+        video_url = video_url or embed_url
+        embed_url = None
+    
+    if not embed_url and not video_url and not alternativas:
+        return None
+    return {'embed_url': embed_url, 'video_url': video_url, 'alternativas': alternativas or []}
+
+def expiracao_url(url):
+    """Lê o instante de expiração (epoch em segundos) dos parâmetros da URL, se houver"""
+    try:
+        params = parse_qs(urlparse(url).query)
+    except Exception:
+        return None
+    
+    for nome in PARAMETROS_EXPIRACAO_URL:
+        for valor in params.get(nome, []):
+            if valor.isdigit():
+                instante = int(valor)
+                # Alguns CDNs usam milissegundos
+                return instante / 1000 if instante > 10 ** 12 else instante
+    return None
+
+def estado_url_cache(url, agora=None):
+    """
+    Classifica uma URL direta do cache pela expiração
+    
+    Returns:
+        'fresca', 'obsoleta' (dentro da margem, servir e renovar) ou 'expirada'
+        URLs sem expiração legível são consideradas frescas
+    """
+    expira_em = expiracao_url(url)
+    if expira_em is None:
+        return 'fresca'
+    
+    restante = expira_em - (agora if agora is not None else time.time())
+    if restante <= 0:
+        return 'expirada'
+    if restante <= MARGEM_EXPIRACAO_URL:
+        return 'obsoleta'
+    return 'fresca'
+
+def chave_registro(url_pagina, tipo='filme', temporada=None, episodio=None):
+    """Chave compacta de um registro (filme ou episódio)"""
+    url_pagina = canonizar_url(url_pagina)
+    if tipo == 'serie':
+        return (url_pagina, temporada, episodio)
+    return (url_pagina,)
+
+def formas_url(url_pagina):
+    """
+    Formas da URL que podem estar gravadas no Supabase: a canônica (usada nos registros
+    novos e no cache), com barra final e a URL como veio (registros anteriores à canonização)
+    """
+    canonica = canonizar_url(url_pagina)
+    formas = [canonica]
+    if not canonica.endswith('/') and '?' not in canonica:
+        formas.append(canonica + '/')
+    if url_pagina not in formas:
+        formas.append(url_pagina)
+    return formas
+
+def filtro_url(url_pagina):
+    """Filtro PostgREST da coluna url que casa qualquer forma gravada da URL"""
+    valores = ",".join('"' + f.replace('\\', '\\\\').replace('"', '\\"') + '"' for f in formas_url(url_pagina))
+    return f"in.({valores})"
+
+def _registro_canonico(registros, url_pagina):
+    """Com a mesma página gravada em mais de uma forma, prefere a canônica"""
+    canonica = canonizar_url(url_pagina)
+    return next((r for r in registros if r.get('url') == canonica), registros[0])
+
+def guardar_cache(chave, valor):
+    """Grava o registro na memória e no disco (com a expiração da URL direta)"""
+    _cache_local.guardar(chave, valor)
+    if _cache_disco is not None:
+        url_direta = valor.get('video_url') if isinstance(valor, dict) else None
+        _cache_disco.guardar(chave, valor, expira_url=expiracao_url(url_direta) if url_direta else None)
+
+def invalidar_cache(chave):
+    _cache_local.invalidar(chave)
+    if _cache_disco is not None:
+        _cache_disco.invalidar(chave)
+
+def _registro_utilizavel(valor):
+    """Registro do cache ainda serve (não é URL direta expirada)"""
+    return not (isinstance(valor, dict) and valor.get('video_url')
+                and estado_url_cache(valor['video_url']) == 'expirada')
+
+def _cache_disco_vencido(cache_key):
+    """Com o Supabase inacessível, aceita a entrada em disco mesmo vencida, se ainda servir"""
+    if _cache_disco is None:
+        return FALTA
+    valor = _cache_disco.obter(cache_key, aceitar_vencido=True)
+    if valor is not FALTA and valor is not None and _registro_utilizavel(valor):
+        logger.info("Supabase indisponível - usando registro do cache em disco")
+        return valor
+    return FALTA
+
+def _consultar_com_alternativas(tabela, headers, params):
+    """GET no Supabase incluindo a coluna de alternativas; se ela não existir, desativa e repete sem"""
+    global _coluna_alternativas_ativa
+    
+    if _coluna_alternativas_ativa:
+        com_coluna = dict(params, select=f"{params['select']},{COLUNA_ALTERNATIVAS}")
+        response = requests.get(f"{SUPABASE_URL}/rest/v1/{tabela}", headers=headers, params=com_coluna, timeout=10)
+        if not (response.status_code == 400 and COLUNA_ALTERNATIVAS in response.text):
+            return response
+        logger.warning(f"Coluna {COLUNA_ALTERNATIVAS} não existe no Supabase - alternativas só no cache local")
+        _coluna_alternativas_ativa = False
+    
+    return requests.get(f"{SUPABASE_URL}/rest/v1/{tabela}", headers=headers, params=params, timeout=10)
+
 def buscar_dados_supabase(url_pagina, tipo='filme', temporada=None, episodio=None):
-    """Busca os dados completos do registro no Supabase com cache local"""
-    cache_key = f"{url_pagina}_{tipo}_{temporada}_{episodio}"
+    """
+    Busca os dados completos do registro no Supabase com cache local
+    
+    Returns:
+        {'skip': True, ...} para dublado=False, {'embed_url', 'video_url'} ou None
+    """
+    cache_key = chave_registro(url_pagina, tipo, temporada, episodio)
+    
+    cacheado = _cache_local.obter(cache_key)
+    origem = "memória"
+    if cacheado is FALTA and _cache_disco is not None:
+        cacheado = _cache_disco.obter(cache_key)
+        origem = "disco"
     
-    if cache_key in _cache_local:
-        logger.info(f"Retornando do cache local")
-        return _cache_local[cache_key]
+    if cacheado is not FALTA:
+        # URL direta expirada: outro processo pode já ter renovado no Supabase
+        if not _registro_utilizavel(cacheado):
+            invalidar_cache(cache_key)
+        else:
+            logger.info(f"Retornando do cache local ({origem})")
+            if origem == "disco":
+                _cache_local.guardar(cache_key, cacheado)
+            return cacheado
     
     try:
         headers = {
@@ -67,56 +449,56 @@ def buscar_dados_supabase(url_pagina, tipo='filme', temporada=None, episodio=Non
                 return None
             
             params = {
-                "select": "url,video_url,dublado,temporada_numero,episodio_numero",
-                "url": f"eq.{url_pagina}",
+                "select": "url,video_url,video_repro_url,dublado,temporada_numero,episodio_numero",
+                "url": filtro_url(url_pagina),
                 "temporada_numero": f"eq.{temporada}",
                 "episodio_numero": f"eq.{episodio}"
             }
         else:
             params = {
-                "select": "url,video_url,dublado",
-                "url": f"eq.{url_pagina}"
+                "select": "url,video_url,video_repro_url,dublado",
+                "url": filtro_url(url_pagina)
             }
         
-        response = requests.get(
-            f"{SUPABASE_URL}/rest/v1/{tabela}",
-            headers=headers,
-            params=params,
-            timeout=10
-        )
+        response = _consultar_com_alternativas(tabela, headers, params)
         
         if response.status_code == 200:
             data = response.json()
             if data and len(data) > 0:
-                registro = data[0]
+                registro = _registro_canonico(data, url_pagina)
                 logger.info(f"Registro encontrado no Supabase")
                 
                 resultado = None
                 if registro.get('dublado') is False:
                     logger.info("Registro com dublado=False - pulando extração")
                     resultado = {'skip': True, 'reason': 'dublado=False'}
-                elif registro.get('dublado') is True and registro.get('video_url'):
-                    logger.info(f"video_url encontrada e dublado=True")
-                    resultado = registro.get('video_url')
-                elif registro.get('video_url'):
-                    logger.info(f"video_url encontrada")
-                    resultado = registro.get('video_url')
                 else:
-                    logger.info("Registro existe mas video_url está vazio")
-                    resultado = None
+                    resultado = separar_camadas_registro(registro)
+                    if resultado:
+                        logger.info(f"Registro com embed={'sim' if resultado['embed_url'] else 'não'}, "
+                                    f"URL direta={'sim' if resultado['video_url'] else 'não'}")
+                    else:
+                        logger.info("Registro existe mas video_url está vazio")
                 
-                _cache_local[cache_key] = resultado
+                guardar_cache(cache_key, resultado)
                 return resultado
             else:
                 logger.info("URL não encontrada no Supabase")
+                guardar_cache(cache_key, None)
                 return None
         else:
             logger.error(f"Erro ao buscar no Supabase: {response.status_code}")
-            return None
             
     except Exception as e:
         logger.error(f"Erro ao buscar dados no Supabase: {e}")
-        return None
+    
+    vencido = _cache_disco_vencido(cache_key)
+    if vencido is not FALTA:
+        _cache_local.guardar(cache_key, vencido, ttl=CACHE_TTL_ERRO)
+        return vencido
+    
+    _cache_local.guardar_erro(cache_key)
+    return None
 
 def verificar_existe_supabase(url_pagina, tipo='filme', temporada=None, episodio=None):
     """Verifica se o registro existe no Supabase"""
@@ -136,14 +518,14 @@ def verificar_existe_supabase(url_pagina, tipo='filme', temporada=None, episodio
             
             params = {
                 "select": "url",
-                "url": f"eq.{url_pagina}",
+                "url": filtro_url(url_pagina),
                 "temporada_numero": f"eq.{temporada}",
                 "episodio_numero": f"eq.{episodio}"
             }
         else:
             params = {
                 "select": "url",
-                "url": f"eq.{url_pagina}"
+                "url": filtro_url(url_pagina)
             }
         
         response = requests.get(
@@ -166,8 +548,16 @@ def verificar_existe_supabase(url_pagina, tipo='filme', temporada=None, episodio
         logger.error(f"Erro ao verificar existência no Supabase: {e}")
         return False
 
-def atualizar_supabase(url_pagina, video_url, dublado=True, tipo='filme', temporada=None, episodio=None):
-    """Atualiza ou cria registro no Supabase"""
+def atualizar_supabase(url_pagina, video_url, dublado=True, tipo='filme', temporada=None, episodio=None,
+                       embed_url=None):
+    """
+    Atualiza ou cria registro no Supabase
+    
+    Args:
+        video_url: URL direta da mídia (coluna video_repro_url)
+        embed_url: Embed do player (coluna video_url); None preserva o valor gravado,
+                   exceto quando não há URL nenhuma (ex: dublado=False), que limpa as duas
+    """
     try:
         headers = {
             "apikey": SUPABASE_APIKEY,
@@ -184,19 +574,21 @@ def atualizar_supabase(url_pagina, video_url, dublado=True, tipo='filme', tempor
             
             if tipo == 'serie':
                 params = {
-                    "url": f"eq.{url_pagina}",
+                    "url": filtro_url(url_pagina),
                     "temporada_numero": f"eq.{temporada}",
                     "episodio_numero": f"eq.{episodio}"
                 }
             else:
                 params = {
-                    "url": f"eq.{url_pagina}"
+                    "url": filtro_url(url_pagina)
                 }
             
             data = {
-                "video_url": video_url,
+                "video_repro_url": video_url,
                 "dublado": dublado
             }
+            if embed_url or not video_url:
+                data["video_url"] = embed_url
             
             response = requests.patch(
                 f"{SUPABASE_URL}/rest/v1/{tabela}",
@@ -209,8 +601,7 @@ def atualizar_supabase(url_pagina, video_url, dublado=True, tipo='filme', tempor
             if response.status_code in [200, 204]:
                 logger.info(f"Registro atualizado no Supabase com sucesso")
                 # Limpar cache local
-                cache_key = f"{url_pagina}_{tipo}_{temporada}_{episodio}"
-                _cache_local.pop(cache_key, None)
+                invalidar_cache(chave_registro(url_pagina, tipo, temporada, episodio))
                 return True
             else:
                 logger.error(f"Erro ao atualizar no Supabase: {response.status_code} - {response.text}")
@@ -224,16 +615,18 @@ def atualizar_supabase(url_pagina, video_url, dublado=True, tipo='filme', tempor
                     return False
                 
                 data = {
-                    "url": url_pagina,
-                    "video_url": video_url,
+                    "url": canonizar_url(url_pagina),
+                    "video_url": embed_url,
+                    "video_repro_url": video_url,
                     "dublado": dublado,
                     "temporada_numero": temporada,
                     "episodio_numero": episodio
                 }
             else:
                 data = {
-                    "url": url_pagina,
-                    "video_url": video_url,
+                    "url": canonizar_url(url_pagina),
+                    "video_url": embed_url,
+                    "video_repro_url": video_url,
                     "dublado": dublado
                 }
             
@@ -247,8 +640,7 @@ def atualizar_supabase(url_pagina, video_url, dublado=True, tipo='filme', tempor
             if response.status_code in [200, 201, 204]:
                 logger.info(f"Novo registro criado no Supabase com sucesso")
                 # Limpar cache local
-                cache_key = f"{url_pagina}_{tipo}_{temporada}_{episodio}"
-                _cache_local.pop(cache_key, None)
+                invalidar_cache(chave_registro(url_pagina, tipo, temporada, episodio))
                 return True
             else:
                 logger.error(f"Erro ao criar no Supabase: {response.status_code} - {response.text}")
@@ -258,6 +650,83 @@ def atualizar_supabase(url_pagina, video_url, dublado=True, tipo='filme', tempor
         logger.error(f"Erro ao atualizar Supabase: {e}")
         return False
 
+def atualizar_alternativas_supabase(url_pagina, alternativas, tipo='filme', temporada=None, episodio=None):
+    """Grava os servidores alternativos ranqueados (o registro já deve existir)"""
+    if not _coluna_alternativas_ativa:
+        return False
+    
+    try:
+        headers = {
+            "apikey": SUPABASE_APIKEY,
+            "Authorization": f"Bearer {SUPABASE_APIKEY}",
+            "Content-Type": "application/json",
+            "Prefer": "return=minimal"
+        }
+        
+        tabela = SUPABASE_TABLE_SERIES if tipo == 'serie' else SUPABASE_TABLE_FILMES
+        params = {"url": filtro_url(url_pagina)}
+        if tipo == 'serie':
+            params["temporada_numero"] = f"eq.{temporada}"
+            params["episodio_numero"] = f"eq.{episodio}"
+        
+        response = requests.patch(
+            f"{SUPABASE_URL}/rest/v1/{tabela}",
+            headers=headers,
+            params=params,
+            json={COLUNA_ALTERNATIVAS: alternativas},
+            timeout=10
+        )
+        
+        if response.status_code in [200, 204]:
+            logger.info(f"{len(alternativas)} servidores alternativos gravados no Supabase")
+            return True
+        logger.error(f"Erro ao gravar alternativas: {response.status_code} - {response.text}")
+        return False
+    
+    except Exception as e:
+        logger.error(f"Erro ao gravar alternativas: {e}")
+        return False
+
+def atualizar_variante_supabase(url_pagina, idioma, video_url, embed_url, tipo='filme', temporada=None, episodio=None):
+    """Grava a variante de outro idioma nas colunas próprias (o registro já deve existir)"""
+    colunas = COLUNAS_POR_IDIOMA.get(idioma)
+    if not colunas:
+        logger.debug(f"Sem colunas configuradas para o idioma {idioma}")
+        return False
+    
+    coluna_embed, coluna_direta = colunas
+    try:
+        headers = {
+            "apikey": SUPABASE_APIKEY,
+            "Authorization": f"Bearer {SUPABASE_APIKEY}",
+            "Content-Type": "application/json",
+            "Prefer": "return=minimal"
+        }
+        
+        tabela = SUPABASE_TABLE_SERIES if tipo == 'serie' else SUPABASE_TABLE_FILMES
+        params = {"url": filtro_url(url_pagina)}
+        if tipo == 'serie':
+            params["temporada_numero"] = f"eq.{temporada}"
+            params["episodio_numero"] = f"eq.{episodio}"
+        
+        response = requests.patch(
+            f"{SUPABASE_URL}/rest/v1/{tabela}",
+            headers=headers,
+            params=params,
+            json={coluna_embed: embed_url, coluna_direta: video_url},
+            timeout=10
+        )
+        
+        if response.status_code in [200, 204]:
+            logger.info(f"Variante {idioma} gravada no Supabase")
+            return True
+        logger.error(f"Erro ao gravar variante {idioma}: {response.status_code} - {response.text}")
+        return False
+    
+    except Exception as e:
+        logger.error(f"Erro ao gravar variante {idioma}: {e}")
+        return False
+
 def download_geckodriver():
     """Baixa o geckodriver"""
     if not os.path.exists(DRIVERS_DIR):
@@ -350,10 +819,89 @@ def download_ublock_origin():
         logger.warning("Continuando sem uBlock Origin...")
         return False
 
-def criar_navegador_firefox_otimizado():
-    """Cria navegador Firefox otimizado para velocidade"""
+# Preferências do Firefox (gravadas no perfil modelo ou aplicadas a cada sessão)
+PREFERENCIAS_FIREFOX = {
+    # User agent
+    "general.useragent.override": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0",
+    
+    # Desabilitar detecção de webdriver
+    "dom.webdriver.enabled": False,
+    "useAutomationExtension": False,
+    
+    # OTIMIZAÇÕES DE VELOCIDADE
+    # Desabilitar cache
+    "browser.cache.disk.enable": False,
+    "browser.cache.memory.enable": False,
+    "network.http.use-cache": False,
+    
+    # Timeouts agressivos
+    "dom.max_script_run_time": 15,
+    "dom.max_chrome_script_run_time": 15,
+    
+    # Desabilitar notificações
+    "dom.webnotifications.enabled": False,
+    "dom.push.enabled": False,
+    
+    # Desabilitar áudio
+    "media.volume_scale": "0.0",
+    "media.default_volume": "0.0",
+    
+    # Desabilitar plugins desnecessários
+    "plugin.state.flash": 0,
+    "javascript.options.showInConsole": False,
+    
+    # Desabilitar prefetch e preconnect
+    "network.prefetch-next": False,
+    "network.http.speculative-parallel-limit": 0,
+    
+    # Não estrangular timers de abas em segundo plano (modo multi-abas)
+    "dom.min_background_timeout_value": 4,
+    "dom.timeout.enable_budget_throttling": False,
+}
+
+# Preferências aplicadas para cada tipo de recurso bloqueado
+PREFERENCIAS_POR_TIPO_BLOQUEADO = {
+    # Desabilitar imagens (economia de banda e processamento)
+    'image': {"permissions.default.image": 2},
+    # Desabilitar CSS (não necessário para extração)
+    'stylesheet': {"permissions.default.stylesheet": 2},
+    # Não baixar web fonts
+    'font': {"gfx.downloadable_fonts.enabled": False},
+    # Proteção contra rastreadores/analytics embutida no Firefox
+    'tracker': {
+        "privacy.trackingprotection.enabled": True,
+        "privacy.trackingprotection.socialtracking.enabled": True,
+        "privacy.trackingprotection.cryptomining.enabled": True,
+        "privacy.trackingprotection.fingerprinting.enabled": True,
+    },
+    # Não deixar o player pré-carregar/tocar mídia sozinho
+    'media': {"media.autoplay.default": 5, "media.preload.default": 0},
+}
+
+for _tipo in TIPOS_RECURSO_BLOQUEADOS:
+    PREFERENCIAS_FIREFOX.update(PREFERENCIAS_POR_TIPO_BLOQUEADO.get(_tipo, {}))
+
+# Modo cache HTTP: o diretório e a capacidade do disco são definidos por navegador (vaga alugada)
+if CACHE_HTTP_NAVEGADOR:
+    PREFERENCIAS_FIREFOX.update({
+        "browser.cache.disk.enable": True,
+        "browser.cache.memory.enable": True,
+        "network.http.use-cache": True,
+        "browser.cache.disk.smart_size.enabled": False,
+        "browser.cache.memory.capacity": 32768,
+    })
+
+def _criar_opcoes_firefox(page_load_strategy=None):
+    """Opções comuns a todas as sessões (argumentos e capabilities)"""
     options = Options()
     
+    # Estratégia de carregamento ('eager' não bloqueia em imagens/scripts de terceiros)
+    options.page_load_strategy = page_load_strategy or PAGE_LOAD_STRATEGY
+    
+    # Sessão BiDi para observar as requisições de rede
+    if CAPTURA_REDE_HABILITADA:
+        options.set_capability("webSocketUrl", True)
+    
     # Configurações básicas
     options.add_argument("--headless")
     options.add_argument("--no-sandbox")
@@ -362,56 +910,247 @@ def criar_navegador_firefox_otimizado():
     options.add_argument("--width=1920")
     options.add_argument("--height=1080")
     
-    # User agent
-    options.set_preference("general.useragent.override", 
-                          "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0")
+    return options
+
+def _criar_servico():
+    """Service do geckodriver"""
+    service = Service(download_geckodriver())
+    service.service_args = ['--log', 'fatal', '--marionette-port', '0']
+    return service
+
+def _assinatura_perfil_modelo():
+    """Muda sempre que as preferências ou o XPI do uBlock mudam (força reconstrução)"""
+    conteudo = json.dumps(PREFERENCIAS_FIREFOX, sort_keys=True)
+    if os.path.exists(UBLOCK_XPI):
+        estado = os.stat(UBLOCK_XPI)
+        conteudo += f"|{estado.st_size}|{int(estado.st_mtime)}"
+    return hashlib.sha1(conteudo.encode()).hexdigest()
+
+def _aguardar_extensao_inicializada(perfil, timeout=30):
+    """Aguarda o uBlock ficar ativo no perfil e terminar de gravar seu armazenamento inicial"""
+    extensoes_json = os.path.join(perfil, 'extensions.json')
+    armazenamento = os.path.join(perfil, 'storage', 'default')
+    limite = time.time() + timeout
+    tamanho_anterior = -1
     
-    # Desabilitar detecção de webdriver
-    options.set_preference("dom.webdriver.enabled", False)
-    options.set_preference("useAutomationExtension", False)
+    while time.time() < limite:
+        try:
+            with open(extensoes_json, 'r', encoding='utf-8') as f:
+                addons = json.load(f).get('addons', [])
+            ativo = any(a.get('id') == UBLOCK_ID and a.get('active') for a in addons)
+        except (OSError, ValueError):
+            ativo = False
+        
+        if ativo:
+            tamanho = sum(
+                os.path.getsize(os.path.join(raiz, nome))
+                for raiz, _, arquivos in os.walk(armazenamento) for nome in arquivos
+            )
+            # Armazenamento estável entre duas leituras = inicialização concluída
+            if tamanho > 0 and tamanho == tamanho_anterior:
+                return True
+            tamanho_anterior = tamanho
+        
+        time.sleep(1)
     
-    # OTIMIZAÇÕES DE VELOCIDADE
-    # Desabilitar imagens (economia de banda e processamento)
-    options.set_preference("permissions.default.image", 2)
+    logger.warning("uBlock não terminou de inicializar no perfil modelo")
+    return False
+
+def construir_perfil_modelo():
+    """
+    Etapa única: gera o perfil modelo com todas as preferências gravadas
+    e o uBlock Origin já instalado e inicializado
     
-    # Desabilitar CSS (não necessário para extração)
-    options.set_preference("permissions.default.stylesheet", 2)
+    Returns:
+        Caminho do perfil modelo ou None se não foi possível construí-lo
+    """
+    assinatura = _assinatura_perfil_modelo()
+    arquivo_assinatura = os.path.join(PERFIL_MODELO_DIR, '.assinatura')
     
-    # Desabilitar cache
-    options.set_preference("browser.cache.disk.enable", False)
-    options.set_preference("browser.cache.memory.enable", False)
-    options.set_preference("network.http.use-cache", False)
+    try:
+        with open(arquivo_assinatura, 'r') as f:
+            if f.read().strip() == assinatura:
+                return PERFIL_MODELO_DIR
+    except OSError:
+        pass
     
-    # Timeouts agressivos
-    options.set_preference("dom.max_script_run_time", 15)
-    options.set_preference("dom.max_chrome_script_run_time", 15)
+    logger.info(f"Construindo perfil modelo do Firefox em {PERFIL_MODELO_DIR}...")
+    temporario = f"{PERFIL_MODELO_DIR}.construindo-{os.getpid()}"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
     
-    # Desabilitar notificações
-    options.set_preference("dom.webnotifications.enabled", False)
-    options.set_preference("dom.push.enabled", False)
+    try:
+        with open(os.path.join(temporario, 'user.js'), 'w', encoding='utf-8') as f:
+            for nome, valor in PREFERENCIAS_FIREFOX.items():
+                f.write(f'user_pref("{nome}", {json.dumps(valor)});\n')
+        
+        options = _criar_opcoes_firefox()
+        options.add_argument("-profile")
+        options.add_argument(temporario)
+        
+        driver = webdriver.Firefox(service=_criar_servico(), options=options)
+        try:
+            if os.path.exists(UBLOCK_XPI):
+                driver.install_addon(UBLOCK_XPI, temporary=False)
+                _aguardar_extensao_inicializada(temporario)
+        finally:
+            driver.quit()
+        
+        # Arquivos de sessão/trava não devem ir para os clones
+        for nome in ('lock', '.parentlock', 'parent.lock', 'MarionetteActivePort',
+                     'sessionstore-backups', 'crashes', 'minidumps', 'cache2'):
+            caminho = os.path.join(temporario, nome)
+            if os.path.isdir(caminho):
+                shutil.rmtree(caminho, ignore_errors=True)
+            elif os.path.lexists(caminho):
+                os.remove(caminho)
+        
+        with open(os.path.join(temporario, '.assinatura'), 'w') as f:
+            f.write(assinatura)
+        
+        # Troca atômica do modelo antigo pelo novo
+        antigo = f"{PERFIL_MODELO_DIR}.antigo-{os.getpid()}"
+        if os.path.exists(PERFIL_MODELO_DIR):
+            os.rename(PERFIL_MODELO_DIR, antigo)
+        os.rename(temporario, PERFIL_MODELO_DIR)
+        shutil.rmtree(antigo, ignore_errors=True)
+        
+        logger.info("Perfil modelo do Firefox pronto")
+        return PERFIL_MODELO_DIR
+        
+    except Exception as e:
+        logger.warning(f"Não foi possível construir o perfil modelo: {e}")
+        shutil.rmtree(temporario, ignore_errors=True)
+        # Outro processo pode ter concluído a construção em paralelo
+        return PERFIL_MODELO_DIR if os.path.exists(arquivo_assinatura) else None
+
+def obter_perfil_modelo():
+    """Retorna o perfil modelo (construído uma única vez por processo)"""
+    global _perfil_modelo
+    with _perfil_modelo_lock:
+        if _perfil_modelo is None:
+            _perfil_modelo = construir_perfil_modelo() or ''
+        return _perfil_modelo or None
+
+def _copiar_ou_vincular(origem, destino):
+    # Pacotes .xpi nunca são alterados: hard link em vez de cópia
+    if origem.endswith('.xpi'):
+        try:
+            os.link(origem, destino)
+            return destino
+        except OSError:
+            pass
+    return shutil.copy2(origem, destino)
+
+def clonar_perfil_modelo():
+    """Cria um clone do perfil modelo no tmpfs para uma nova sessão"""
+    modelo = obter_perfil_modelo()
+    if not modelo:
+        return None
     
-    # Desabilitar áudio
-    options.set_preference("media.volume_scale", "0.0")
-    options.set_preference("media.default_volume", "0.0")
+    destino = os.path.join(PERFIL_BASE_DIR, f"wcdn_perfil_{uuid.uuid4().hex[:12]}")
+    try:
+        shutil.copytree(modelo, destino, copy_function=_copiar_ou_vincular,
+                        ignore=shutil.ignore_patterns('.assinatura'))
+        # copytree copia o mtime do modelo: sem isso o coletor de órfãos de outro processo
+        # veria o clone recém-criado (ainda não registrado) como perfil solto antigo
+        os.utime(destino)
+        return destino
+    except Exception as e:
+        logger.warning(f"Erro ao clonar perfil modelo: {e}")
+        shutil.rmtree(destino, ignore_errors=True)
+        return None
+
+def obter_coletor():
+    """Coletor de órfãos do processo (a primeira chamada já faz uma coleta); None se desligado"""
+    global _coletor_orfaos
+    if not COLETOR_ORFAOS_HABILITADO:
+        return None
+    with _coletor_lock:
+        if _coletor_orfaos is None:
+            try:
+                _coletor_orfaos = ColetorOrfaos(
+                    COLETOR_ESTADO_DIR, COLETOR_INTERVALO,
+                    padroes_perfis=[os.path.join(PERFIL_BASE_DIR, "wcdn_perfil_*")],
+                    ignorar_perfis=[PERFIL_MODELO_DIR],
+                    idade_minima_perfis=COLETOR_IDADE_PERFIS
+                ).iniciar()
+            except Exception as e:
+                logger.warning(f"Coletor de navegadores órfãos indisponível: {e}")
+                return None
+        return _coletor_orfaos
+
+def registrar_navegador(driver):
+    """Anota no coletor os processos (geckodriver e Firefox) e os perfis do navegador"""
+    coletor = obter_coletor()
+    if coletor is None:
+        return
     
-    # Desabilitar plugins desnecessários
-    options.set_preference("plugin.state.flash", 0)
-    options.set_preference("javascript.options.showInConsole", False)
+    capacidades = driver.capabilities or {}
+    try:
+        pid_geckodriver = driver.service.process.pid
+    except Exception:
+        pid_geckodriver = None
     
-    # Desabilitar prefetch e preconnect
-    options.set_preference("network.prefetch-next", False)
-    options.set_preference("network.http.speculative-parallel-limit", 0)
+    perfis = {getattr(driver, 'perfil_clone', None), capacidades.get('moz:profile')}
+    coletor.registrar(id(driver), [pid_geckodriver, capacidades.get('moz:processID')],
+                      sorted(p for p in perfis if p))
+
+def obter_caches_http():
+    """Vagas do cache HTTP compartilhado (None fora do modo CACHE_HTTP_NAVEGADOR)"""
+    global _caches_http
+    if not CACHE_HTTP_NAVEGADOR:
+        return None
+    with _caches_http_lock:
+        if _caches_http is None:
+            # Navegadores órfãos de um processo anterior ainda podem estar gravando nas vagas
+            obter_coletor()
+            try:
+                _caches_http = VagasCacheHttp(CACHE_HTTP_DIR, CACHE_HTTP_VAGAS, CACHE_HTTP_MAX_MB)
+            except OSError as e:
+                logger.warning(f"Cache HTTP compartilhado indisponível: {e}")
+                return None
+        return _caches_http
+
+def _preferencias_cache_http(vaga):
+    """Preferências do cache em disco de uma sessão (sem vaga livre, só cache em memória)"""
+    if vaga is None:
+        return {"browser.cache.disk.enable": False}
+    return {
+        "browser.cache.disk.parent_directory": vaga,
+        "browser.cache.disk.capacity": obter_caches_http().capacidade_kb,
+    }
+
+def criar_navegador_firefox_otimizado(page_load_strategy=None):
+    """Cria navegador Firefox otimizado para velocidade"""
+    options = _criar_opcoes_firefox(page_load_strategy)
+    
+    # Clone do perfil modelo: preferências e uBlock já prontos, sem I/O em disco
+    perfil = clonar_perfil_modelo() if USAR_PERFIL_MODELO else None
+    
+    caches_http = obter_caches_http()
+    vaga = caches_http.alugar() if caches_http else None
+    preferencias_sessao = _preferencias_cache_http(vaga) if caches_http else {}
+    
+    if perfil:
+        options.add_argument("-profile")
+        options.add_argument(perfil)
+        if preferencias_sessao:
+            with open(os.path.join(perfil, 'user.js'), 'a', encoding='utf-8') as f:
+                for nome, valor in preferencias_sessao.items():
+                    f.write(f'user_pref("{nome}", {json.dumps(valor)});\n')
+    else:
+        for nome, valor in {**PREFERENCIAS_FIREFOX, **preferencias_sessao}.items():
+            options.set_preference(nome, valor)
     
     try:
-        geckodriver_path = download_geckodriver()
+        driver = webdriver.Firefox(service=_criar_servico(), options=options)
+        driver.perfil_clone = perfil
+        driver.vaga_cache_http = vaga
+        registrar_navegador(driver)
         
-        service = Service(geckodriver_path)
-        service.service_args = ['--log', 'fatal', '--marionette-port', '0']
-        
-        driver = webdriver.Firefox(service=service, options=options)
-        
-        # Instalar uBlock se disponível (bloqueia anúncios que atrasam carregamento)
-        if os.path.exists(UBLOCK_XPI):
+        # Sem perfil modelo: instalar uBlock se disponível (bloqueia anúncios que atrasam carregamento)
+        if not perfil and os.path.exists(UBLOCK_XPI):
             try:
                 driver.install_addon(UBLOCK_XPI, temporary=True)
                 logger.info("uBlock Origin instalado")
@@ -419,73 +1158,526 @@ def criar_navegador_firefox_otimizado():
             except Exception as e:
                 logger.warning(f"Erro ao instalar uBlock Origin: {e}")
         
-        driver.set_page_load_timeout(20)
-        driver.implicitly_wait(3)
+        driver.set_page_load_timeout(TIMEOUT_CARREGAMENTO_PAGINA)
+        # Sem implicit wait: as buscas são feitas pelas sondagens em JS
+        driver.implicitly_wait(0)
         
         logger.info("Driver Firefox criado")
         return driver
         
     except Exception as e:
         logger.error(f"Erro ao criar driver: {e}")
+        if perfil:
+            shutil.rmtree(perfil, ignore_errors=True)
+        if vaga:
+            caches_http.devolver(vaga)
         raise
 
-def obter_driver_persistente(driver_id):
-    """Obtém ou cria um driver persistente para o worker"""
-    if driver_id not in _drivers_pool:
-        logger.info(f"[{driver_id}] Criando novo driver persistente")
-        _drivers_pool[driver_id] = criar_navegador_firefox_otimizado()
-    return _drivers_pool[driver_id]
-
-def limpar_driver_persistente(driver_id):
-    """Limpa e fecha um driver persistente específico"""
-    if driver_id in _drivers_pool:
-        try:
-            _drivers_pool[driver_id].quit()
-            logger.info(f"[{driver_id}] Driver persistente fechado")
-        except:
-            pass
-        del _drivers_pool[driver_id]
-
-def limpar_todos_drivers():
-    """Fecha todos os drivers persistentes"""
-    for driver_id in list(_drivers_pool.keys()):
-        limpar_driver_persistente(driver_id)
-    logger.info("Todos os drivers persistentes foram fechados")
-
-def resetar_driver(driver):
-    """Reseta o estado do driver para nova extração"""
+def encerrar_driver(driver):
+    """Fecha o navegador, remove o clone de perfil e libera a vaga de cache HTTP usados por ele"""
     try:
-        # Limpa cookies e storage
-        driver.delete_all_cookies()
-        driver.execute_script("window.localStorage.clear();")
-        driver.execute_script("window.sessionStorage.clear();")
-        
-        # Volta ao contexto principal
-        driver.switch_to.default_content()
-        
-        # Navega para página em branco
-        driver.get("about:blank")
-        
-        return True
-    except Exception as e:
-        logger.warning(f"Erro ao resetar driver: {e}")
-        return False
-
-def find_element_fast(driver, selectors, timeout=5):
-    """Procura múltiplos seletores e retorna o primeiro encontrado rapidamente"""
-    end_time = time.time() + timeout
+        driver.quit()
+    except Exception:
+        pass
     
-    while time.time() < end_time:
-        for selector in selectors:
-            try:
-                element = driver.find_element(By.CSS_SELECTOR, selector)
-                if element:
-                    return element
-            except:
-                continue
-        time.sleep(0.5)
+    perfil = getattr(driver, 'perfil_clone', None)
+    if perfil:
+        shutil.rmtree(perfil, ignore_errors=True)
     
-    return None
+    # Com o Firefox fechado o cache da vaga fica para o próximo navegador
+    vaga = getattr(driver, 'vaga_cache_http', None)
+    if vaga and _caches_http is not None:
+        _caches_http.devolver(vaga)
+    
+    coletor = obter_coletor()
+    if coletor is not None:
+        coletor.remover(id(driver))
+
+def matar_sessao(driver, driver_id):
+    """
+    Mata o Firefox e o geckodriver da sessão sem passar pelo WebDriver
+    
+    Para comandos Marionette travados, que não respondem nem ao quit(): a conexão
+    cai e a thread presa no comando recebe uma exceção.
+    """
+    logger.warning(f"[{driver_id}] Prazo vencido com a sessão presa, matando o navegador")
+    sinal = getattr(signal, 'SIGKILL', signal.SIGTERM)
+    
+    try:
+        pid_firefox = (driver.capabilities or {}).get('moz:processID')
+        if pid_firefox:
+            os.kill(pid_firefox, sinal)
+    except Exception as e:
+        logger.debug(f"[{driver_id}] Erro ao matar o Firefox: {e}")
+    
+    try:
+        processo = driver.service.process
+        if processo is not None:
+            processo.kill()
+    except Exception as e:
+        logger.debug(f"[{driver_id}] Erro ao matar o geckodriver: {e}")
+
+def vigiar_sessao(contexto, driver, driver_id, pool=None):
+    """
+    Agenda no vigia a morte da sessão PRAZO_TOLERANCIA segundos depois do prazo do
+    contexto (a vaga no pool é liberada na hora)
+    
+    Returns:
+        Tupla (token para _vigia.cancelar ou None sem prazo, Event setado se a sessão foi morta)
+    """
+    morta = threading.Event()
+    limite = contexto.limite if contexto is not None else None
+    if limite is None:
+        return None, morta
+    
+    def matar():
+        morta.set()
+        matar_sessao(driver, driver_id)
+        # Libera a vaga do pool já, mesmo que a thread presa demore a sair
+        if pool is not None:
+            pool.devolver(driver, descartar=True)
+    
+    return _vigia.agendar(limite + PRAZO_TOLERANCIA, matar), morta
+
+def obter_cgroups():
+    """Gerenciador de cgroups dos navegadores (None se NAVEGADOR_CGROUP_RAIZ não foi definido)"""
+    global _cgroups
+    if not NAVEGADOR_CGROUP_RAIZ:
+        return None
+    with _cgroups_lock:
+        if _cgroups is None:
+            _cgroups = CgroupNavegadores(NAVEGADOR_CGROUP_RAIZ, NAVEGADOR_CGROUP_MEMORIA_MB, NAVEGADOR_CGROUP_CPU,
+                                         NAVEGADOR_CGROUP_CPUS, NAVEGADOR_CGROUP_CPUS_POR_NAVEGADOR)
+        return _cgroups if _cgroups.ativo else None
+
+class NavegadorPool:
+    """Navegador gerenciado pelo pool, com contadores para reciclagem"""
+    
+    def __init__(self, driver):
+        self.driver = driver
+        self.criado_em = time.time()
+        self.usos = 0
+        # Amostra mais recente da memória da árvore de processos (bytes)
+        self.memoria = None
+        try:
+            self.pid = driver.service.process.pid
+        except Exception:
+            self.pid = None
+        
+        cgroups = obter_cgroups()
+        self.cgroup = cgroups.colocar(self.pid) if cgroups else None
+    
+    @property
+    def idade(self):
+        return time.time() - self.criado_em
+    
+    def medir_memoria(self):
+        """Atualiza a amostra de memória; retorna True se passou de NAVEGADOR_MEMORIA_MAX_MB"""
+        if not NAVEGADOR_MEMORIA_MAX_MB or not self.pid:
+            return False
+        self.memoria = memoria_arvore(self.pid)
+        return self.excedeu_memoria
+    
+    @property
+    def excedeu_memoria(self):
+        return bool(NAVEGADOR_MEMORIA_MAX_MB and self.memoria
+                    and self.memoria > NAVEGADOR_MEMORIA_MAX_MB * 1024 * 1024)
+    
+    def processo_vivo(self):
+        """Verifica se o processo do geckodriver ainda está rodando"""
+        try:
+            processo = self.driver.service.process
+            return processo is None or processo.poll() is None
+        except Exception:
+            return False
+
+class PoolNavegadores:
+    """
+    Pool thread-safe de navegadores Firefox pré-aquecidos
+    
+    - obter()/devolver() para checkout e checkin
+    - mantém min_ociosos navegadores prontos em segundo plano
+    - recicla navegadores após max_usos extrações ou max_idade segundos (0 = sem limite)
+    - testa se o navegador responde antes de cada checkout
+    - substitui automaticamente navegadores que travaram ou morreram
+    """
+    
+    def __init__(self, min_ociosos=None, max_navegadores=None, max_usos=None, max_idade=None,
+                 fabrica=None):
+        self.min_ociosos = POOL_MIN_OCIOSOS if min_ociosos is None else min_ociosos
+        self.max_navegadores = max_navegadores or POOL_MAX_NAVEGADORES
+        self.max_usos = POOL_MAX_USOS if max_usos is None else max_usos
+        self.max_idade = POOL_MAX_IDADE if max_idade is None else max_idade
+        self.fabrica = fabrica or criar_navegador_firefox_otimizado
+        
+        self._condicao = threading.Condition()
+        self._ociosos = deque()
+        self._emprestados = {}
+        self._criando = 0
+        self._encerrado = False
+        self._thread_manutencao = None
+        self.reciclados_memoria = 0
+    
+    @property
+    def total(self):
+        return len(self._ociosos) + len(self._emprestados) + self._criando
+    
+    def iniciar(self):
+        """Inicia a thread que mantém os navegadores ociosos pré-criados"""
+        if self._thread_manutencao is None:
+            self._thread_manutencao = threading.Thread(target=self._manutencao, daemon=True)
+            self._thread_manutencao.start()
+        return self
+    
+    def _manutencao(self):
+        while True:
+            with self._condicao:
+                if self._encerrado:
+                    return
+                navegadores = list(self._ociosos) + list(self._emprestados.values())
+            
+            # Amostra a memória fora do lock (varre /proc); emprestados são reciclados na devolução
+            for nav in navegadores:
+                nav.medir_memoria()
+            
+            with self._condicao:
+                # Retira ociosos que morreram, passaram da idade ou incharam
+                retirar = [n for n in self._ociosos
+                           if not n.processo_vivo() or self._velho(n) or n.excedeu_memoria]
+                for nav in retirar:
+                    self._ociosos.remove(nav)
+            
+            for nav in retirar:
+                logger.info("[Pool] Reciclando navegador ocioso (morto, expirado ou acima do limite de memória)")
+                self._fechar(nav)
+            
+            self._repor()
+            
+            with self._condicao:
+                if self._encerrado:
+                    return
+                self._condicao.wait(POOL_INTERVALO_MANUTENCAO)
+    
+    def _repor(self):
+        """Cria navegadores até ter min_ociosos prontos (respeitando o máximo)"""
+        while True:
+            with self._condicao:
+                if (self._encerrado
+                        or len(self._ociosos) + self._criando >= self.min_ociosos
+                        or self.total >= self.max_navegadores):
+                    return
+                self._criando += 1
+            
+            try:
+                nav = NavegadorPool(self.fabrica())
+            except Exception as e:
+                logger.error(f"[Pool] Erro ao pré-criar navegador: {e}")
+                with self._condicao:
+                    self._criando -= 1
+                    self._condicao.notify_all()
+                return
+            
+            with self._condicao:
+                self._criando -= 1
+                if not self._encerrado:
+                    self._ociosos.append(nav)
+                    self._condicao.notify_all()
+                    logger.info(f"[Pool] Navegador pré-aquecido ({len(self._ociosos)} ocioso(s))")
+                    continue
+            
+            self._fechar(nav)
+            return
+    
+    def _velho(self, nav):
+        """Passou de max_idade segundos (0 = sem limite)"""
+        return bool(self.max_idade) and nav.idade >= self.max_idade
+    
+    def _gasto(self, nav):
+        """Passou de max_usos extrações ou de max_idade segundos"""
+        return (bool(self.max_usos) and nav.usos >= self.max_usos) or self._velho(nav)
+    
+    def _saudavel(self, nav):
+        """Checa limites de reciclagem e se o navegador responde"""
+        if self._gasto(nav):
+            logger.info(f"[Pool] Navegador expirado ({nav.usos} usos, {nav.idade:.0f}s)")
+            return False
+        
+        if nav.excedeu_memoria:
+            logger.info(f"[Pool] Navegador acima do limite de memória ({nav.memoria / 1048576:.0f} MB)")
+            return False
+        
+        if not nav.processo_vivo():
+            logger.warning("[Pool] Processo do navegador morreu")
+            return False
+        
+        try:
+            return nav.driver.execute_script("return 1") == 1
+        except Exception as e:
+            logger.warning(f"[Pool] Navegador não responde: {e}")
+            return False
+    
+    def _fechar(self, nav):
+        encerrar_driver(nav.driver)
+        cgroups = obter_cgroups()
+        if cgroups and nav.cgroup:
+            cgroups.remover(nav.cgroup)
+        with self._condicao:
+            if nav.excedeu_memoria:
+                self.reciclados_memoria += 1
+            self._condicao.notify_all()
+    
+    def obter(self, timeout=None, apenas_ocioso=False):
+        """
+        Faz checkout de um navegador saudável (cria um novo se houver vaga)
+        
+        Com apenas_ocioso só serve um navegador já pronto: não cria nem espera vaga
+        (TimeoutError na hora se não houver).
+        """
+        limite = time.time() + (POOL_TIMEOUT_CHECKOUT if timeout is None else timeout)
+        
+        while True:
+            nav = None
+            with self._condicao:
+                while True:
+                    if self._encerrado:
+                        raise RuntimeError("Pool de navegadores encerrado")
+                    if self._ociosos:
+                        nav = self._ociosos.popleft()
+                        break
+                    if apenas_ocioso:
+                        raise TimeoutError("Nenhum navegador ocioso no pool")
+                    if self.total < self.max_navegadores:
+                        self._criando += 1
+                        break
+                    restante = limite - time.time()
+                    if restante <= 0:
+                        raise TimeoutError("Nenhum navegador disponível no pool")
+                    self._condicao.wait(restante)
+            
+            if nav is None:
+                try:
+                    nav = NavegadorPool(self.fabrica())
+                finally:
+                    with self._condicao:
+                        self._criando -= 1
+                        self._condicao.notify_all()
+            elif not self._saudavel(nav):
+                self._fechar(nav)
+                continue
+            
+            with self._condicao:
+                nav.usos += 1
+                self._emprestados[id(nav.driver)] = nav
+                # Acorda a manutenção para repor o ocioso consumido
+                self._condicao.notify_all()
+            return nav.driver
+    
+    def devolver(self, driver, descartar=False):
+        """Faz checkin do navegador (reseta o estado ou recicla se necessário)"""
+        with self._condicao:
+            nav = self._emprestados.pop(id(driver), None)
+        
+        if nav is None:
+            return
+        
+        if (descartar or self._encerrado or self._gasto(nav)
+                or nav.excedeu_memoria or not resetar_driver(driver)):
+            self._fechar(nav)
+            return
+        
+        with self._condicao:
+            if self._encerrado:
+                fechar = True
+            else:
+                fechar = False
+                self._ociosos.append(nav)
+                self._condicao.notify_all()
+        
+        if fechar:
+            self._fechar(nav)
+    
+    def memoria(self):
+        """Última amostra de memória de cada navegador, em MB"""
+        with self._condicao:
+            navegadores = list(self._ociosos) + list(self._emprestados.values())
+        return [round(nav.memoria / 1048576) for nav in navegadores if nav.memoria]
+    
+    @contextmanager
+    def emprestar(self, timeout=None):
+        """Context manager: with pool.emprestar() as driver: ..."""
+        driver = self.obter(timeout)
+        try:
+            yield driver
+        finally:
+            self.devolver(driver)
+    
+    def encerrar(self):
+        """Fecha todos os navegadores do pool"""
+        with self._condicao:
+            self._encerrado = True
+            navegadores = list(self._ociosos) + list(self._emprestados.values())
+            self._ociosos.clear()
+            self._emprestados.clear()
+            self._condicao.notify_all()
+        
+        for nav in navegadores:
+            self._fechar(nav)
+        logger.info(f"[Pool] {len(navegadores)} navegador(es) fechado(s)")
+
+def obter_pool(**kwargs):
+    """Retorna o pool global de navegadores (cria e aquece na primeira chamada)"""
+    global _pool_navegadores
+    with _pool_lock:
+        if _pool_navegadores is None:
+            # Antes de criar navegadores, recolhe os que um processo anterior deixou para trás
+            obter_coletor()
+            _pool_navegadores = PoolNavegadores(**kwargs).iniciar()
+        return _pool_navegadores
+
+class AgendadorAbas:
+    """
+    Intercala os comandos WebDriver de várias abas de um mesmo Firefox
+    
+    Cada extração roda em sua própria thread com uma AbaNavegador; o agendador
+    serializa os comandos e troca de aba (e de frame) só quando necessário.
+    """
+    
+    def __init__(self, driver):
+        self.driver = driver
+        self.lock = threading.RLock()
+        self.aba_ativa = None
+        self.abas = []
+    
+    def abrir_abas(self, quantidade):
+        """Abre as abas de trabalho (reaproveita a aba atual como primeira)"""
+        with self.lock:
+            handles = [self.driver.current_window_handle]
+            for _ in range(quantidade - 1):
+                self.driver.switch_to.new_window('tab')
+                handles.append(self.driver.current_window_handle)
+            self.abas = [AbaNavegador(self, handle) for handle in handles]
+            self.aba_ativa = None
+        return self.abas
+    
+    def ativar(self, aba):
+        """Torna a aba (e sua pilha de frames) o contexto atual da sessão"""
+        if self.aba_ativa is aba:
+            return
+        self.driver.switch_to.window(aba.handle_aba)
+        for frame in aba.frames:
+            self.driver.switch_to.frame(frame)
+        self.aba_ativa = aba
+    
+    def fechar_abas(self):
+        """Fecha as abas extras, mantendo a primeira para o pool"""
+        with self.lock:
+            for aba in self.abas[1:]:
+                try:
+                    self.driver.switch_to.window(aba.handle_aba)
+                    self.driver.close()
+                except Exception:
+                    pass
+            if self.abas:
+                try:
+                    self.driver.switch_to.window(self.abas[0].handle_aba)
+                except Exception:
+                    pass
+            self.abas = []
+            self.aba_ativa = None
+
+class _TrocaContextoAba:
+    """switch_to da aba: registra a pilha de frames para restaurar após trocar de aba"""
+    
+    def __init__(self, aba):
+        self._aba = aba
+    
+    def frame(self, referencia):
+        with self._aba.agendador.lock:
+            self._aba.agendador.ativar(self._aba)
+            self._aba.agendador.driver.switch_to.frame(referencia)
+            self._aba.frames.append(referencia)
+    
+    def parent_frame(self):
+        with self._aba.agendador.lock:
+            self._aba.agendador.ativar(self._aba)
+            self._aba.agendador.driver.switch_to.parent_frame()
+            if self._aba.frames:
+                self._aba.frames.pop()
+    
+    def default_content(self):
+        with self._aba.agendador.lock:
+            self._aba.agendador.ativar(self._aba)
+            self._aba.agendador.driver.switch_to.default_content()
+            self._aba.frames = []
+
+class AbaNavegador:
+    """Fachada de driver presa a uma aba; usável onde um driver é esperado"""
+    
+    # Esperas longas são fatiadas para não monopolizar a sessão
+    fatia_espera = 0.3
+    
+    def __init__(self, agendador, handle):
+        self.agendador = agendador
+        self.handle_aba = handle
+        self.frames = []
+        self.switch_to = _TrocaContextoAba(self)
+    
+    def _reparentar(self, resultado):
+        # Elementos passam a executar comandos pela aba (com troca de contexto)
+        if isinstance(resultado, WebElement):
+            resultado._parent = self
+        elif isinstance(resultado, (list, tuple)):
+            for item in resultado:
+                self._reparentar(item)
+        elif isinstance(resultado, dict):
+            # aguardar_dom/sondar_pagina devolvem os elementos dentro de dicionários
+            for item in resultado.values():
+                self._reparentar(item)
+        return resultado
+    
+    def __getattr__(self, nome):
+        atributo = getattr(self.agendador.driver, nome)
+        if not callable(atributo):
+            return atributo
+        
+        def executar(*args, **kwargs):
+            with self.agendador.lock:
+                self.agendador.ativar(self)
+                return self._reparentar(atributo(*args, **kwargs))
+        
+        return executar
+    
+    def quit(self):
+        # O navegador pertence ao agendador; a aba não o encerra
+        pass
+
+def limpar_todos_drivers():
+    """Fecha todos os navegadores do pool"""
+    global _pool_navegadores
+    with _pool_lock:
+        pool, _pool_navegadores = _pool_navegadores, None
+    if pool:
+        pool.encerrar()
+    logger.info("Todos os drivers persistentes foram fechados")
+
+def resetar_driver(driver):
+    """Reseta o estado do driver para nova extração"""
+    try:
+        # Limpa cookies e storage (o cache HTTP, só de recursos estáticos, é mantido)
+        driver.delete_all_cookies()
+        driver.execute_script("window.localStorage.clear();")
+        driver.execute_script("window.sessionStorage.clear();")
+        
+        # Volta ao contexto principal
+        driver.switch_to.default_content()
+        
+        # Navega para página em branco
+        driver.get("about:blank")
+        
+        return True
+    except Exception as e:
+        logger.warning(f"Erro ao resetar driver: {e}")
+        return False
 
 def smart_click(driver, element, driver_id):
     """Clica em elemento de forma otimizada"""
@@ -519,72 +1711,1644 @@ def wait_for_page_ready(driver, timeout=10):
     except:
         return False
 
-def extrair_video_url_rapido(driver, driver_id, max_wait=20):
-    """Tenta extrair URL do vídeo rapidamente sem precisar tocar"""
-    logger.info(f"[{driver_id}] Tentando extração rápida da URL...")
+# Script assíncrono que resolve assim que a condição for satisfeita.
+# Usa MutationObserver para reagir a mudanças no DOM e uma verificação leve
+# periódica para propriedades que não geram mutações (ex: currentSrc).
+SCRIPT_AGUARDAR_DOM = """
+var timeoutMs = arguments[0];
+var callback = arguments[arguments.length - 1];
+__PREAMBULO__
+var verificar = function() { __CONDICAO__ };
+var aoExpirar = function() { __AO_EXPIRAR__ };
+var finalizado = false;
+var observer = null;
+var intervalo = null;
+var timer = null;
+
+function checar() {
+    try { return verificar(); } catch (e) { return null; }
+}
+
+function concluir(valor) {
+    if (finalizado) return;
+    finalizado = true;
+    if (observer) observer.disconnect();
+    clearInterval(intervalo);
+    clearTimeout(timer);
+    if (valor) {
+        callback({ok: true, valor: valor});
+    } else {
+        var estado = null;
+        try { estado = aoExpirar(); } catch (e) {}
+        callback({ok: false, valor: estado});
+    }
+}
+
+var inicial = checar();
+if (inicial) { concluir(inicial); return; }
+
+observer = new MutationObserver(function() {
+    var valor = checar();
+    if (valor) concluir(valor);
+});
+observer.observe(document.documentElement || document, {childList: true, subtree: true, attributes: true});
+intervalo = setInterval(function() {
+    var valor = checar();
+    if (valor) concluir(valor);
+}, 250);
+timer = setTimeout(function() { concluir(null); }, timeoutMs);
+"""
+
+# Sondagem: avalia todos os seletores e checagens de estado no mesmo script
+PREAMBULO_SONDAGEM = """
+var seletores = __SELETORES__;
+var checagens = {__CHECAGENS__};
+function estadoPagina() {
+    var estado = {readyState: document.readyState, url: location.href};
+    for (var nome in checagens) {
+        try { estado[nome] = checagens[nome](); } catch (e) { estado[nome] = null; }
+    }
+    return estado;
+}
+"""
+
+CONDICAO_SONDAGEM = """
+    for (var i = 0; i < seletores.length; i++) {
+        var elemento = document.querySelector(seletores[i]);
+        if (elemento) {
+            return {indice: i, seletor: seletores[i], elemento: elemento, estado: estadoPagina()};
+        }
+    }
+    return null;
+"""
+
+# Checagens de estado reutilizadas pelas sondagens
+CHECAGEM_AUDIOS_OCULTOS = """
+    var audios = document.querySelector('playeroptions-audios');
+    return audios ? (audios.getAttribute('class') || '').indexOf('hidden') >= 0 : null;
+"""
+
+# Condições usadas pelas esperas de extrair_url_video (retornam o elemento alvo)
+CONDICAO_SERVIDOR_DUBLADO = """
+    var primeiro = null;
+    var servidores = document.querySelectorAll('server-selector[data-lang="2"]');
+    for (var i = 0; i < servidores.length; i++) {
+        if (servidores[i].closest('.hidden')) continue;
+        if (servidores[i].getAttribute('data-server') === 'mixdrop') return servidores[i];
+        primeiro = primeiro || servidores[i];
+    }
+    return primeiro;
+"""
+
+CONDICAO_IFRAME_EMBED = """
+    var grupos = ['embedcontent.active iframe', 'embedcontent iframe', 'iframe[src*="getEmbed"]'];
+    for (var g = 0; g < grupos.length; g++) {
+        var iframes = document.querySelectorAll(grupos[g]);
+        for (var i = 0; i < iframes.length; i++) {
+            var src = iframes[i].getAttribute('src') || '';
+            if (src && src !== 'about:blank') return iframes[i];
+        }
+    }
+    return null;
+"""
+
+CONDICAO_IFRAME_PLAYER = """
+    var grupos = ['iframe[src*="mixdrop"]', 'iframe#player', 'iframe'];
+    for (var g = 0; g < grupos.length; g++) {
+        var iframes = document.querySelectorAll(grupos[g]);
+        for (var i = 0; i < iframes.length; i++) {
+            var src = iframes[i].getAttribute('src') || '';
+            if (src && src !== 'about:blank') return iframes[i];
+        }
+    }
+    return null;
+"""
+
+CONDICAO_PLAYER_CARREGADO = """
+    return document.readyState !== 'loading' &&
+        !!document.querySelector('video, .video-js');
+"""
+
+# Procura a URL em elementos video, source e no player Video.js
+# (URLs blob: de MSE não servem; nesse caso a captura de rede pega o m3u8)
+CONDICAO_URL_VIDEO = """
+    function valida(url) {
+        return url && url.length > 20 && url.indexOf('blob:') !== 0 ? url : null;
+    }
+    var videos = document.querySelectorAll('video');
+    for (var i = 0; i < videos.length; i++) {
+        var url = valida(videos[i].currentSrc) || valida(videos[i].src);
+        if (url) return url;
+    }
+    var sources = document.querySelectorAll('source');
+    for (var i = 0; i < sources.length; i++) {
+        if (valida(sources[i].src)) return sources[i].src;
+    }
+    if (window.videojs) {
+        var players = videojs.getAllPlayers();
+        if (players.length > 0 && valida(players[0].currentSrc())) {
+            return players[0].currentSrc();
+        }
+    }
+    return null;
+"""
+
+def timeout_adaptativo(etapa, padrao):
+    """Timeout adaptativo da etapa (o padrão se desligado, sem etapa ou sem histórico)"""
+    if etapa and TIMEOUTS_ADAPTATIVOS:
+        return _tempos_etapas.timeout(etapa, padrao)
+    return padrao
+
+def timeout_etapa(etapa, padrao):
+    """Timeout adaptativo da etapa cortado no que resta do prazo da extração"""
+    return limitar_ao_prazo(timeout_adaptativo(etapa, padrao))
+
+def registrar_estouro_etapa(etapa, adaptativo, limite, padrao):
+    """
+    Espera da etapa que expirou: se quem cortou foi o timeout adaptativo (abaixo do
+    padrão) e não o prazo, a amostra entra como o padrão para o timeout voltar a subir
+    """
+    if etapa and adaptativo < padrao and limite >= adaptativo:
+        _tempos_etapas.registrar_estouro(etapa, padrao)
+
+def carregar_pagina(driver, url, etapa='pagina', timeout=TIMEOUT_CARREGAMENTO_PAGINA):
+    """
+    driver.get com o timeout de carregamento da etapa; se estourar, para o carregamento
+    e segue com o que já chegou (as sondagens seguintes dizem se a página serve)
+    
+    Returns:
+        True se a página terminou de carregar dentro do timeout
+    """
+    verificar_cancelamento(contexto_atual())
+    adaptativo = timeout_adaptativo(etapa, timeout)
+    limite = limitar_ao_prazo(adaptativo)
+    inicio = time.monotonic()
+    
+    # O timeout é da sessão inteira: em abas compartilhadas, set/get/restauração vão juntos sob o
+    # lock do agendador; depois volta ao padrão da criação para não vazar para as próximas cargas
+    agendador = getattr(driver, 'agendador', None)
+    with agendador.lock if agendador is not None else nullcontext():
+        driver.set_page_load_timeout(limite)
+        try:
+            driver.get(url)
+        except TimeoutException:
+            logger.info(f"Carregamento passou de {limite:.1f}s ({etapa}), seguindo com a página parcial")
+            registrar_estouro_etapa(etapa, adaptativo, limite, timeout)
+            try:
+                driver.execute_script("window.stop();")
+            except Exception:
+                pass
+            return False
+        finally:
+            try:
+                driver.set_page_load_timeout(TIMEOUT_CARREGAMENTO_PAGINA)
+            except Exception:
+                pass
+    
+    _tempos_etapas.registrar(etapa, time.monotonic() - inicio)
+    return True
+
+def aguardar_dom(driver, condicao_js, timeout=10, ao_expirar_js=None, preambulo_js='', etapa=None):
+    """
+    Aguarda a condição JS ser satisfeita, retornando assim que o DOM atingir o estado
+    
+    Com etapa, o timeout é o adaptativo da etapa (teto = timeout) e a duração dos
+    sucessos (e os estouros, como o teto) alimenta o histórico dela.
+    
+    Returns:
+        Valor retornado pela condição; se expirar, o valor de ao_expirar_js (ou None)
+    """
+    script = (SCRIPT_AGUARDAR_DOM
+              .replace('__PREAMBULO__', preambulo_js)
+              .replace('__CONDICAO__', condicao_js)
+              .replace('__AO_EXPIRAR__', ao_expirar_js or 'return null;'))
+    
+    # Em abas compartilhadas a espera é fatiada para liberar a sessão às outras abas
+    fatia = getattr(driver, 'fatia_espera', None)
+    inicio = time.time()
+    adaptativo = timeout_adaptativo(etapa, timeout)
+    duracao = limitar_ao_prazo(adaptativo)
+    limite = inicio + duracao
+    
+    try:
+        while True:
+            restante = max(0, limite - time.time())
+            passo = min(restante, fatia) if fatia else restante
+            driver.set_script_timeout(passo + 2)
+            resultado = driver.execute_async_script(script, int(passo * 1000)) or {}
+            if resultado.get('ok') and etapa:
+                _tempos_etapas.registrar(etapa, time.time() - inicio)
+            if resultado.get('ok') or passo >= restante:
+                if not resultado.get('ok'):
+                    registrar_estouro_etapa(etapa, adaptativo, duracao, timeout)
+                return resultado.get('valor')
+    except Exception as e:
+        logger.debug(f"Condição não atingida: {e}")
+        return None
+
+def sondar_pagina(driver, seletores=(), checagens=None, timeout=5, etapa=None):
+    """
+    Avalia todos os seletores e checagens de estado em um único round trip
+    (sem interação com implicit wait)
+    
+    Args:
+        seletores: Seletores CSS em ordem de preferência
+        checagens: Dicionário nome -> corpo de função JS avaliado no estado
+        timeout: Tempo máximo esperando algum seletor aparecer
+        etapa: Nome da etapa para o timeout adaptativo (ver aguardar_dom)
+    
+    Returns:
+        Dicionário com 'elemento', 'seletor' (None se nada encontrado) e 'estado'
+    """
+    funcoes = ", ".join(
+        f"{json.dumps(nome)}: function() {{ {corpo} }}" for nome, corpo in (checagens or {}).items()
+    )
+    preambulo = (PREAMBULO_SONDAGEM
+                 .replace('__SELETORES__', json.dumps(list(seletores)))
+                 .replace('__CHECAGENS__', funcoes))
+    
+    resultado = aguardar_dom(
+        driver, CONDICAO_SONDAGEM, timeout=timeout if seletores else 0,
+        ao_expirar_js="return {indice: -1, seletor: null, elemento: null, estado: estadoPagina()};",
+        preambulo_js=preambulo, etapa=etapa if seletores else None
+    )
+    
+    if not resultado:
+        return {'elemento': None, 'seletor': None, 'estado': {}}
+    return {
+        'elemento': resultado.get('elemento'),
+        'seletor': resultado.get('seletor'),
+        'estado': resultado.get('estado') or {}
+    }
+
+def find_element_fast(driver, selectors, timeout=5, etapa=None):
+    """Procura múltiplos seletores e retorna o primeiro encontrado rapidamente"""
+    return sondar_pagina(driver, selectors, timeout=timeout, etapa=etapa)['elemento']
+
+def extrair_video_url_rapido(driver, driver_id, max_wait=20):
+    """Tenta extrair URL do vídeo pelo DOM sem precisar tocar"""
+    logger.info(f"[{driver_id}] Tentando extração rápida da URL...")
+    
+    video_url = aguardar_dom(driver, CONDICAO_URL_VIDEO, timeout=max_wait)
+    
+    if isinstance(video_url, str) and len(video_url) > 20:
+        logger.info(f"[{driver_id}] URL extraída rapidamente!")
+        return video_url
+    
+    return None
+
+def iniciar_captura_rede(driver, driver_id):
+    """Inicia a captura de requisições de mídia via BiDi (None se indisponível)"""
+    if not CAPTURA_REDE_HABILITADA:
+        return None
+    
+    # Em modo multi-abas, só interessam as requisições da própria aba
+    captura = CapturaRede.do_driver(
+        driver,
+        contexto_raiz=getattr(driver, 'handle_aba', None),
+        padroes_bloqueio=PADROES_BLOQUEIO,
+        tipos_bloqueados=TIPOS_RECURSO_BLOQUEADOS,
+        bloquear_apos_captura=INTERROMPER_APOS_CAPTURA
+    )
+    if captura and captura.iniciar():
+        logger.info(f"[{driver_id}] Captura de rede ativa (BiDi)")
+        return captura
+    
+    logger.info(f"[{driver_id}] Captura de rede indisponível, usando sondagem do DOM")
+    return None
+
+def interromper_rede(driver, driver_id):
+    """Pausa o player e para todo carregamento da página (URL já capturada)"""
+    try:
+        driver.execute_script("""
+            document.querySelectorAll('video, audio').forEach(function(m) {
+                try { m.pause(); m.removeAttribute('src'); m.load(); } catch (e) {}
+            });
+            if (window.videojs) {
+                videojs.getAllPlayers().forEach(function(p) { try { p.pause(); } catch (e) {} });
+            }
+            window.stop();
+        """)
+        logger.info(f"[{driver_id}] Tráfego da página interrompido")
+    except Exception as e:
+        logger.debug(f"[{driver_id}] Erro ao interromper rede: {e}")
+
+def _esperar_em_fatias(espera, max_wait, contexto):
+    """Chama espera(timeout) em fatias curtas, checando o cancelamento entre elas"""
+    max_wait = limitar_ao_prazo(max_wait, contexto)
+    if contexto is None:
+        return espera(max_wait)
+    
+    limite = time.monotonic() + max_wait
+    while True:
+        contexto.verificar()
+        restante = limite - time.monotonic()
+        resultado = espera(max(0, min(restante, FATIA_CANCELAMENTO)))
+        if resultado or restante <= FATIA_CANCELAMENTO:
+            return resultado
+
+def aguardar_url_video(driver, driver_id, captura=None, max_wait=10, contexto=None):
+    """Aguarda a URL do vídeo: pela rede quando possível, senão pelo DOM"""
+    if captura and captura.ativa:
+        video_url = _esperar_em_fatias(captura.aguardar, max_wait, contexto)
+        if video_url:
+            logger.info(f"[{driver_id}] URL capturada na rede!")
+            return video_url
+        
+        # Última checagem do DOM (URL escrita no player sem requisição observada)
+        return extrair_video_url_rapido(driver, driver_id, max_wait=0)
+    
+    if contexto is None:
+        return extrair_video_url_rapido(driver, driver_id, max_wait=max_wait)
+    
+    video_url = _esperar_em_fatias(lambda t: aguardar_dom(driver, CONDICAO_URL_VIDEO, timeout=t), max_wait, contexto)
+    if isinstance(video_url, str) and len(video_url) > 20:
+        logger.info(f"[{driver_id}] URL extraída rapidamente!")
+        return video_url
+    return None
+
+# Atributos dos seletores de servidor (data-id herdado do ancestral, se houver)
+FUNCAO_ATRIBUTOS_SERVIDORES = """
+function atributosServidores() {
+    var servidores = [];
+    document.querySelectorAll('server-selector').forEach(function(el) {
+        var atributos = {};
+        for (var i = 0; i < el.attributes.length; i++) {
+            atributos[el.attributes[i].name] = el.attributes[i].value;
+        }
+        if (!atributos['data-id']) {
+            var ancestral = el.closest('[data-id]');
+            if (ancestral) atributos['data-id'] = ancestral.getAttribute('data-id');
+        }
+        if (el.closest('.hidden')) atributos['oculto'] = '1';
+        servidores.push(atributos);
+    });
+    return servidores;
+}
+"""
+
+SCRIPT_ATRIBUTOS_SERVIDORES = FUNCAO_ATRIBUTOS_SERVIDORES + """
+return [location.href, atributosServidores()];
+"""
+
+# Seletores de servidor mudaram (outro episódio carregado na mesma página)
+CONDICAO_SERVIDORES_ALTERADOS = """
+    var atual = JSON.stringify(atributosServidores());
+    return (atual !== '[]' && atual !== __ANTERIOR__) ? atual : null;
+"""
+
+# Elemento do episódio na lista da página da série (atributo numérico ou texto)
+CONDICAO_SELETOR_EPISODIO = """
+    var candidatos = document.querySelectorAll(__SELETORES__);
+    for (var i = 0; i < candidatos.length; i++) {
+        var el = candidatos[i];
+        var numero = el.getAttribute('data-episode') || el.getAttribute('data-episodio') ||
+            el.getAttribute('data-ep') || el.getAttribute('data-number') || el.textContent || '';
+        var m = String(numero).match(/\\d+/);
+        if (m && parseInt(m[0], 10) === __EPISODIO__) return el;
+    }
+    return null;
+"""
+
+def ler_servidores(driver, driver_id):
+    """Lê os atributos de todos os server-selector em um script: (url_pagina, servidores)"""
+    try:
+        url_pagina, servidores = driver.execute_script(SCRIPT_ATRIBUTOS_SERVIDORES)
+        return url_pagina, servidores or []
+    except Exception as e:
+        logger.debug(f"[{driver_id}] Erro ao ler atributos dos servidores: {e}")
+        return None, []
+
+def montar_url_get_embed(driver, driver_id, servidor_preferido=SERVIDOR_PREFERIDO, lang=IDIOMA_DUBLADO, pagina=None):
+    """Monta a URL do getEmbed pelos atributos dos server-selector (pagina = ler_servidores já feito)"""
+    url_pagina, servidores = pagina or ler_servidores(driver, driver_id)
+    if not url_pagina:
+        return None
+    
+    atributos = escolher_servidor(servidores, servidor_preferido, lang)
+    if not atributos:
+        return None
+    return construir_url_get_embed(url_pagina, atributos, lang)
+
+def navegar_com_referer(driver, url, timeout=10, etapa='navegacao'):
+    """
+    Navega a partir do documento atual (o navegador envia o Referer como faria o iframe)
+    e aguarda o novo documento sair do estado 'loading'
+    """
+    verificar_cancelamento(contexto_atual())
+    inicio = time.monotonic()
+    url_anterior = driver.execute_script("var u = location.href; window.location.href = arguments[0]; return u;", url)
+    
+    def novo_documento(d):
+        try:
+            href, estado = d.execute_script("return [location.href, document.readyState];")
+            return href != url_anterior and estado != 'loading'
+        except Exception:
+            return False
+    
+    adaptativo = timeout_adaptativo(etapa, timeout)
+    limite = limitar_ao_prazo(adaptativo)
+    try:
+        WebDriverWait(driver, limite, poll_frequency=0.1).until(novo_documento)
+    except TimeoutException:
+        registrar_estouro_etapa(etapa, adaptativo, limite, timeout)
+        raise
+    _tempos_etapas.registrar(etapa, time.monotonic() - inicio)
+
+def _entrar_no_iframe_player(driver, driver_id):
+    """A partir do documento do getEmbed, entra no iframe do player"""
+    child_iframe_selectors = [
+        'iframe[src*="mixdrop"]',
+        'iframe#player',
+        'iframe'
+    ]
+    
+    child_iframe = (aguardar_dom(driver, CONDICAO_IFRAME_PLAYER, timeout=5, etapa='iframe_player')
+                    or find_element_fast(driver, child_iframe_selectors, timeout=0))
+    
+    if not child_iframe:
+        raise Exception("Iframe FILHO não encontrado")
+    
+    driver.switch_to.frame(child_iframe)
+    aguardar_dom(driver, CONDICAO_PLAYER_CARREGADO, timeout=5, etapa='player_carregado')
+
+def entrar_no_player(driver, driver_id, parent_iframe=None):
+    """
+    Chega ao documento do player
+    
+    No modo direto abre o src de cada iframe como documento principal (com Referer),
+    liberando o navegador da página do warezcdn e dos anúncios. Se falhar, entra
+    pelos frames a partir de onde parou.
+    
+    Args:
+        parent_iframe: Iframe do getEmbed na página do warezcdn
+                       (None quando o getEmbed já é o documento principal)
+    """
+    navegacoes = 0 if parent_iframe is not None else 1
+    
+    if NAVEGACAO_DIRETA_IFRAMES:
+        try:
+            if parent_iframe is not None:
+                src_embed = driver.execute_script("return arguments[0].src;", parent_iframe)
+                logger.info(f"[{driver_id}] Abrindo getEmbed diretamente: {src_embed}")
+                navegar_com_referer(driver, src_embed)
+                navegacoes += 1
+            
+            child_iframe = aguardar_dom(driver, CONDICAO_IFRAME_PLAYER, timeout=5, etapa='iframe_player')
+            if not child_iframe:
+                raise Exception("Iframe do player não encontrado no getEmbed")
+            
+            src_player = driver.execute_script("return arguments[0].src;", child_iframe)
+            logger.info(f"[{driver_id}] Abrindo player diretamente: {src_player}")
+            navegar_com_referer(driver, src_player)
+            navegacoes += 1
+            
+            if aguardar_dom(driver, CONDICAO_PLAYER_CARREGADO, timeout=5, etapa='player_carregado'):
+                return
+            raise Exception("Player não carregou como documento principal")
+        
+        except Exception as e:
+            logger.info(f"[{driver_id}] Navegação direta falhou ({e}), usando frames...")
+    
+    if navegacoes == 0:
+        logger.info(f"[{driver_id}] Entrando nos iframes...")
+        driver.switch_to.frame(parent_iframe)
+    elif navegacoes == 2:
+        # Volta ao getEmbed (documento principal) e entra no player pelo iframe
+        driver.back()
+    
+    _entrar_no_iframe_player(driver, driver_id)
+
+def abrir_player_warezcdn(driver, driver_id, url, contexto=None):
+    """
+    Percorre a página do warezcdn até o documento do player (camada A)
+    
+    Com contexto, o cancelamento é checado entre as etapas.
+    
+    Returns:
+        {'dublado': True, 'embed_url': URL do player, 'servidor', 'url_pagina', 'servidores'} ou
+        {'dublado': False, 'motivo': ..., 'erro': bool} quando não há versão dublada
+    """
+    logger.info(f"[{driver_id}] Navegando: {url}")
+    
+    carregada = carregar_pagina(driver, url)
+    
+    # Uma única sondagem: página pronta, estado da dublagem e audio-selector
+    sondagem = sondar_pagina(
+        driver,
+        ['audio-selector[data-lang="2"]', 'server-selector'],
+        checagens={'audios_ocultos': CHECAGEM_AUDIOS_OCULTOS},
+        timeout=10,
+        etapa='seletores_pagina'
+    )
+    
+    # Carregamento cortado pelo timeout e nenhum seletor: falha, não "sem dublagem"
+    if not carregada and not sondagem['seletor']:
+        raise Exception("Página não carregou dentro do timeout")
+    verificar_cancelamento(contexto)
+    
+    # Verificar dublagem
+    logger.info(f"[{driver_id}] Verificando dublagem...")
+    if sondagem['estado'].get('audios_ocultos'):
+        logger.warning(f"[{driver_id}] Conteúdo legendado - pulando")
+        return {'dublado': False, 'motivo': 'Conteúdo legendado', 'erro': False}
+    
+    # Atributos de todos os servidores (getEmbed montado e alternativas)
+    url_pagina, servidores = ler_servidores(driver, driver_id)
+    servidor = None
+    
+    # Atalho: montar a URL do getEmbed pelos atributos, sem clicar nos seletores
+    no_player = False
+    src_embed = (montar_url_get_embed(driver, driver_id, pagina=(url_pagina, servidores))
+                 if CONSTRUIR_URL_EMBED else None)
+    
+    if src_embed:
+        try:
+            logger.info(f"[{driver_id}] Abrindo getEmbed montado: {src_embed}")
+            navegar_com_referer(driver, src_embed)
+            entrar_no_player(driver, driver_id)
+            no_player = True
+            servidor = servidor_da_url_get_embed(src_embed)
+        except Exception as e:
+            logger.info(f"[{driver_id}] getEmbed montado falhou ({e}), usando cliques...")
+            driver.switch_to.default_content()
+            carregar_pagina(driver, url)
+            sondagem = sondar_pagina(
+                driver,
+                ['audio-selector[data-lang="2"]', 'server-selector'],
+                timeout=10,
+                etapa='seletores_pagina'
+            )
+    
+    verificar_cancelamento(contexto)
+    
+    if not no_player:
+        # Clicar em audio-selector se existir (já localizado pela sondagem)
+        if sondagem['seletor'] == 'audio-selector[data-lang="2"]':
+            logger.info(f"[{driver_id}] Clicando no audio-selector...")
+            smart_click(driver, sondagem['elemento'], driver_id)
+        
+        # Procurar server-selector (visível, mixdrop preferido)
+        logger.info(f"[{driver_id}] Procurando server-selector...")
+        server_selectors = [
+            'server-selector[data-server="mixdrop"][data-lang="2"]',
+            'server-selector[data-lang="2"]'
+        ]
+        
+        server_selector = (aguardar_dom(driver, CONDICAO_SERVIDOR_DUBLADO, timeout=3, etapa='servidor_dublado')
+                           or find_element_fast(driver, server_selectors, timeout=0))
+        
+        if not server_selector:
+            logger.warning(f"[{driver_id}] Server-selector não encontrado")
+            return {'dublado': False, 'motivo': 'Server-selector não encontrado', 'erro': True}
+        
+        try:
+            servidor = server_selector.get_attribute('data-server')
+        except Exception:
+            pass
+        smart_click(driver, server_selector, driver_id)
+        verificar_cancelamento(contexto)
+        
+        # Entrar nos iframes (cada espera já devolve o iframe com src)
+        logger.info(f"[{driver_id}] Aguardando iframes...")
+        
+        parent_iframe_selectors = [
+            'embedcontent.active iframe',
+            'embedcontent iframe',
+            'iframe[src*="getEmbed"]'
+        ]
+        
+        parent_iframe = (aguardar_dom(driver, CONDICAO_IFRAME_EMBED, timeout=10, etapa='iframe_embed')
+                         or find_element_fast(driver, parent_iframe_selectors, timeout=0))
+        if not parent_iframe:
+            raise Exception("Iframe PAI não encontrado")
+        verificar_cancelamento(contexto)
+        
+        entrar_no_player(driver, driver_id, parent_iframe)
+    
+    # URL do documento do player (principal ou frame atual)
+    try:
+        embed_url = driver.execute_script("return location.href;")
+    except Exception:
+        embed_url = None
+    
+    return {'dublado': True, 'embed_url': embed_url, 'servidor': servidor,
+            'url_pagina': url_pagina, 'servidores': servidores}
+
+def abrir_embed(driver, driver_id, embed_url):
+    """Abre o embed do player guardado no cache direto como documento principal (camada B)"""
+    logger.info(f"[{driver_id}] Abrindo embed do cache: {embed_url}")
+    carregar_pagina(driver, embed_url, etapa='embed')
+    if not aguardar_dom(driver, CONDICAO_PLAYER_CARREGADO, timeout=10, etapa='player_carregado'):
+        raise Exception("Player do embed não carregou")
+
+def tocar_player(driver, driver_id):
+    """Remove overlays e clica no play (ou no centro do player)"""
+    # Remover overlays
+    try:
+        driver.execute_script("""
+            var overlays = document.querySelectorAll('div[style*="position: absolute"][style*="z-index"]');
+            overlays.forEach(o => o.remove());
+        """)
+    except:
+        pass
+    
+    # Tentar clicar no player
+    logger.info(f"[{driver_id}] Procurando botão play...")
+    play_button_selectors = [
+        'button.vjs-big-play-button',
+        '.vjs-play-control',
+        'button[aria-label*="Play"]'
+    ]
+    
+    play_button = find_element_fast(driver, play_button_selectors, timeout=5, etapa='botao_play')
+    if play_button:
+        smart_click(driver, play_button, driver_id)
+    else:
+        # Tentar clicar no centro como fallback
+        try:
+            width = driver.execute_script("return window.innerWidth")
+            height = driver.execute_script("return window.innerHeight")
+            actions = ActionChains(driver)
+            actions.move_by_offset(width // 2, height // 2).click().perform()
+            actions.move_by_offset(-width // 2, -height // 2).perform()
+        except:
+            pass
+
+def servidor_do_player(driver):
+    """Servidor do documento atual do player pelo host (ex: mixdrop.ag -> mixdrop)"""
+    try:
+        host = driver.execute_script("return location.hostname;") or ''
+    except Exception:
+        return None
+    partes = host.lower().split('.')
+    return partes[-2] if len(partes) >= 2 else (host or None)
+
+def capturar_url_no_player(driver, driver_id, captura=None, contexto=None, espera_passiva=10, espera_play=15,
+                           servidor=None, tipo=None, aprender=True):
+    """
+    Já no documento do player, obtém a URL da mídia (tocando o vídeo se preciso)
+    
+    Duas estratégias: 'passiva' (esperar a URL sem tocar) e 'play' (remover overlays,
+    clicar no play e esperar). Com ESTRATEGIAS_ADAPTATIVAS o histórico do servidor e
+    tipo de conteúdo decide se a passiva vale a pena antes do play e corta a espera
+    de cada uma no p95 dos sucessos. Na corrida a espera passiva já vem curta e
+    aprender=False deixa a tentativa fora do histórico.
+    """
+    servidor = servidor or servidor_do_player(driver)
+    aprendido = ESTRATEGIAS_ADAPTATIVAS and not _historico_estrategias.explorar()
+    padroes = {'passiva': espera_passiva, 'play': espera_play}
+    esperas = dict(padroes)
+    ordem = ['passiva', 'play']
+    
+    def registrar(estrategia, video_url, inicio):
+        # Só esperas inteiras entram no histórico: a espera cortada pelo orçamento não vê os
+        # sucessos mais lentos que ela (amostra censurada) e o orçamento só encolheria
+        if not aprender or esperas[estrategia] < padroes[estrategia]:
+            return
+        if contexto is not None and contexto.cancelado:
+            return
+        _historico_estrategias.registrar(servidor, tipo, estrategia, bool(video_url), time.monotonic() - inicio)
+    if aprendido:
+        ordem = _historico_estrategias.ordenar(servidor, tipo, ordem)
+        esperas = {estrategia: _historico_estrategias.orcamento(servidor, tipo, estrategia, espera, ORCAMENTO_PERCENTIL,
+                                                                ORCAMENTO_FOLGA, ORCAMENTO_MINIMO)
+                   for estrategia, espera in esperas.items()}
+    
+    # Depois do play a espera passiva não tem mais o que observar
+    if ordem[0] == 'play':
+        logger.info(f"[{driver_id}] Histórico de {servidor}: tocando o vídeo direto (play em até {esperas['play']:.1f}s)")
+    else:
+        # OTIMIZAÇÃO PRINCIPAL: Tentar extração rápida primeiro
+        logger.info(f"[{driver_id}] Tentando extração rápida (sem tocar vídeo)...")
+        inicio = time.monotonic()
+        video_url = aguardar_url_video(driver, driver_id, captura, max_wait=esperas['passiva'], contexto=contexto)
+        registrar('passiva', video_url, inicio)
+        
+        if video_url:
+            return video_url
+        
+        verificar_cancelamento(contexto)
+        
+        # Se não conseguiu pela extração rápida, tentar o método tradicional
+        logger.info(f"[{driver_id}] Extração rápida falhou, tentando método tradicional...")
+    
+    tocar_player(driver, driver_id)
+    inicio = time.monotonic()
+    
+    # Procurar URL após tentar tocar
+    logger.info(f"[{driver_id}] Procurando URL do vídeo...")
+    video_url = aguardar_url_video(driver, driver_id, captura, max_wait=esperas['play'], contexto=contexto)
+    registrar('play', video_url, inicio)
+    return video_url
+
+def resolver_embed_http(embed_url, url_pagina, driver_id):
+    """Resolve a URL direta a partir do embed só com HTTP (camada B sem navegador)"""
+    try:
+        video_url, _ = resolver_player_http(embed_url, referer=url_pagina)
+        return video_url
+    except Exception as e:
+        logger.debug(f"[{driver_id}] Erro ao resolver embed via HTTP: {e}")
+        return None
+
+def chave_alternativas(chave):
+    """Chave das alternativas de um registro no cache local (separada do registro)"""
+    return (f"alternativas:{chave[0]}",) + tuple(chave[1:])
+
+def guardar_alternativas(url, alternativas, tipo='filme', temporada=None, episodio=None):
+    """Guarda os servidores alternativos no Supabase (se houver coluna) e no cache local"""
+    chave = chave_alternativas(chave_registro(url, tipo, temporada, episodio))
+    _cache_local.guardar(chave, alternativas, ttl=CACHE_TTL_POSITIVO)
+    if _cache_disco is not None:
+        _cache_disco.guardar(chave, alternativas, ttl=CACHE_DISCO_TTL_POSITIVO)
+    atualizar_alternativas_supabase(url, alternativas, tipo, temporada, episodio)
+
+def obter_alternativas(url, registro, tipo='filme', temporada=None, episodio=None):
+    """Alternativas do registro do Supabase ou, sem a coluna, as do cache local"""
+    if registro.get('alternativas'):
+        return registro['alternativas']
+    
+    chave = chave_alternativas(chave_registro(url, tipo, temporada, episodio))
+    alternativas = _cache_local.obter(chave)
+    if alternativas is FALTA and _cache_disco is not None:
+        alternativas = _cache_disco.obter(chave)
+    return alternativas if isinstance(alternativas, list) else []
+
+def colher_alternativas(url, driver_id, url_pagina, servidores, servidor_principal, tipo='filme',
+                        temporada=None, episodio=None):
+    """Resolve os outros servidores da página (HTTP, em paralelo) e guarda os que funcionarem"""
+    try:
+        alternativas = resolver_servidores_http(url_pagina, servidores, IDIOMA_DUBLADO, ORDEM_SERVIDORES,
+                                                ignorar={servidor_principal})
+    except Exception as e:
+        logger.debug(f"[{driver_id}] Erro ao colher alternativas: {e}")
+        return []
+    
+    if alternativas:
+        logger.info(f"[{driver_id}] Alternativas: {[a['servidor'] for a in alternativas]}")
+        guardar_alternativas(url, alternativas, tipo, temporada, episodio)
+    return alternativas
+
+def colher_alternativas_em_segundo_plano(url, driver_id, pagina, tipo='filme', temporada=None, episodio=None):
+    """Agenda colher_alternativas sem atrasar a resposta do servidor principal"""
+    global _executor_alternativas
+    
+    if not COLHER_ALTERNATIVAS or not pagina.get('url_pagina') or not pagina.get('servidores'):
+        return
+    
+    with _alternativas_lock:
+        if _executor_alternativas is None:
+            _executor_alternativas = ThreadPoolExecutor(max_workers=2, thread_name_prefix="alternativas")
+    
+    _executor_alternativas.submit(
+        colher_alternativas, url, driver_id, pagina['url_pagina'], pagina['servidores'],
+        pagina.get('servidor'), tipo, temporada, episodio
+    )
+
+def servir_alternativa(url, driver_id, alternativas, usar_http=True):
+    """
+    Primeira alternativa utilizável na ordem do ranking: URL direta ainda válida ou,
+    com HTTP, o embed dela resolvido de novo (sem navegador)
+    
+    Returns:
+        Alternativa atualizada ({'servidor', 'embed_url', 'video_url'}) ou None
+    """
+    for alternativa in alternativas:
+        video_url = alternativa.get('video_url')
+        if video_url and estado_url_cache(video_url) != 'expirada':
+            return alternativa
+        
+        if usar_http and alternativa.get('embed_url'):
+            video_url = resolver_embed_http(alternativa['embed_url'], url, driver_id)
+            if video_url:
+                return dict(alternativa, video_url=video_url)
+    return None
+
+def revalidar_em_segundo_plano(url, driver_id, tipo='filme', temporada=None, episodio=None,
+                               usar_driver_persistente=True):
+    """Agenda a renovação da URL direta (uma por registro), sem bloquear quem pediu"""
+    global _executor_revalidacao
+    
+    chave = chave_registro(url, tipo, temporada, episodio)
+    with _revalidacoes_lock:
+        if chave in _revalidacoes_em_andamento:
+            return False
+        _revalidacoes_em_andamento.add(chave)
+        if _executor_revalidacao is None:
+            _executor_revalidacao = ThreadPoolExecutor(max_workers=REVALIDACAO_MAX_THREADS,
+                                                       thread_name_prefix="revalidacao")
+    
+    def revalidar():
+        try:
+            # Sem coalescer: quem chega durante a renovação recebe a URL obsoleta na hora em vez de esperar
+            resultado = _extrair_url_video(url, f"{driver_id}-reval", tipo, temporada, episodio,
+                                           usar_driver_persistente=usar_driver_persistente, renovar=True)
+            if not resultado.get('success'):
+                logger.warning(f"[{driver_id}] Revalidação falhou: {resultado.get('error')}")
+        except Exception as e:
+            logger.error(f"[{driver_id}] Erro na revalidação: {e}")
+        finally:
+            with _revalidacoes_lock:
+                _revalidacoes_em_andamento.discard(chave)
+    
+    logger.info(f"[{driver_id}] URL perto de expirar, renovando em segundo plano...")
+    _executor_revalidacao.submit(revalidar)
+    return True
+
+def _resultado_prazo_excedido(elapsed, tipo, temporada, episodio):
+    """Resultado de extração abandonada por prazo vencido"""
+    return {
+        'success': False,
+        'timeout': True,
+        'error': f'Prazo da extração excedido ({elapsed:.0f}s)',
+        'dublado': None,
+        'extraction_time': f"{elapsed:.2f}s",
+        'tipo': tipo,
+        'temporada': temporada,
+        'episodio': episodio
+    }
+
+def _camada(embed_url):
+    """Chave do histórico das estratégias de extração: embed conhecido ou página inteira"""
+    return 'embed' if embed_url else 'pagina'
+
+def _resultado_definitivo(resultado):
+    """URL encontrada ou conteúdo sem versão dublada: encerra a corrida"""
+    return bool(resultado.get('success')) or resultado.get('dublado') is False
+
+def _tentativa_http(contexto, url, driver_id, embed_url, identificador, tipo=None):
+    """Estratégia sem navegador: renova pelo embed conhecido ou extrai a página via HTTP"""
+    inicio = time.monotonic()
+    if embed_url:
+        logger.info(f"[{driver_id}] Renovando URL direta pelo embed via HTTP ({identificador})...")
+        video_url = resolver_embed_http(embed_url, url, driver_id)
+        resultado = {'success': bool(video_url), 'video_url': video_url, 'embed_url': embed_url}
+        if not video_url:
+            resultado['error'] = 'Embed do cache não resolveu via HTTP'
+    else:
+        logger.info(f"[{driver_id}] Tentando extração HTTP ({identificador})...")
+        resultado = extrair_url_video_http(
+            url, ordem_servidores=ORDEM_SERVIDORES if COLHER_ALTERNATIVAS else None
+        )
+    
+    _historico_estrategias.registrar(_camada(embed_url), tipo, 'http', bool(resultado.get('success')),
+                                     time.monotonic() - inicio)
+    if not resultado.get('success'):
+        logger.info(f"[{driver_id}] Extração HTTP falhou ({resultado.get('error')})")
+    return resultado
+
+def _tentativa_alternativa(contexto, url, driver_id, alternativas, usar_http):
+    """Link principal morto: servidor alternativo guardado, sem navegador"""
+    alternativa = servir_alternativa(url, driver_id, alternativas, usar_http)
+    if not alternativa:
+        return {'success': False, 'error': 'Nenhuma alternativa utilizável'}
+    return {'success': True, 'video_url': alternativa['video_url'], 'embed_url': alternativa.get('embed_url'),
+            'servidor': alternativa.get('servidor'), 'alternativa': alternativa}
+
+def _tentativa_navegador(contexto, url, driver_id, embed_url, identificador, usar_driver_persistente=False,
+                         driver=None, espera_passiva=10, apenas_ocioso=False, tipo=None, aprender=True):
+    """
+    Estratégia com navegador: só o player pelo embed conhecido (camada B) ou a página
+    do warezcdn inteira (camada A); cancelável entre etapas
+    
+    Returns:
+        {'success': True, 'video_url', 'embed_url', 'servidor', 'alternativas', 'url_pagina', 'servidores'},
+        {'success': False, 'dublado': False, 'motivo', 'erro'} sem versão dublada ou
+        {'success': False, 'error'}
+    
+    Com prazo no contexto, o vigia mata o navegador próprio (do pool ou local) que
+    continuar preso depois do prazo; um driver externo só é cancelado.
+    """
+    logger.info(f"[{driver_id}] Iniciando extração otimizada ({identificador})...")
+    inicio = time.time()
+    camada = _camada(embed_url)
+    pool = None
+    driver_criado_localmente = False
+    captura = None
+    vigilancia = None
+    sessao_morta = threading.Event()
+    
+    try:
+        # Obter driver (externo, do pool de persistentes ou criar novo)
+        if driver is not None:
+            driver.switch_to.default_content()
+        elif usar_driver_persistente:
+            pool = obter_pool()
+            driver = pool.obter(limitar_ao_prazo(POOL_TIMEOUT_CHECKOUT, contexto), apenas_ocioso=apenas_ocioso)
+        else:
+            driver = criar_navegador_firefox_otimizado()
+            driver_criado_localmente = True
+        
+        if contexto is not None and (pool or driver_criado_localmente):
+            vigilancia, sessao_morta = vigiar_sessao(contexto, driver, driver_id, pool)
+        verificar_cancelamento(contexto)
+        
+        # Observar a rede desde a navegação (pega inclusive o preload do player)
+        captura = iniciar_captura_rede(driver, driver_id)
+        
+        video_url = None
+        player = None
+        servidor = None
+        alternativas_colhidas = None
+        if embed_url:
+            # Camada B: só o player, sem warezcdn, dublagem nem seletores
+            try:
+                abrir_embed(driver, driver_id, embed_url)
+                video_url = capturar_url_no_player(driver, driver_id, captura, contexto, espera_passiva, tipo=tipo,
+                                                   aprender=aprender)
+            except ExtracaoCancelada:
+                raise
+            except Exception as e:
+                logger.info(f"[{driver_id}] Embed do cache falhou ({e})")
+            
+            if not video_url:
+                logger.info(f"[{driver_id}] Embed do cache não resolveu, refazendo a extração completa...")
+                embed_url = None
+        
+        if not video_url:
+            player = abrir_player_warezcdn(driver, driver_id, url, contexto)
+            
+            if not player['dublado']:
+                return {'success': False, 'dublado': False, 'motivo': player['motivo'], 'erro': player['erro']}
+            
+            embed_url = player['embed_url']
+            servidor = player['servidor']
+            video_url = capturar_url_no_player(driver, driver_id, captura, contexto, espera_passiva,
+                                               servidor=servidor, tipo=tipo, aprender=aprender)
+            
+            if not video_url and COLHER_ALTERNATIVAS and player['servidores']:
+                # Servidor principal falhou no player: os demais via HTTP, o melhor vira o principal
+                verificar_cancelamento(contexto)
+                logger.info(f"[{driver_id}] Tentando os outros servidores via HTTP...")
+                funcionando = resolver_servidores_http(player['url_pagina'], player['servidores'], IDIOMA_DUBLADO,
+                                                       ORDEM_SERVIDORES, ignorar={servidor})
+                if funcionando:
+                    video_url, embed_url, servidor = (funcionando[0]['video_url'], funcionando[0]['embed_url'],
+                                                      funcionando[0]['servidor'])
+                    alternativas_colhidas = funcionando[1:]
+        
+        if not (video_url and len(video_url) > 20):
+            _historico_estrategias.registrar(camada, tipo, 'navegador', False, time.time() - inicio)
+            return {'success': False, 'error': 'URL do vídeo não encontrada'}
+        
+        if INTERROMPER_APOS_CAPTURA:
+            interromper_rede(driver, driver_id)
+        
+        _latencias_navegador.registrar(time.time() - inicio)
+        _historico_estrategias.registrar(camada, tipo, 'navegador', True, time.time() - inicio)
+        return {
+            'success': True,
+            'video_url': video_url,
+            'embed_url': embed_url,
+            'servidor': servidor,
+            'alternativas': alternativas_colhidas,
+            'url_pagina': player['url_pagina'] if player else None,
+            'servidores': player['servidores'] if player else None
+        }
+    
+    except ExtracaoCancelada:
+        logger.info(f"[{driver_id}] Tentativa no navegador cancelada (outra estratégia venceu)")
+        raise
+    
+    except Exception as e:
+        if contexto is not None and contexto.cancelado:
+            # Exceção de uma sessão derrubada pelo vigia (ou já sem utilidade)
+            logger.info(f"[{driver_id}] Tentativa no navegador encerrada após o prazo/cancelamento: {e}")
+            raise ExtracaoCancelada() from e
+        logger.error(f"[{driver_id}] Erro durante extração: {e}")
+        _historico_estrategias.registrar(camada, tipo, 'navegador', False, time.time() - inicio)
+        return {'success': False, 'error': str(e)}
+    
+    finally:
+        if vigilancia is not None:
+            _vigia.cancelar(vigilancia)
+        if captura:
+            captura.parar()
+        
+        # Persistente volta para o pool (descartado se o vigia o matou); local é fechado
+        if driver and pool:
+            pool.devolver(driver, descartar=sessao_morta.is_set())
+        elif driver and driver_criado_localmente:
+            encerrar_driver(driver)
+            logger.info(f"[{driver_id}] Driver local fechado")
+
+def atraso_hedge():
+    """Quando disparar a duplicata: p90 (HEDGE_PERCENTIL) das extrações no navegador; None sem histórico"""
+    percentil = _latencias_navegador.percentil(HEDGE_PERCENTIL)
+    if percentil is None:
+        return None
+    return max(percentil, HEDGE_ATRASO_MINIMO)
+
+def _tentativa_navegador_com_hedge(contexto, url, driver_id, embed_url, identificador, usar_driver_persistente=False,
+                                   driver=None, espera_passiva=10, tipo=None, aprender=True):
+    """
+    Navegador com hedge: se a extração passar do p90 observado, a mesma extração
+    começa em um segundo navegador do pool e vale a que terminar primeiro
+    
+    Só com navegadores do pool; a duplicata só usa um navegador ocioso, sem esperar nem
+    criar um novo (sem navegador pronto, não há hedge).
+    """
+    atraso = atraso_hedge() if HEDGE_HABILITADO and usar_driver_persistente and driver is None else None
+    if atraso is None:
+        return _tentativa_navegador(contexto, url, driver_id, embed_url, identificador, usar_driver_persistente,
+                                    driver, espera_passiva, tipo=tipo, aprender=aprender)
+    
+    def hedge(ctx):
+        logger.info(f"[{driver_id}] Extração passou de {atraso:.1f}s, duplicando em outro navegador (hedge)...")
+        return _tentativa_navegador(ctx, url, f"{driver_id}-hedge", embed_url, identificador, True,
+                                    espera_passiva=espera_passiva, apenas_ocioso=True, tipo=tipo, aprender=aprender)
+    
+    estrategia, resultado = correr([
+        ('principal', lambda ctx: _tentativa_navegador(ctx, url, driver_id, embed_url, identificador, True,
+                                                       espera_passiva=espera_passiva, tipo=tipo,
+                                                       aprender=aprender), 0),
+        ('hedge', hedge, atraso),
+    ], _resultado_definitivo, contexto=contexto)
+    
+    if estrategia == 'hedge':
+        logger.info(f"[{driver_id}] Hedge venceu a extração original")
+        resultado = dict(resultado, hedge=True)
+    return resultado
+
+def extrair_url_video(url, driver_id, tipo='filme', temporada=None, episodio=None, usar_driver_persistente=False, usar_http=None,
+                      driver=None, renovar=False, corrida=None, prazo=None):
+    """
+    Extrai a URL do vídeo de forma OTIMIZADA
+    
+    A extração tem duas camadas de cache no Supabase: página -> embed do player
+    (estável) e embed -> URL direta (expira). Com o embed conhecido, renovar a
+    URL direta só carrega o player, sem a página do warezcdn.
+    
+    Args:
+        url: URL da página para extração
+        driver_id: Identificador único do driver
+        tipo: 'filme' ou 'serie'
+        temporada: Número da temporada (obrigatório para séries)
+        episodio: Número do episódio (obrigatório para séries)
+        usar_driver_persistente: Se True, usa um navegador do pool (mantido aberto para próximas extrações)
+        usar_http: Se True, tenta a extração só com HTTP antes do navegador
+                   (None usa EXTRACAO_HTTP_HABILITADA)
+        driver: Driver (ou AbaNavegador) já aberto; não é fechado nem devolvido ao pool
+        renovar: Se True, ignora a URL direta do cache e resolve de novo a partir do embed
+                 (URLs perto de expirar são servidas e renovadas em segundo plano;
+                 expiradas contam como miss)
+        corrida: Se True, HTTP e navegador correm juntos e vale a primeira URL válida
+                 (None usa CORRIDA_HABILITADA); com navegador do pool há hedge após o p90
+        prazo: Prazo total em segundos (None usa PRAZO_EXTRACAO; 0 = sem prazo); limita
+               cada etapa e, vencido, retorna {'success': False, 'timeout': True}
+    
+    Chamadas concorrentes para o mesmo filme/episódio (e mesmo renovar) são coalescidas:
+    só uma extração roda e as demais recebem o mesmo resultado ('compartilhado': True),
+    limitadas ao prazo de quem chegou primeiro. Chamadas com driver próprio não são
+    coalescidas (o driver de quem espera ficaria ocioso).
+    
+    Returns:
+        Dicionário com resultado da extração ('video_url' é a URL direta e 'embed_url' o player)
+    """
+    if not COALESCER_EXTRACOES or driver is not None:
+        return _extrair_url_video(url, driver_id, tipo, temporada, episodio, usar_driver_persistente,
+                                  usar_http, driver, renovar, corrida, prazo)
+    
+    chave = (chave_registro(url, tipo, temporada, episodio), bool(renovar))
+    resultado, compartilhado = _extracoes_em_andamento.executar(
+        chave, _extrair_url_video, url, driver_id, tipo, temporada, episodio,
+        usar_driver_persistente, usar_http, driver, renovar, corrida, prazo
+    )
+    
+    if compartilhado:
+        logger.info(f"[{driver_id}] Resultado compartilhado de extração em andamento")
+        resultado = dict(resultado, compartilhado=True)
+    return resultado
+
+def _extrair_url_video(url, driver_id, tipo='filme', temporada=None, episodio=None, usar_driver_persistente=False,
+                       usar_http=None, driver=None, renovar=False, corrida=None, prazo=None):
+    """Extração propriamente dita (ver extrair_url_video)"""
+    raiz = ContextoExtracao.com_prazo(PRAZO_EXTRACAO if prazo is None else prazo)
+    
+    if tipo == 'serie' and (temporada is None or episodio is None):
+        logger.error(f"[{driver_id}] Para séries é necessário informar temporada e episódio")
+        return {
+            'success': False,
+            'error': 'Temporada e episódio são obrigatórios para séries'
+        }
+    
+    identificador = f"T{temporada}E{episodio}" if tipo == 'serie' else "Filme"
+    logger.info(f"[{driver_id}] Verificando cache Supabase ({identificador})...")
+    
+    resultado_busca = buscar_dados_supabase(url, tipo, temporada, episodio)
+    
+    if isinstance(resultado_busca, dict) and resultado_busca.get('skip'):
+        logger.info(f"[{driver_id}] Extração pulada: {resultado_busca.get('reason')}")
+        return {
+            'success': False,
+            'skipped': True,
+            'reason': resultado_busca.get('reason'),
+            'extraction_time': '0.00s',
+            'dublado': False,
+            'tipo': tipo,
+            'temporada': temporada,
+            'episodio': episodio
+        }
+    
+    registro = resultado_busca or {}
+    embed_url = registro.get('embed_url')
+    estado_cache = estado_url_cache(registro['video_url']) if registro.get('video_url') else None
+    
+    if estado_cache == 'expirada':
+        logger.info(f"[{driver_id}] video_url do cache expirada - {identificador}")
+    
+    if estado_cache in ('fresca', 'obsoleta') and not renovar:
+        logger.info(f"[{driver_id}] video_url do cache ({estado_cache}) - {identificador}")
+        if estado_cache == 'obsoleta':
+            revalidar_em_segundo_plano(url, driver_id, tipo, temporada, episodio, usar_driver_persistente)
+        return {
+            'success': True, 
+            'video_url': registro['video_url'],
+            'embed_url': embed_url,
+            'from_cache': True,
+            'stale': estado_cache == 'obsoleta',
+            'extraction_time': '0.00s',
+            'dublado': True,
+            'tipo': tipo,
+            'temporada': temporada,
+            'episodio': episodio
+        }
+    
+    start_time = time.time()
+    
+    # Caminho sem navegador; o Selenium fica como fallback
+    if usar_http is None:
+        usar_http = EXTRACAO_HTTP_HABILITADA
+    if corrida is None:
+        corrida = CORRIDA_HABILITADA
+    
+    # Sequencial: HTTP -> alternativa guardada -> navegador (cada uma só se a anterior falhar),
+    # com HTTP e navegador na ordem aprendida do histórico (o que costuma dar certo mais rápido primeiro).
+    # Corrida: HTTP e navegador começam juntos; a alternativa fica para quando os dois falharem
+    alternativas = obter_alternativas(url, registro, tipo, temporada, episodio) if registro else []
+    espera_passiva = CORRIDA_ESPERA_PASSIVA if corrida else 10
+    estrategias = ['http', 'navegador'] if usar_http else ['navegador']
+    if ESTRATEGIAS_ADAPTATIVAS and not corrida and len(estrategias) > 1 and not _historico_estrategias.explorar():
+        estrategias = _historico_estrategias.ordenar(_camada(embed_url), tipo, estrategias)
+    
+    funcoes = {
+        'http': lambda ctx: _tentativa_http(ctx, url, driver_id, embed_url, identificador, tipo),
+        'alternativa': lambda ctx: _tentativa_alternativa(ctx, url, driver_id, alternativas, usar_http),
+        'navegador': lambda ctx: _tentativa_navegador_com_hedge(
+            ctx, url, driver_id, embed_url, identificador, usar_driver_persistente, driver, espera_passiva, tipo=tipo,
+            aprender=not corrida
+        ),
+    }
+    if alternativas:
+        estrategias.insert(estrategias.index('http') + 1 if usar_http else estrategias.index('navegador'), 'alternativa')
+    
+    tentativas = []
+    for estrategia in estrategias:
+        if corrida:
+            atraso = None if estrategia == 'alternativa' else 0
+        else:
+            atraso = None if tentativas else 0
+        tentativas.append((estrategia, funcoes[estrategia], atraso))
+    
+    # Com driver externo a tentativa perdedora precisa largar a aba antes de retornar
+    try:
+        estrategia, resultado = correr(tentativas, _resultado_definitivo, contexto=raiz,
+                                       aguardar_perdedores=driver is not None)
+    except PrazoExcedido:
+        elapsed = time.time() - start_time
+        logger.warning(f"[{driver_id}] Prazo da extração vencido em {elapsed:.2f}s ({identificador})")
+        return _resultado_prazo_excedido(elapsed, tipo, temporada, episodio)
+    resultado = resultado or {}
+    elapsed = time.time() - start_time
+    
+    if estrategia is None:
+        return {
+            'success': False, 
+            'error': resultado.get('error') or 'URL do vídeo não encontrada', 
+            'dublado': None,
+            'extraction_time': f"{elapsed:.2f}s",
+            'tipo': tipo,
+            'temporada': temporada,
+            'episodio': episodio
+        }
+    
+    with _vitorias_lock:
+        _vitorias_estrategias[estrategia] = _vitorias_estrategias.get(estrategia, 0) + 1
+    if corrida:
+        logger.info(f"[{driver_id}] Corrida vencida por {estrategia} ({identificador})")
+    
+    if resultado.get('dublado') is False:
+        atualizar_supabase(url, None, False, tipo, temporada, episodio)
+        if resultado.get('erro'):
+            return {
+                'success': False, 
+                'error': resultado['motivo'], 
+                'dublado': False,
+                'extraction_time': f"{elapsed:.2f}s",
+                'tipo': tipo,
+                'temporada': temporada,
+                'episodio': episodio
+            }
+        return {
+            'success': False,
+            'skipped': True,
+            'reason': resultado['motivo'],
+            'extraction_time': f"{elapsed:.2f}s",
+            'dublado': False,
+            'tipo': tipo,
+            'temporada': temporada,
+            'episodio': episodio
+        }
+    
+    video_url = resultado['video_url']
+    embed_url = resultado.get('embed_url') or embed_url
+    
+    if estrategia == 'alternativa':
+        alternativa = resultado['alternativa']
+        logger.info(f"[{driver_id}] ✓ Servindo alternativa {alternativa.get('servidor')} em {elapsed:.2f}s ({identificador})")
+        if alternativa not in alternativas:
+            guardar_alternativas(url, [alternativa if a.get('servidor') == alternativa.get('servidor') else a
+                                       for a in alternativas], tipo, temporada, episodio)
+    else:
+        via = " via HTTP" if estrategia == 'http' else ""
+        logger.info(f"[{driver_id}] ✓ URL encontrada{via} em {elapsed:.2f}s ({identificador})")
+        atualizar_supabase(url, video_url, True, tipo, temporada, episodio, embed_url=embed_url)
+        
+        # Extração completa: as outras opções de servidor ficam guardadas
+        if resultado.get('alternativas'):
+            guardar_alternativas(url, resultado['alternativas'], tipo, temporada, episodio)
+        elif resultado.get('alternativas') is None and resultado.get('servidores'):
+            colher_alternativas_em_segundo_plano(url, driver_id, resultado, tipo, temporada, episodio)
+    
+    return {
+        'success': True,
+        'video_url': video_url,
+        'embed_url': embed_url,
+        'servidor': resultado.get('servidor'),
+        'from_cache': False,
+        'metodo': estrategia,
+        'hedge': bool(resultado.get('hedge')),
+        'extraction_time': f"{elapsed:.2f}s",
+        'dublado': True,
+        'tipo': tipo,
+        'temporada': temporada,
+        'episodio': episodio
+    }
+
+def url_episodio(url_serie, temporada, episodio):
+    """URL da página de um episódio (mesmo formato de construir_url_serie)"""
+    return f"{url_serie.rstrip('/')}/{temporada}/{episodio}"
+
+def url_base_serie(url, temporada, episodio):
+    """Remove o sufixo /temporada/episodio da URL do episódio, se houver"""
+    sufixo = f"/{temporada}/{episodio}"
+    url = url.rstrip('/')
+    return url[:-len(sufixo)] if url.endswith(sufixo) else url
+
+def _precisa_extracao_completa(registro):
+    """Sem skip, sem embed e sem URL direta utilizável: só a página resolve"""
+    if isinstance(registro, dict) and registro.get('skip'):
+        return False
+    if not registro:
+        return True
+    if registro.get('embed_url'):
+        return False
+    return not (registro.get('video_url') and estado_url_cache(registro['video_url']) != 'expirada')
+
+def _assinatura_servidores(driver):
+    # Serializada no próprio navegador: a comparação em CONDICAO_SERVIDORES_ALTERADOS é byte a byte
+    try:
+        return driver.execute_script(FUNCAO_ATRIBUTOS_SERVIDORES + "return JSON.stringify(atributosServidores());")
+    except Exception:
+        return None
+
+def _selecionar_episodio_na_pagina(driver, driver_id, episodio, assinatura):
+    """Clica no episódio da lista e espera os seletores de servidor trocarem"""
+    elemento = aguardar_dom(
+        driver,
+        CONDICAO_SELETOR_EPISODIO
+        .replace('__SELETORES__', json.dumps(SELETORES_EPISODIO))
+        .replace('__EPISODIO__', str(int(episodio))),
+        timeout=3
+    )
+    if not elemento:
+        logger.info(f"[{driver_id}] Episódio {episodio} não encontrado na lista da página")
+        return False
+    
+    smart_click(driver, elemento, driver_id)
+    
+    # A assinatura anterior vem do mesmo JSON.stringify (ver _assinatura_servidores)
+    alterado = aguardar_dom(
+        driver,
+        CONDICAO_SERVIDORES_ALTERADOS.replace('__ANTERIOR__', json.dumps(assinatura or '')),
+        timeout=10,
+        preambulo_js=FUNCAO_ATRIBUTOS_SERVIDORES,
+        etapa='troca_episodio'
+    )
+    if not alterado:
+        logger.info(f"[{driver_id}] Servidores não mudaram após selecionar o episódio {episodio}")
+        return False
+    return True
+
+def _extrair_episodio_na_pagina(driver, driver_id, url_ep, temporada, episodio, usar_http):
+    """
+    Extrai o episódio selecionado na página da série sem sair dela quando possível
+    
+    Returns:
+        Tupla (resultado ou None para fallback, saiu_da_pagina)
+    """
+    start_time = time.time()
+    base = {'tipo': 'serie', 'temporada': temporada, 'episodio': episodio}
+    
+    estado = sondar_pagina(driver, checagens={'audios_ocultos': CHECAGEM_AUDIOS_OCULTOS})['estado']
+    if estado.get('audios_ocultos'):
+        logger.warning(f"[{driver_id}] T{temporada}E{episodio} legendado - pulando")
+        atualizar_supabase(url_ep, None, False, 'serie', temporada, episodio)
+        return dict(base, success=False, skipped=True, reason='Conteúdo legendado', dublado=False,
+                    extraction_time=f"{time.time() - start_time:.2f}s"), False
+    
+    src_embed = montar_url_get_embed(driver, driver_id)
+    if not src_embed:
+        return None, False
+    
+    url_pagina = driver.execute_script("return location.href;")
+    video_url = embed_url = None
+    metodo = 'temporada-http'
+    saiu = False
+    
+    # Sem navegar: a página da série continua aberta para o próximo episódio
+    if usar_http:
+        try:
+            video_url, embed_url = resolver_player_http(src_embed, referer=url_pagina)
+        except Exception as e:
+            logger.debug(f"[{driver_id}] getEmbed via HTTP falhou: {e}")
+    
+    if not video_url:
+        metodo = 'temporada-navegador'
+        saiu = True
+        captura = iniciar_captura_rede(driver, driver_id)
+        try:
+            navegar_com_referer(driver, src_embed)
+            entrar_no_player(driver, driver_id)
+            embed_url = driver.execute_script("return location.href;")
+            video_url = capturar_url_no_player(driver, driver_id, captura, servidor=servidor_da_url_get_embed(src_embed),
+                                               tipo='serie')
+            if video_url and INTERROMPER_APOS_CAPTURA:
+                interromper_rede(driver, driver_id)
+        finally:
+            if captura:
+                captura.parar()
+    
+    if not video_url or len(video_url) <= 20:
+        return None, saiu
+    
+    atualizar_supabase(url_ep, video_url, True, 'serie', temporada, episodio, embed_url=embed_url)
+    return dict(base, success=True, video_url=video_url, embed_url=embed_url, from_cache=False,
+                metodo=metodo, dublado=True, extraction_time=f"{time.time() - start_time:.2f}s"), saiu
+
+def _prazo_restante(contexto):
+    """O que sobra do prazo do contexto como argumento prazo (0 = sem prazo)"""
+    restante = contexto.restante()
+    return 0 if restante is None else max(restante, 0.001)
+
+def extrair_temporada(url_serie, temporada, episodios, driver_id="Temporada", usar_driver_persistente=True,
+                      usar_http=None, prazo=None):
+    """
+    Extrai os episódios de uma temporada reaproveitando a mesma página da série
     
-    end_time = time.time() + max_wait
+    A página é aberta uma vez e os episódios seguintes são selecionados na própria
+    lista (sem recarregar); cada getEmbed é resolvido via HTTP para manter a página
+    aberta. Quando a página não permite (episódio fora da lista, servidores não
+    trocam, player só no navegador) o episódio cai na extração completa.
+    Episódios já em cache (ou com embed conhecido) passam direto por extrair_url_video.
     
-    while time.time() < end_time:
-        try:
-            # Script otimizado para procurar URLs de vídeo
-            video_url = driver.execute_script("""
-                // Procurar em elementos video
-                var videos = document.querySelectorAll('video');
-                for (var i = 0; i < videos.length; i++) {
-                    if (videos[i].currentSrc && videos[i].currentSrc.length > 20) {
-                        return videos[i].currentSrc;
-                    }
-                    if (videos[i].src && videos[i].src.length > 20) {
-                        return videos[i].src;
-                    }
-                }
-                
-                // Procurar em source tags
-                var sources = document.querySelectorAll('source');
-                for (var i = 0; i < sources.length; i++) {
-                    if (sources[i].src && sources[i].src.length > 20) {
-                        return sources[i].src;
-                    }
-                }
+    Args:
+        url_serie: URL base da série (sem /temporada/episodio)
+        temporada: Número da temporada
+        episodios: Números dos episódios, na ordem desejada
+        prazo: Prazo de cada episódio em segundos (ver extrair_url_video)
+    
+    Yields:
+        Resultado de cada episódio assim que fica pronto (mesmo formato de extrair_url_video)
+    """
+    if usar_http is None:
+        usar_http = EXTRACAO_HTTP_HABILITADA
+    
+    pool = None
+    driver = None
+    driver_criado_localmente = False
+    pagina_aberta = False
+    assinatura = None
+    
+    try:
+        for episodio in episodios:
+            url_ep = url_episodio(url_serie, temporada, episodio)
+            id_ep = f"{driver_id}-T{temporada}E{episodio}"
+            inicio_ep = time.time()
+            resultado = None
+            # Um prazo por episódio: a tentativa na página e o fallback dividem o mesmo
+            contexto = ContextoExtracao.com_prazo(PRAZO_EXTRACAO if prazo is None else prazo)
+            
+            try:
+                registro = buscar_dados_supabase(url_ep, 'serie', temporada, episodio)
+                if not _precisa_extracao_completa(registro):
+                    resultado = extrair_url_video(url_ep, id_ep, 'serie', temporada, episodio,
+                                                  usar_driver_persistente, usar_http, driver=driver,
+                                                  prazo=_prazo_restante(contexto))
+                    usou_navegador = not (resultado.get('from_cache') or resultado.get('metodo') == 'http'
+                                          or resultado.get('reason') == 'dublado=False')
+                    if driver is not None and usou_navegador:
+                        pagina_aberta = False
                 
-                // Procurar no player Video.js
-                if (window.videojs) {
-                    var players = videojs.getAllPlayers();
-                    if (players.length > 0 && players[0].currentSrc()) {
-                        return players[0].currentSrc();
+                else:
+                    if driver is None:
+                        if usar_driver_persistente:
+                            # Esperar por um navegador livre também conta no prazo do episódio
+                            pool = obter_pool()
+                            driver = pool.obter(timeout=contexto.restante())
+                        else:
+                            driver = criar_navegador_firefox_otimizado()
+                            driver_criado_localmente = True
+                    
+                    # Sessão presa depois do prazo do episódio é morta pelo vigia
+                    vigilancia, sessao_morta = vigiar_sessao(contexto, driver, id_ep, pool)
+                    try:
+                        with em_contexto(contexto):
+                            if pagina_aberta:
+                                if not _selecionar_episodio_na_pagina(driver, id_ep, episodio, assinatura):
+                                    pagina_aberta = False
+                            else:
+                                # Abre a página da série já neste episódio
+                                logger.info(f"[{id_ep}] Abrindo página da série: {url_ep}")
+                                driver.switch_to.default_content()
+                                carregar_pagina(driver, url_ep)
+                                pagina_aberta = bool(sondar_pagina(driver, ['server-selector'], timeout=10,
+                                                                   etapa='seletores_pagina')['seletor'])
+                            
+                            if pagina_aberta:
+                                resultado, saiu = _extrair_episodio_na_pagina(driver, id_ep, url_ep, temporada,
+                                                                              episodio, usar_http)
+                                if saiu:
+                                    pagina_aberta = False
+                                else:
+                                    assinatura = _assinatura_servidores(driver)
+                    
+                    except PrazoExcedido:
+                        resultado = None
+                        pagina_aberta = False
+                    
+                    except Exception as e:
+                        logger.info(f"[{id_ep}] Extração na página da série falhou ({e})")
+                        resultado = None
+                        pagina_aberta = False
+                    
+                    finally:
+                        if vigilancia is not None:
+                            _vigia.cancelar(vigilancia)
+                    
+                    if sessao_morta.is_set():
+                        # O vigia já devolveu (descartado) ao pool; o local só precisa de limpeza
+                        if driver_criado_localmente:
+                            encerrar_driver(driver)
+                            driver_criado_localmente = False
+                        driver = None
+                        pagina_aberta = False
+                    
+                    if resultado is None and contexto.expirado:
+                        elapsed = time.time() - inicio_ep
+                        logger.warning(f"[{id_ep}] Prazo do episódio vencido em {elapsed:.2f}s")
+                        resultado = _resultado_prazo_excedido(elapsed, 'serie', temporada, episodio)
+                    
+                    elif resultado is None:
+                        # Fallback: navegação completa até o episódio, com o que sobrou do prazo
+                        logger.info(f"[{id_ep}] Usando extração completa do episódio...")
+                        resultado = extrair_url_video(url_ep, id_ep, 'serie', temporada, episodio,
+                                                      usar_driver_persistente, usar_http, driver=driver,
+                                                      prazo=_prazo_restante(contexto))
+                        pagina_aberta = False
+            
+            except Exception as e:
+                # Checkout do pool ou criação do Firefox falhou: só este episódio fica com erro
+                logger.error(f"[{id_ep}] Erro na extração do episódio: {e}")
+                if contexto.expirado:
+                    resultado = _resultado_prazo_excedido(time.time() - inicio_ep, 'serie', temporada, episodio)
+                else:
+                    resultado = {
+                        'success': False,
+                        'error': str(e),
+                        'dublado': None,
+                        'extraction_time': f"{time.time() - inicio_ep:.2f}s",
+                        'tipo': 'serie',
+                        'temporada': temporada,
+                        'episodio': episodio
                     }
-                }
-                
-                return null;
-            """)
+                pagina_aberta = False
             
-            if video_url and len(video_url) > 20:
-                logger.info(f"[{driver_id}] URL extraída rapidamente!")
-                return video_url
-                
-        except Exception as e:
-            logger.debug(f"[{driver_id}] Erro na extração rápida: {e}")
-        
-        time.sleep(1)
+            resultado['url_original'] = url_ep
+            yield resultado
     
-    return None
+    finally:
+        if driver and pool:
+            pool.devolver(driver)
+        elif driver and driver_criado_localmente:
+            encerrar_driver(driver)
+
+def _resolver_variante_no_navegador(driver, driver_id, url, src_embed, reabrir_pagina):
+    """Abre o getEmbed de uma variante a partir da página e captura a URL no player"""
+    if reabrir_pagina:
+        driver.switch_to.default_content()
+        carregar_pagina(driver, url)
+        sondar_pagina(driver, ['server-selector'], timeout=10, etapa='seletores_pagina')
+    
+    captura = iniciar_captura_rede(driver, driver_id)
+    try:
+        navegar_com_referer(driver, src_embed)
+        entrar_no_player(driver, driver_id)
+        embed_url = driver.execute_script("return location.href;")
+        video_url = capturar_url_no_player(driver, driver_id, captura)
+        if video_url and INTERROMPER_APOS_CAPTURA:
+            interromper_rede(driver, driver_id)
+        return video_url, embed_url
+    finally:
+        if captura:
+            captura.parar()
 
-def extrair_url_video(url, driver_id, tipo='filme', temporada=None, episodio=None, usar_driver_persistente=False):
+def chave_variantes(chave):
+    """Chave das variantes de idioma de um registro no cache local (separada do registro)"""
+    return (f"variantes:{chave[0]}",) + tuple(chave[1:])
+
+def _variantes_do_cache(chave, idiomas):
     """
-    Extrai a URL do vídeo de forma OTIMIZADA
+    Variantes guardadas, se cobrirem todos os idiomas pedidos que a página tem com URLs frescas
+    
+    Returns:
+        (variantes, existentes) ou None
+    """
+    guardado = _cache_local.obter(chave)
+    if guardado is FALTA and _cache_disco is not None:
+        guardado = _cache_disco.obter(chave)
+    if not isinstance(guardado, dict):
+        return None
+    
+    variantes = guardado.get('variantes') or {}
+    existentes = guardado.get('existentes') or []
+    pedidos = [i for i in idiomas if i in existentes]
+    if not pedidos or any(i not in variantes or estado_url_cache(variantes[i]['video_url']) != 'fresca'
+                          for i in pedidos):
+        return None
+    return {i: variantes[i] for i in pedidos}, existentes
+
+def _guardar_variantes(chave, variantes, existentes):
+    """Guarda as variantes colhidas (com a expiração da primeira URL direta a vencer)"""
+    expiracoes = [e for e in (expiracao_url(v['video_url']) for v in variantes.values()) if e is not None]
+    valor = {'variantes': variantes, 'existentes': existentes}
+    _cache_local.guardar(chave, valor, ttl=CACHE_TTL_POSITIVO)
+    if _cache_disco is not None:
+        _cache_disco.guardar(chave, valor, ttl=CACHE_DISCO_TTL_POSITIVO,
+                             expira_url=min(expiracoes) if expiracoes else None)
+
+def extrair_variantes_idioma(url, driver_id, tipo='filme', temporada=None, episodio=None,
+                             usar_driver_persistente=False, usar_http=None, idiomas=None, renovar=False, prazo=None):
+    """
+    Colhe a URL de cada variante de idioma (dublado, legendado...) em uma única visita
+    
+    Os atributos dos server-selector dão o getEmbed de todos os idiomas; cada um é
+    resolvido via HTTP sem sair da página e, se preciso, no navegador. O dublado
+    é gravado nas colunas principais e os demais em COLUNAS_POR_IDIOMA.
     
     Args:
-        url: URL da página para extração
-        driver_id: Identificador único do driver
-        tipo: 'filme' ou 'serie'
-        temporada: Número da temporada (obrigatório para séries)
-        episodio: Número do episódio (obrigatório para séries)
-        usar_driver_persistente: Se True, mantém o driver aberto para próximas extrações
+        idiomas: Valores de data-lang a colher (None usa IDIOMAS_VARIANTES)
+        renovar: Se True, ignora as URLs do cache e resolve tudo de novo
+        prazo: Prazo total em segundos (None usa PRAZO_EXTRACAO; 0 = sem prazo)
+    
+    Variantes com URLs frescas vêm do cache local (e o dublado do Supabase); chamadas
+    concorrentes para o mesmo registro e idiomas são coalescidas como em extrair_url_video.
     
     Returns:
-        Dicionário com resultado da extração
+        Dicionário com 'success', 'variantes' (idioma -> {'video_url', 'embed_url'}),
+        'video_url' (dublado, se houver), 'dublado', 'faltando' (idiomas da página
+        não resolvidos) e 'extraction_time'
     """
+    idiomas = list(idiomas or IDIOMAS_VARIANTES)
+    if not COALESCER_EXTRACOES:
+        return _extrair_variantes_idioma(url, driver_id, tipo, temporada, episodio, usar_driver_persistente,
+                                         usar_http, idiomas, renovar, prazo)
+    
+    chave = (chave_variantes(chave_registro(url, tipo, temporada, episodio)), tuple(sorted(idiomas)), bool(renovar))
+    resultado, compartilhado = _extracoes_em_andamento.executar(
+        chave, _extrair_variantes_idioma, url, driver_id, tipo, temporada, episodio,
+        usar_driver_persistente, usar_http, idiomas, renovar, prazo
+    )
+    
+    if compartilhado:
+        logger.info(f"[{driver_id}] Resultado compartilhado de coleta de variantes em andamento")
+        resultado = dict(resultado, compartilhado=True)
+    return resultado
+
+def _extrair_variantes_idioma(url, driver_id, tipo='filme', temporada=None, episodio=None,
+                              usar_driver_persistente=False, usar_http=None, idiomas=None, renovar=False, prazo=None):
+    """Coleta propriamente dita (ver extrair_variantes_idioma)"""
+    raiz = ContextoExtracao.com_prazo(PRAZO_EXTRACAO if prazo is None else prazo)
     
     if tipo == 'serie' and (temporada is None or episodio is None):
         logger.error(f"[{driver_id}] Para séries é necessário informar temporada e episódio")
@@ -593,233 +3357,186 @@ def extrair_url_video(url, driver_id, tipo='filme', temporada=None, episodio=Non
             'error': 'Temporada e episódio são obrigatórios para séries'
         }
     
-    identificador = f"T{temporada}E{episodio}" if tipo == 'serie' else "Filme"
-    logger.info(f"[{driver_id}] Verificando cache Supabase ({identificador})...")
-    
-    resultado_busca = buscar_dados_supabase(url, tipo, temporada, episodio)
+    if usar_http is None:
+        usar_http = EXTRACAO_HTTP_HABILITADA
     
-    if isinstance(resultado_busca, dict) and resultado_busca.get('skip'):
-        logger.info(f"[{driver_id}] Extração pulada: {resultado_busca.get('reason')}")
-        return {
-            'success': False,
-            'skipped': True,
-            'reason': resultado_busca.get('reason'),
-            'extraction_time': '0.00s',
-            'dublado': False,
-            'tipo': tipo,
-            'temporada': temporada,
-            'episodio': episodio
-        }
+    identificador = f"T{temporada}E{episodio}" if tipo == 'serie' else "Filme"
+    start_time = time.time()
+    cache_key = chave_registro(url, tipo, temporada, episodio)
     
-    if resultado_busca and isinstance(resultado_busca, str):
-        logger.info(f"[{driver_id}] video_url do cache - {identificador}")
+    cacheado = None if renovar else _variantes_do_cache(chave_variantes(cache_key), idiomas)
+    if cacheado:
+        variantes, existentes = cacheado
+        logger.info(f"[{driver_id}] Variantes do cache: {sorted(variantes)} ({identificador})")
         return {
-            'success': True, 
-            'video_url': resultado_busca,
+            'success': True,
+            'variantes': variantes,
+            'video_url': variantes.get(IDIOMA_DUBLADO, {}).get('video_url'),
+            'embed_url': variantes.get(IDIOMA_DUBLADO, {}).get('embed_url'),
             'from_cache': True,
+            'error': None,
+            'faltando': [],
             'extraction_time': '0.00s',
-            'dublado': True,
+            'dublado': IDIOMA_DUBLADO in existentes,
             'tipo': tipo,
             'temporada': temporada,
             'episodio': episodio
         }
     
-    logger.info(f"[{driver_id}] Iniciando extração otimizada ({identificador})...")
-    start_time = time.time()
+    variantes = {}
+    # Idiomas pedidos que a página tem e todos os que ela tem (None = página não lida)
+    disponiveis = None
+    existentes = None
+    
+    # Dublado com URL fresca no Supabase não precisa ser resolvido de novo
+    dublado_do_cache = False
+    if IDIOMA_DUBLADO in idiomas and not renovar:
+        registro = buscar_dados_supabase(url, tipo, temporada, episodio)
+        if (isinstance(registro, dict) and registro.get('video_url')
+                and estado_url_cache(registro['video_url']) == 'fresca'):
+            variantes[IDIOMA_DUBLADO] = {'video_url': registro['video_url'], 'embed_url': registro.get('embed_url')}
+            dublado_do_cache = True
+    
+    pool = None
     driver = None
     driver_criado_localmente = False
-    dublado = None
+    prazo_vencido = False
     
     try:
-        # Obter driver (persistente ou criar novo)
-        if usar_driver_persistente:
-            driver = obter_driver_persistente(driver_id)
-            resetar_driver(driver)
-        else:
-            driver = criar_navegador_firefox_otimizado()
-            driver_criado_localmente = True
-        
-        logger.info(f"[{driver_id}] Navegando: {url}")
-        
-        driver.get(url)
-        wait_for_page_ready(driver, timeout=10)
-        time.sleep(2)
-        
-        # Verificar dublagem
-        logger.info(f"[{driver_id}] Verificando dublagem...")
-        try:
-            playeroptions_audios = driver.find_element(By.CSS_SELECTOR, 'playeroptions-audios')
-            classes = playeroptions_audios.get_attribute('class') or ''
-            
-            if 'hidden' in classes:
-                logger.warning(f"[{driver_id}] Conteúdo legendado - pulando")
-                dublado = False
-                atualizar_supabase(url, None, dublado, tipo, temporada, episodio)
-                return {
-                    'success': False,
-                    'skipped': True,
-                    'reason': 'Conteúdo legendado',
-                    'extraction_time': f"{time.time() - start_time:.2f}s",
-                    'dublado': dublado,
-                    'tipo': tipo,
-                    'temporada': temporada,
-                    'episodio': episodio
-                }
-        except:
-            pass
-        
-        # Clicar em audio-selector se existir
-        logger.info(f"[{driver_id}] Procurando audio-selector...")
-        audio_selector = find_element_fast(driver, ['audio-selector[data-lang="2"]'], timeout=3)
-        if audio_selector:
-            smart_click(driver, audio_selector, driver_id)
-            time.sleep(1)
-        
-        # Procurar server-selector
-        logger.info(f"[{driver_id}] Procurando server-selector...")
-        server_selectors = [
-            'server-selector[data-server="mixdrop"][data-lang="2"]',
-            'server-selector[data-lang="2"]'
-        ]
-        
-        server_selector = find_element_fast(driver, server_selectors, timeout=5)
-        
-        if not server_selector:
-            logger.warning(f"[{driver_id}] Server-selector não encontrado")
-            dublado = False
-            atualizar_supabase(url, None, dublado, tipo, temporada, episodio)
-            raise Exception("Server-selector não encontrado")
-        
-        smart_click(driver, server_selector, driver_id)
-        time.sleep(2)
-        
-        # Aguardar processamento mínimo
-        logger.info(f"[{driver_id}] Aguardando iframes...")
-        time.sleep(5)
-        
-        # Entrar nos iframes
-        logger.info(f"[{driver_id}] Entrando nos iframes...")
-        
-        parent_iframe_selectors = [
-            'embedcontent.active iframe',
-            'embedcontent iframe',
-            'iframe[src*="getEmbed"]'
-        ]
-        
-        parent_iframe = find_element_fast(driver, parent_iframe_selectors, timeout=5)
-        if not parent_iframe:
-            raise Exception("Iframe PAI não encontrado")
-        
-        driver.switch_to.frame(parent_iframe)
-        time.sleep(1)
-        
-        child_iframe_selectors = [
-            'iframe[src*="mixdrop"]',
-            'iframe#player',
-            'iframe'
-        ]
-        
-        child_iframe = find_element_fast(driver, child_iframe_selectors, timeout=5)
-        
-        if not child_iframe:
-            raise Exception("Iframe FILHO não encontrado")
-        
-        driver.switch_to.frame(child_iframe)
-        time.sleep(2)
-        
-        # OTIMIZAÇÃO PRINCIPAL: Tentar extração rápida primeiro
-        logger.info(f"[{driver_id}] Tentando extração rápida (sem tocar vídeo)...")
-        video_url = extrair_video_url_rapido(driver, driver_id, max_wait=10)
-        
-        # Se não conseguiu pela extração rápida, tentar o método tradicional
-        if not video_url:
-            logger.info(f"[{driver_id}] Extração rápida falhou, tentando método tradicional...")
-            
-            # Remover overlays
-            try:
-                driver.execute_script("""
-                    var overlays = document.querySelectorAll('div[style*="position: absolute"][style*="z-index"]');
-                    overlays.forEach(o => o.remove());
-                """)
-            except:
-                pass
-            
-            # Tentar clicar no player
-            logger.info(f"[{driver_id}] Procurando botão play...")
-            play_button_selectors = [
-                'button.vjs-big-play-button',
-                '.vjs-play-control',
-                'button[aria-label*="Play"]'
-            ]
-            
-            play_button = find_element_fast(driver, play_button_selectors, timeout=5)
-            if play_button:
-                smart_click(driver, play_button, driver_id)
-                time.sleep(3)
-            else:
-                # Tentar clicar no centro como fallback
-                try:
-                    width = driver.execute_script("return window.innerWidth")
-                    height = driver.execute_script("return window.innerHeight")
-                    actions = ActionChains(driver)
-                    actions.move_by_offset(width // 2, height // 2).click().perform()
-                    actions.move_by_offset(-width // 2, -height // 2).perform()
-                    time.sleep(3)
-                except:
-                    pass
-            
-            # Procurar URL após tentar tocar
-            logger.info(f"[{driver_id}] Procurando URL do vídeo...")
-            video_url = extrair_video_url_rapido(driver, driver_id, max_wait=15)
-        
-        if video_url and len(video_url) > 20:
-            elapsed = time.time() - start_time
-            logger.info(f"[{driver_id}] ✓ URL encontrada em {elapsed:.2f}s ({identificador})")
-            
-            dublado = True
-            atualizar_supabase(url, video_url, dublado, tipo, temporada, episodio)
+        with em_contexto(raiz):
+            if usar_http and any(i not in variantes for i in idiomas):
+                raiz.verificar()
+                logger.info(f"[{driver_id}] Colhendo variantes via HTTP ({identificador})...")
+                resultado_http = extrair_variantes_http(url, [i for i in idiomas if i not in variantes],
+                                                        timeout=limitar_ao_prazo(10, raiz))
+                variantes.update(resultado_http['variantes'])
+                if not resultado_http['error'] and resultado_http['existentes']:
+                    existentes = resultado_http['existentes']
+                    disponiveis = [i for i in idiomas if i in existentes]
             
-            return {
-                'success': True, 
-                'video_url': video_url, 
-                'from_cache': False,
-                'extraction_time': f"{elapsed:.2f}s",
-                'dublado': dublado,
-                'tipo': tipo,
-                'temporada': temporada,
-                'episodio': episodio
-            }
-        
-        return {
-            'success': False, 
-            'error': 'URL do vídeo não encontrada', 
-            'dublado': dublado,
-            'extraction_time': f"{time.time() - start_time:.2f}s",
-            'tipo': tipo,
-            'temporada': temporada,
-            'episodio': episodio
-        }
-        
+            pendentes = [i for i in (disponiveis or idiomas) if i not in variantes]
+            if pendentes:
+                raiz.verificar()
+                if usar_driver_persistente:
+                    pool = obter_pool()
+                    driver = pool.obter(timeout=raiz.restante())
+                else:
+                    driver = criar_navegador_firefox_otimizado()
+                    driver_criado_localmente = True
+                
+                logger.info(f"[{driver_id}] Navegando para variantes {pendentes}: {url}")
+                carregar_pagina(driver, url)
+                sondagem = sondar_pagina(
+                    driver, ['server-selector'],
+                    checagens={'audios_ocultos': CHECAGEM_AUDIOS_OCULTOS},
+                    timeout=10,
+                    etapa='seletores_pagina'
+                )
+                url_pagina, servidores = driver.execute_script(SCRIPT_ATRIBUTOS_SERVIDORES)
+                
+                idiomas_pagina = idiomas_disponiveis(servidores)
+                if sondagem['estado'].get('audios_ocultos'):
+                    idiomas_pagina = [i for i in idiomas_pagina if i != IDIOMA_DUBLADO]
+                if servidores:
+                    existentes = idiomas_pagina
+                disponiveis = [i for i in idiomas if i in idiomas_pagina or i in variantes]
+                
+                na_pagina = True
+                for idioma in [i for i in pendentes if i in idiomas_pagina]:
+                    raiz.verificar()
+                    atributos = escolher_servidor(servidores, SERVIDOR_PREFERIDO, idioma)
+                    src_embed = construir_url_get_embed(url_pagina, atributos, idioma) if atributos else None
+                    if not src_embed:
+                        continue
+                    
+                    video_url = embed_url = None
+                    if usar_http:
+                        try:
+                            video_url, embed_url = resolver_player_http(src_embed, referer=url_pagina,
+                                                                        timeout=limitar_ao_prazo(10, raiz))
+                        except Exception as e:
+                            logger.debug(f"[{driver_id}] Variante {idioma} via HTTP falhou: {e}")
+                    
+                    if not video_url:
+                        try:
+                            video_url, embed_url = _resolver_variante_no_navegador(
+                                driver, driver_id, url, src_embed, reabrir_pagina=not na_pagina
+                            )
+                        except Exception as e:
+                            logger.info(f"[{driver_id}] Variante {idioma} falhou no navegador: {e}")
+                        na_pagina = False
+                    
+                    if video_url and len(video_url) > 20:
+                        variantes[idioma] = {'video_url': video_url, 'embed_url': embed_url}
+    
+    except (PrazoExcedido, TimeoutError):
+        # O que já resolveu é gravado; o resto fica em 'faltando'
+        prazo_vencido = raiz.expirado
+        logger.warning(f"[{driver_id}] Coleta de variantes interrompida em {time.time() - start_time:.2f}s "
+                       f"({identificador})")
+    
     except Exception as e:
-        logger.error(f"[{driver_id}] Erro durante extração: {e}")
-        return {
-            'success': False, 
-            'error': str(e), 
-            'dublado': dublado,
-            'extraction_time': f"{time.time() - start_time:.2f}s",
-            'tipo': tipo,
-            'temporada': temporada,
-            'episodio': episodio
-        }
+        logger.error(f"[{driver_id}] Erro ao colher variantes: {e}")
     
     finally:
-        # Só fecha o driver se não for persistente
-        if driver and driver_criado_localmente:
-            try:
-                driver.quit()
-                logger.info(f"[{driver_id}] Driver local fechado")
-            except:
-                pass
+        if driver and pool:
+            pool.devolver(driver)
+        elif driver and driver_criado_localmente:
+            encerrar_driver(driver)
+    
+    elapsed = time.time() - start_time
+    if prazo_vencido and not variantes:
+        return _resultado_prazo_excedido(elapsed, tipo, temporada, episodio)
+    
+    # Dublado nas colunas principais (cria o registro); demais nas colunas do idioma. "Sem dublado"
+    # só vale pelos idiomas que a página tem, não pelos pedidos (pedir só o legendado não apaga o dublado)
+    dublado = None
+    registro_gravado = False
+    outras = {i: v for i, v in variantes.items() if i != IDIOMA_DUBLADO}
+    if dublado_do_cache:
+        dublado = registro_gravado = True
+    elif IDIOMA_DUBLADO in variantes:
+        dublado = True
+        registro_gravado = atualizar_supabase(url, variantes[IDIOMA_DUBLADO]['video_url'], True, tipo, temporada,
+                                              episodio, embed_url=variantes[IDIOMA_DUBLADO]['embed_url'])
+    elif existentes is not None and IDIOMA_DUBLADO not in existentes:
+        dublado = False
+        registro_gravado = atualizar_supabase(url, None, False, tipo, temporada, episodio)
+    elif outras:
+        # Dublado existe na página (ou não foi pedido) mas não resolveu: as outras variantes não se
+        # perdem. O registro só é criado (sem URLs) se ainda não existir, para não apagar uma URL
+        # dublada já gravada
+        dublado = True if existentes and IDIOMA_DUBLADO in existentes else None
+        registro_gravado = (verificar_existe_supabase(url, tipo, temporada, episodio)
+                            or atualizar_supabase(url, None, dublado, tipo, temporada, episodio))
+    
+    if registro_gravado:
+        for idioma, variante in outras.items():
+            atualizar_variante_supabase(url, idioma, variante['video_url'], variante['embed_url'],
+                                        tipo, temporada, episodio)
+    
+    if variantes and existentes is not None:
+        _guardar_variantes(chave_variantes(cache_key), variantes, existentes)
+    
+    # Idiomas que a página tem mas não foram resolvidos nesta visita
+    faltando = [i for i in (disponiveis or []) if i not in variantes]
+    
+    logger.info(f"[{driver_id}] Variantes colhidas em {elapsed:.2f}s: {sorted(variantes)} ({identificador})")
+    
+    return {
+        'success': bool(variantes),
+        'variantes': variantes,
+        'video_url': variantes.get(IDIOMA_DUBLADO, {}).get('video_url'),
+        'embed_url': variantes.get(IDIOMA_DUBLADO, {}).get('embed_url'),
+        'from_cache': False,
+        'error': None if variantes else 'Nenhuma variante encontrada',
+        'faltando': faltando,
+        'extraction_time': f"{elapsed:.2f}s",
+        'dublado': dublado,
+        'tipo': tipo,
+        'temporada': temporada,
+        'episodio': episodio
+    }
 
 # Inicialização
 download_ublock_origin()
@@ -830,7 +3547,17 @@ download_geckodriver()
 # FUNÇÕES AUXILIARES PARA PROCESSAMENTO EM LOTE
 # ==========================================
 
-def processar_lote_urls(urls_info, max_workers=3, usar_drivers_persistentes=True):
+def logar_resultado(info, resultado):
+    """Log resumido de um resultado de extração em lote"""
+    if resultado.get('success'):
+        cache = " (cache)" if resultado.get('from_cache') else ""
+        logger.info(f"✓ {info['url'][:50]}... - {resultado['extraction_time']}{cache}")
+    elif resultado.get('skipped'):
+        logger.info(f"⊘ {info['url'][:50]}... - {resultado.get('reason')}")
+    else:
+        logger.error(f"✗ {info['url'][:50]}... - {resultado.get('error', 'Erro desconhecido')}")
+
+def processar_lote_urls(urls_info, max_workers=3, usar_drivers_persistentes=True, prazo=None):
     """
     Processa múltiplas URLs em paralelo com opção de drivers persistentes
     
@@ -838,12 +3565,16 @@ def processar_lote_urls(urls_info, max_workers=3, usar_drivers_persistentes=True
         urls_info: Lista de dicionários com 'url', 'tipo', 'temporada', 'episodio'
         max_workers: Número máximo de threads paralelas
         usar_drivers_persistentes: Se True, mantém os drivers abertos durante todo o processo
+        prazo: Prazo de cada extração em segundos (None usa PRAZO_EXTRACAO)
     
     Returns:
         Lista de resultados
     """
     resultados = []
     
+    if usar_drivers_persistentes:
+        obter_pool(max_navegadores=max(max_workers, POOL_MAX_NAVEGADORES))
+    
     try:
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             futures = {}
@@ -857,7 +3588,8 @@ def processar_lote_urls(urls_info, max_workers=3, usar_drivers_persistentes=True
                     info.get('tipo', 'filme'),
                     info.get('temporada'),
                     info.get('episodio'),
-                    usar_drivers_persistentes
+                    usar_drivers_persistentes,
+                    prazo=prazo
                 )
                 futures[future] = info
             
@@ -867,15 +3599,7 @@ def processar_lote_urls(urls_info, max_workers=3, usar_drivers_persistentes=True
                     resultado = future.result()
                     resultado['url_original'] = info['url']
                     resultados.append(resultado)
-                    
-                    # Log resumido
-                    if resultado.get('success'):
-                        cache = " (cache)" if resultado.get('from_cache') else ""
-                        logger.info(f"✓ {info['url'][:50]}... - {resultado['extraction_time']}{cache}")
-                    elif resultado.get('skipped'):
-                        logger.info(f"⊘ {info['url'][:50]}... - {resultado.get('reason')}")
-                    else:
-                        logger.error(f"✗ {info['url'][:50]}... - {resultado.get('error', 'Erro desconhecido')}")
+                    logar_resultado(info, resultado)
                         
                 except Exception as e:
                     logger.error(f"✗ {info['url'][:50]}... - Exceção: {e}")
@@ -893,14 +3617,66 @@ def processar_lote_urls(urls_info, max_workers=3, usar_drivers_persistentes=True
     
     return resultados
 
-def processar_urls_sequencial(urls_info, usar_driver_persistente=True):
+def _agrupar_por_temporada(urls_info):
+    """Agrupa entradas consecutivas de série da mesma temporada (ordem preservada)"""
+    grupos = []
+    for info in urls_info:
+        chave = None
+        if info.get('tipo') == 'serie' and info.get('temporada') is not None and info.get('episodio') is not None:
+            chave = (url_base_serie(info['url'], info['temporada'], info['episodio']), info['temporada'])
+        
+        if chave and grupos and grupos[-1][0] == chave:
+            grupos[-1][1].append(info)
+        else:
+            grupos.append((chave, [info]))
+    return grupos
+
+def iterar_extracoes(urls_info, driver_id, usar_driver_persistente=True, agrupar_temporadas=True, prazo=None):
+    """
+    Extrai as URLs em ordem, entregando (info, resultado) à medida que ficam prontas
+    
+    Episódios consecutivos da mesma temporada usam extrair_temporada (uma página
+    da série para todos); o restante passa por extrair_url_video. prazo vale para
+    cada extração (None usa PRAZO_EXTRACAO).
+    """
+    for chave, infos in _agrupar_por_temporada(urls_info):
+        if agrupar_temporadas and chave and len(infos) > 1:
+            url_serie, temporada = chave
+            resultados = extrair_temporada(url_serie, temporada, [i['episodio'] for i in infos],
+                                           driver_id, usar_driver_persistente, prazo=prazo)
+            # Fecha o gerador ao fim (ou se o consumidor parar) para devolver o navegador ao pool
+            try:
+                for info, resultado in zip(infos, resultados):
+                    yield info, resultado
+            finally:
+                resultados.close()
+            continue
+        
+        for info in infos:
+            try:
+                resultado = extrair_url_video(
+                    info['url'],
+                    driver_id,
+                    info.get('tipo', 'filme'),
+                    info.get('temporada'),
+                    info.get('episodio'),
+                    usar_driver_persistente,
+                    prazo=prazo
+                )
+            except Exception as e:
+                resultado = {'success': False, 'error': str(e)}
+            yield info, resultado
+
+def processar_urls_sequencial(urls_info, usar_driver_persistente=True, prazo=None):
     """
     Processa URLs de forma sequencial com um único driver persistente
     Ideal para processar muitas URLs de forma eficiente sem paralelismo
+    Episódios consecutivos da mesma temporada são extraídos na mesma página da série
     
     Args:
         urls_info: Lista de dicionários com 'url', 'tipo', 'temporada', 'episodio'
         usar_driver_persistente: Se True, reutiliza o mesmo driver para todas as URLs
+        prazo: Prazo de cada extração em segundos (None usa PRAZO_EXTRACAO)
     
     Returns:
         Lista de resultados
@@ -909,31 +3685,15 @@ def processar_urls_sequencial(urls_info, usar_driver_persistente=True):
     driver_id = "Sequential-Worker"
     
     try:
-        for idx, info in enumerate(urls_info, 1):
+        for idx, (info, resultado) in enumerate(iterar_extracoes(urls_info, driver_id, usar_driver_persistente,
+                                                                      prazo=prazo), 1):
             logger.info(f"\n{'='*60}")
-            logger.info(f"Processando {idx}/{len(urls_info)}")
+            logger.info(f"Processado {idx}/{len(urls_info)}")
             logger.info(f"{'='*60}")
             
-            resultado = extrair_url_video(
-                info['url'],
-                driver_id,
-                info.get('tipo', 'filme'),
-                info.get('temporada'),
-                info.get('episodio'),
-                usar_driver_persistente
-            )
-            
             resultado['url_original'] = info['url']
             resultados.append(resultado)
-            
-            # Log resumido
-            if resultado.get('success'):
-                cache = " (cache)" if resultado.get('from_cache') else ""
-                logger.info(f"✓ {info['url'][:50]}... - {resultado['extraction_time']}{cache}")
-            elif resultado.get('skipped'):
-                logger.info(f"⊘ {info['url'][:50]}... - {resultado.get('reason')}")
-            else:
-                logger.error(f"✗ {info['url'][:50]}... - {resultado.get('error', 'Erro desconhecido')}")
+            logar_resultado(info, resultado)
             
             # Pequena pausa entre extrações
             if idx < len(urls_info):
@@ -943,16 +3703,102 @@ def processar_urls_sequencial(urls_info, usar_driver_persistente=True):
         # Limpar driver persistente ao final
         if usar_driver_persistente:
             logger.info("Limpando driver persistente...")
-            limpar_driver_persistente(driver_id)
+            limpar_todos_drivers()
+    
+    return resultados
+
+def processar_lote_multiabas(urls_info, abas_por_navegador=None, usar_http=None, prazo=None):
+    """
+    Processa múltiplas URLs em paralelo usando um único Firefox, uma extração por aba
+    
+    Args:
+        urls_info: Lista de dicionários com 'url', 'tipo', 'temporada', 'episodio'
+        abas_por_navegador: Extrações simultâneas no mesmo navegador (padrão ABAS_POR_NAVEGADOR)
+        usar_http: Repassado para extrair_url_video
+        prazo: Prazo de cada extração em segundos (repassado para extrair_url_video)
+    
+    Returns:
+        Lista de resultados
+    """
+    resultados = []
+    fila = Queue()
+    for info in urls_info:
+        fila.put(info)
+    
+    quantidade = max(1, min(abas_por_navegador or ABAS_POR_NAVEGADOR, len(urls_info)))
+    pool = obter_pool()
+    driver = pool.obter()
+    agendador = AgendadorAbas(driver)
+    
+    def trabalhar(aba, numero):
+        driver_id = f"Aba-{numero}"
+        while True:
+            try:
+                info = fila.get_nowait()
+            except Empty:
+                return
+            
+            try:
+                resultado = extrair_url_video(
+                    info['url'],
+                    driver_id,
+                    info.get('tipo', 'filme'),
+                    info.get('temporada'),
+                    info.get('episodio'),
+                    usar_http=usar_http,
+                    driver=aba,
+                    prazo=prazo
+                )
+            except Exception as e:
+                resultado = {'success': False, 'error': str(e)}
+            
+            resultado['url_original'] = info['url']
+            resultados.append(resultado)
+            logar_resultado(info, resultado)
+    
+    try:
+        abas = agendador.abrir_abas(quantidade)
+        logger.info(f"Processando {len(urls_info)} URLs em {len(abas)} abas de um navegador")
+        
+        with ThreadPoolExecutor(max_workers=len(abas)) as executor:
+            for numero, aba in enumerate(abas, 1):
+                executor.submit(trabalhar, aba, numero)
+    
+    finally:
+        agendador.fechar_abas()
+        pool.devolver(driver)
     
     return resultados
 
-def limpar_cache_local():
-    """Limpa o cache local em memória"""
-    global _cache_local
-    _cache_local.clear()
+def limpar_cache_local(incluir_disco=False):
+    """Limpa o cache local em memória (e o arquivo em disco, se pedido)"""
+    _cache_local.limpar()
+    if incluir_disco and _cache_disco is not None:
+        _cache_disco.limpar()
     logger.info("Cache local limpo")
 
+def estatisticas_cache_local():
+    """Contadores do cache local (acertos, falhas, despejos...)"""
+    estatisticas = _cache_local.estatisticas()
+    estatisticas['entradas_disco'] = len(_cache_disco) if _cache_disco is not None else None
+    estatisticas['extracoes_em_andamento'] = _extracoes_em_andamento.em_andamento()
+    estatisticas['extracoes_coalescidas'] = _extracoes_em_andamento.coalescidas
+    with _vitorias_lock:
+        estatisticas['estrategias_vencedoras'] = dict(_vitorias_estrategias)
+    estatisticas['latencia_navegador_p90'] = _latencias_navegador.percentil(0.9)
+    estatisticas['atraso_hedge'] = atraso_hedge() if HEDGE_HABILITADO else None
+    estatisticas['estrategias'] = _historico_estrategias.estatisticas()
+    estatisticas['etapas'] = _tempos_etapas.estatisticas()
+    estatisticas['vigia'] = {'pendentes': _vigia.pendentes(), 'sessoes_mortas': _vigia.disparos}
+    estatisticas['cache_http'] = _caches_http.estatisticas() if _caches_http is not None else None
+    estatisticas['coletor'] = _coletor_orfaos.estatisticas() if _coletor_orfaos is not None else None
+    pool = _pool_navegadores
+    estatisticas['navegadores'] = {
+        'memoria_mb': pool.memoria(),
+        'reciclados_memoria': pool.reciclados_memoria
+    } if pool else None
+    return estatisticas
+
 
 # ==========================================
 # EXEMPLO DE USO
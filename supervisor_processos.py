@@ -0,0 +1,392 @@
+import os
+import glob
+import json
+import time
+import atexit
+import shutil
+import signal
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+PROC_DIR = '/proc'
+TAMANHO_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def _ler(caminho):
+    try:
+        with open(caminho) as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _filhos_por_processo():
+    """Mapa pid -> pids filhos, montado a partir de /proc/<pid>/stat"""
+    filhos = {}
+    try:
+        nomes = os.listdir(PROC_DIR)
+    except OSError:
+        return filhos
+
+    for nome in nomes:
+        if not nome.isdigit():
+            continue
+        stat = _ler(os.path.join(PROC_DIR, nome, 'stat'))
+        if not stat:
+            continue
+        # O nome do processo (campo 2) pode ter espaços e parênteses: o ppid vem depois do último ')'
+        campos = stat[stat.rfind(')') + 2:].split()
+        if len(campos) > 1:
+            filhos.setdefault(int(campos[1]), []).append(int(nome))
+    return filhos
+
+def pids_da_arvore(raiz):
+    """Pids do processo raiz e de todos os seus descendentes vivos"""
+    if not raiz or not os.path.exists(os.path.join(PROC_DIR, str(raiz))):
+        return []
+
+    filhos = _filhos_por_processo()
+    pids, pendentes = [], [raiz]
+    while pendentes:
+        pid = pendentes.pop()
+        if pid in pids:
+            continue
+        pids.append(pid)
+        pendentes.extend(filhos.get(pid, []))
+    return pids
+
+def memoria_processo(pid):
+    """
+    Memória do processo em bytes (0 se ele já saiu)
+
+    Usa o PSS de smaps_rollup quando disponível: os processos de conteúdo do
+    Firefox compartilham as mesmas bibliotecas e somar RSS contaria essas páginas
+    uma vez por processo. Sem smaps_rollup (kernel antigo, sem permissão) usa o RSS.
+    """
+    rollup = _ler(os.path.join(PROC_DIR, str(pid), 'smaps_rollup'))
+    if rollup:
+        for linha in rollup.splitlines():
+            if linha.startswith('Pss:'):
+                return int(linha.split()[1]) * 1024
+
+    statm = _ler(os.path.join(PROC_DIR, str(pid), 'statm'))
+    if statm:
+        return int(statm.split()[1]) * TAMANHO_PAGINA
+    return 0
+
+def memoria_arvore(raiz):
+    """Memória somada da árvore de processos em bytes (None se /proc não existe ou a raiz saiu)"""
+    pids = pids_da_arvore(raiz)
+    if not pids:
+        return None
+    return sum(memoria_processo(pid) for pid in pids)
+
+def expandir_cpus(especificacao):
+    """'0-3,6' -> [0, 1, 2, 3, 6]"""
+    cpus = []
+    for parte in (especificacao or '').split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        if '-' in parte:
+            inicio, fim = parte.split('-', 1)
+            cpus.extend(range(int(inicio), int(fim) + 1))
+        else:
+            cpus.append(int(parte))
+    return cpus
+
+class CgroupNavegadores:
+    """
+    Um cgroup v2 por navegador, com limite de memória, cota de CPU e pinagem de CPUs
+
+    A raiz precisa ser uma pasta do cgroup v2 delegada ao usuário do processo
+    (ex: um slice do systemd com Delegate=yes). Sem permissão ou sem cgroup v2
+    os navegadores simplesmente rodam fora de cgroup.
+
+    memory.oom.group faz o OOM killer derrubar o navegador inteiro (que o pool
+    detecta e substitui) em vez de uma aba qualquer ou de outro processo do host.
+    """
+
+    def __init__(self, raiz, memoria_max_mb=0, cpu_max=0, cpus=None, cpus_por_navegador=1,
+                 periodo_cpu=100000):
+        self.raiz = raiz
+        self.memoria_max = int(memoria_max_mb * 1024 * 1024) if memoria_max_mb else 0
+        self.cpu_max = cpu_max
+        self.periodo_cpu = periodo_cpu
+        self.cpus = expandir_cpus(cpus) if isinstance(cpus, str) else list(cpus or [])
+        self.cpus_por_navegador = max(1, cpus_por_navegador)
+        self._lock = threading.Lock()
+        self._proximo = 0
+        self._proxima_cpu = 0
+        self.ativo = self._preparar()
+
+    def _escrever(self, caminho, valor):
+        with open(caminho, 'w') as f:
+            f.write(str(valor))
+
+    def _preparar(self):
+        """Habilita os controladores na raiz; retorna False se cgroups não estão disponíveis"""
+        if not os.path.exists(os.path.join(self.raiz, 'cgroup.controllers')):
+            logger.warning(f"[Cgroup] {self.raiz} não é uma pasta de cgroup v2; navegadores sem cgroup")
+            return False
+
+        disponiveis = (_ler(os.path.join(self.raiz, 'cgroup.controllers')) or '').split()
+        for controlador in ('memory', 'cpu', 'cpuset'):
+            if controlador not in disponiveis:
+                continue
+            try:
+                self._escrever(os.path.join(self.raiz, 'cgroup.subtree_control'), f'+{controlador}')
+            except OSError as e:
+                logger.warning(f"[Cgroup] Não foi possível habilitar {controlador} em {self.raiz}: {e}")
+        return True
+
+    def _proximas_cpus(self):
+        """Fatia de cpus_por_navegador CPUs em rodízio"""
+        if not self.cpus:
+            return None
+        inicio = self._proxima_cpu
+        self._proxima_cpu = (inicio + self.cpus_por_navegador) % len(self.cpus)
+        fatia = [self.cpus[(inicio + i) % len(self.cpus)] for i in range(self.cpus_por_navegador)]
+        return ','.join(str(cpu) for cpu in sorted(set(fatia)))
+
+    def colocar(self, pid_raiz):
+        """Cria um cgroup para a árvore de processos do navegador; retorna o caminho ou None"""
+        if not self.ativo or not pid_raiz:
+            return None
+
+        with self._lock:
+            self._proximo += 1
+            caminho = os.path.join(self.raiz, f"navegador-{os.getpid()}-{self._proximo}")
+            cpus = self._proximas_cpus()
+
+        limites = []
+        if self.memoria_max:
+            limites += [('memory.max', self.memoria_max), ('memory.oom.group', 1)]
+        if self.cpu_max:
+            limites.append(('cpu.max', f"{int(self.cpu_max * self.periodo_cpu)} {self.periodo_cpu}"))
+        if cpus:
+            limites.append(('cpuset.cpus', cpus))
+
+        try:
+            os.makedirs(caminho, exist_ok=True)
+            for arquivo, valor in limites:
+                try:
+                    self._escrever(os.path.join(caminho, arquivo), valor)
+                except OSError as e:
+                    logger.debug(f"[Cgroup] Não foi possível definir {arquivo}: {e}")
+
+            # Processos criados depois (novas abas) herdam o cgroup do pai
+            for pid in pids_da_arvore(pid_raiz):
+                try:
+                    self._escrever(os.path.join(caminho, 'cgroup.procs'), pid)
+                except OSError as e:
+                    logger.debug(f"[Cgroup] Não foi possível mover o processo {pid}: {e}")
+            return caminho
+
+        except OSError as e:
+            logger.warning(f"[Cgroup] Erro ao criar cgroup do navegador: {e}")
+            self.remover(caminho)
+            return None
+
+    def remover(self, caminho, tentativas=10):
+        """Remove o cgroup; espera um pouco pelos processos que ainda estão saindo"""
+        if not caminho:
+            return
+        for tentativa in range(tentativas):
+            try:
+                os.rmdir(caminho)
+                return
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                if tentativa == tentativas - 1:
+                    logger.debug(f"[Cgroup] Não foi possível remover {caminho}: {e}")
+                else:
+                    time.sleep(0.1)
+
+def inicio_processo(pid):
+    """Instante de início do processo (campo 22 de /proc/<pid>/stat); None se ele não existe"""
+    stat = _ler(os.path.join(PROC_DIR, str(pid), 'stat')) if pid else None
+    if not stat:
+        return None
+    campos = stat[stat.rfind(')') + 2:].split()
+    return int(campos[19]) if len(campos) > 19 else None
+
+def matar_arvore(pid, sinal=None):
+    """Mata o processo e todos os descendentes; retorna quantos foram sinalizados"""
+    sinal = sinal or getattr(signal, 'SIGKILL', signal.SIGTERM)
+    mortos = 0
+    for alvo in pids_da_arvore(pid):
+        try:
+            os.kill(alvo, sinal)
+            mortos += 1
+        except OSError:
+            pass
+    return mortos
+
+class ColetorOrfaos:
+    """
+    Mata navegadores e apaga perfis deixados por processos que morreram sem limpar
+
+    Cada processo grava em diretorio/navegadores-<pid>.json os navegadores que
+    criou: pids com o instante de início (para nunca matar um pid reaproveitado)
+    e pastas de perfil. A coleta procura arquivos cujo dono não existe mais,
+    mata as árvores de processos listadas neles e apaga os perfis. Perfis soltos
+    que casam com padroes_perfis e não pertencem a ninguém vivo são apagados
+    depois de idade_minima_perfis segundos.
+    """
+
+    def __init__(self, diretorio, intervalo=300, padroes_perfis=(), ignorar_perfis=(),
+                 idade_minima_perfis=3600):
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self.padroes_perfis = list(padroes_perfis)
+        self.ignorar_perfis = set(ignorar_perfis)
+        self.idade_minima_perfis = idade_minima_perfis
+        self._navegadores = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.coletas = 0
+        self.processos_mortos = 0
+        self.perfis_removidos = 0
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _arquivo(self, pid=None):
+        # Calculado a cada uso: o processo pode ter sido criado por fork (ex: workers do gunicorn)
+        return os.path.join(self.diretorio, f"navegadores-{pid or os.getpid()}.json")
+
+    def _gravar(self):
+        """Regrava o arquivo de estado do processo (chamar com o lock)"""
+        arquivo = self._arquivo()
+        try:
+            if not self._navegadores:
+                if os.path.exists(arquivo):
+                    os.remove(arquivo)
+                return
+            temporario = f"{arquivo}.tmp"
+            with open(temporario, 'w') as f:
+                json.dump({
+                    'dono': [os.getpid(), inicio_processo(os.getpid())],
+                    'navegadores': list(self._navegadores.values())
+                }, f)
+            os.replace(temporario, arquivo)
+        except OSError as e:
+            logger.debug(f"[Coletor] Erro ao gravar estado: {e}")
+
+    def registrar(self, chave, pids, perfis=()):
+        """Anota os processos e perfis de um navegador recém-criado"""
+        navegador = {
+            'pids': [[pid, inicio_processo(pid)] for pid in pids if pid],
+            'perfis': [perfil for perfil in perfis if perfil]
+        }
+        with self._lock:
+            self._navegadores[chave] = navegador
+            self._gravar()
+
+    def remover(self, chave):
+        """Esquece um navegador encerrado normalmente"""
+        with self._lock:
+            if self._navegadores.pop(chave, None) is not None:
+                self._gravar()
+
+    def _ler_estados(self):
+        """(arquivo, estado) de cada processo com navegadores registrados"""
+        estados = []
+        for arquivo in glob.glob(os.path.join(self.diretorio, 'navegadores-*.json')):
+            try:
+                with open(arquivo) as f:
+                    estados.append((arquivo, json.load(f)))
+            except (OSError, ValueError):
+                # Arquivo corrompido (processo morto no meio da gravação) sem dono conhecido
+                estados.append((arquivo, {'dono': [None, None], 'navegadores': []}))
+        return estados
+
+    def _liberar(self, navegador):
+        for pid, inicio in navegador.get('pids', []):
+            # Pid reaproveitado por outro programa: o início não bate
+            if inicio is not None and inicio_processo(pid) == inicio:
+                self.processos_mortos += matar_arvore(pid)
+        for perfil in navegador.get('perfis', []):
+            if os.path.isdir(perfil):
+                shutil.rmtree(perfil, ignore_errors=True)
+                self.perfis_removidos += 1
+
+    def coletar(self):
+        """Libera navegadores de processos mortos e perfis soltos; retorna (processos, perfis)"""
+        processos, perfis = self.processos_mortos, self.perfis_removidos
+        em_uso = set()
+
+        for arquivo, estado in self._ler_estados():
+            dono, inicio = (estado.get('dono') or [None, None])[:2]
+            if dono == os.getpid() or (dono and inicio is not None and inicio_processo(dono) == inicio):
+                for navegador in estado.get('navegadores', []):
+                    em_uso.update(navegador.get('perfis', []))
+                continue
+
+            navegadores = estado.get('navegadores', [])
+            if navegadores:
+                logger.warning(f"[Coletor] Processo {dono} morreu com {len(navegadores)} navegador(es) aberto(s)")
+            for navegador in navegadores:
+                self._liberar(navegador)
+            try:
+                os.remove(arquivo)
+            except OSError:
+                pass
+
+        with self._lock:
+            for navegador in self._navegadores.values():
+                em_uso.update(navegador['perfis'])
+
+        agora = time.time()
+        for padrao in self.padroes_perfis:
+            for perfil in glob.glob(padrao):
+                if perfil in em_uso or perfil in self.ignorar_perfis:
+                    continue
+                try:
+                    if agora - os.path.getmtime(perfil) < self.idade_minima_perfis:
+                        continue
+                except OSError:
+                    continue
+                shutil.rmtree(perfil, ignore_errors=True)
+                self.perfis_removidos += 1
+
+        self.coletas += 1
+        processos, perfis = self.processos_mortos - processos, self.perfis_removidos - perfis
+        if processos or perfis:
+            logger.info(f"[Coletor] {processos} processo(s) órfão(s) morto(s), {perfis} perfil(is) removido(s)")
+        return processos, perfis
+
+    def iniciar(self):
+        """Faz a primeira coleta e agenda as próximas; na saída libera os navegadores do processo"""
+        if self._thread is None:
+            self.coletar()
+            self._thread = threading.Thread(target=self._executar, daemon=True, name="coletor-orfaos")
+            self._thread.start()
+            atexit.register(self.encerrar)
+        return self
+
+    def _executar(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.coletar()
+            except Exception as e:
+                logger.debug(f"[Coletor] Erro na coleta: {e}")
+
+    def encerrar(self):
+        """Mata o que o processo ainda tem registrado (saída sem limpar_todos_drivers)"""
+        with self._lock:
+            navegadores, self._navegadores = list(self._navegadores.values()), {}
+            self._gravar()
+        for navegador in navegadores:
+            self._liberar(navegador)
+
+    def estatisticas(self):
+        with self._lock:
+            registrados = len(self._navegadores)
+        return {
+            'registrados': registrados,
+            'coletas': self.coletas,
+            'processos_mortos': self.processos_mortos,
+            'perfis_removidos': self.perfis_removidos
+        }